@@ -1,9 +1,11 @@
+from src.startup_report import format_report, mark, measure_import  # isort: skip
+
 import asyncio
+import os
 
 from dotenv import load_dotenv
 from loguru import logger
 
-from src.bot import main
 from src.utils import setup_logger
 
 load_dotenv()
@@ -13,6 +15,24 @@ if __name__ == "__main__":
 
     parser = ArgumentParser()
     parser.add_argument("--debug", action="store_true", help="Enable debug mode")
+    parser.add_argument(
+        "--lazy", action="store_true", help="Import admin and dev routers on first use"
+    )
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="Print import-time breakdown and time to first update",
+    )
     args = parser.parse_args()
     setup_logger(logger, level="DEBUG" if args.debug else "INFO")
-    asyncio.run(main())
+    if args.lazy:
+        os.environ["LAZY_ROUTERS"] = "true"
+
+    # imported after parsing args - router loading depends on LAZY_ROUTERS
+    with measure_import("src.bot"):
+        from src.bot import main
+    mark("bot imported")
+    if args.startup_report:
+        logger.info(format_report())
+
+    asyncio.run(main(startup_report=args.startup_report))
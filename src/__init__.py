@@ -6,10 +6,10 @@ try:
     __version__ = importlib.metadata.version(__package__ or __name__)
     del importlib
 except PackageNotFoundError:
+    import tomllib
     from pathlib import Path
 
-    import toml
-
     path = Path(__file__).parent.parent / "pyproject.toml"
-    __version__ = toml.load(path)["tool"]["poetry"]["version"]
-    del toml, Path, path
+    with path.open("rb") as f:
+        __version__ = tomllib.load(f)["tool"]["poetry"]["version"]
+    del tomllib, Path, path, f
@@ -0,0 +1,204 @@
+"""
+Population-wide feeding analytics for admins
+
+All feedings in the window are loaded as two flat columns (user_id, timestamp)
+and every metric is computed with numpy over the whole population at once -
+no per-user python loops.
+"""
+
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from src.database import DatabaseManager
+from src.db_policies import OP_STATS_READ
+from src.utils.timezone_utils import get_offset_minutes, parse_time_of_day
+
+MINUTES_PER_DAY = 24 * 60
+SECONDS_PER_DAY = 24 * 60 * 60
+INTERVAL_BINS_HOURS = [0, 2, 4, 6, 8, 12, 16, 24, 48, np.inf]
+
+
+@dataclass
+class UsageReport:
+    days: int
+    users: int
+    feedings: int
+    interval_percentiles: Tuple[float, float, float]  # p10, p50, p90 hours
+    interval_histogram: List[int]
+    scheduled_users: int
+    adherence: float  # share of scheduled users' feedings within tolerance of a slot
+    missed_slot_rate: float
+    users_missing_most: int  # scheduled users who missed more than half of their slots
+
+    def format(self) -> str:
+        p10, p50, p90 = self.interval_percentiles
+        bins = INTERVAL_BINS_HOURS
+        histogram = "\n".join(
+            f"  {bins[i]:g}-{bins[i + 1]:g}h: {count}"
+            for i, count in enumerate(self.interval_histogram)
+            if count
+        )
+        return (
+            f"📈 <b>Usage report ({self.days} days)</b>\n\n"
+            f"Active users: {self.users}\n"
+            f"Feedings: {self.feedings}\n\n"
+            f"<b>Intervals between feedings:</b>\n"
+            f"p10 / p50 / p90: {p10:.1f}h / {p50:.1f}h / {p90:.1f}h\n"
+            f"{histogram or '  no data'}\n\n"
+            f"<b>Schedules</b> ({self.scheduled_users} users):\n"
+            f"Fed on time: {self.adherence:.0%}\n"
+            f"Missed slots: {self.missed_slot_rate:.0%}\n"
+            f"Users missing most slots: {self.users_missing_most}"
+        )
+
+
+def compute_report(
+    user_ids: np.ndarray,
+    timestamps: np.ndarray,
+    schedule_user_ids: np.ndarray,
+    slots: np.ndarray,
+    offsets: np.ndarray,
+    schedule_starts: np.ndarray,
+    window_start: int,
+    days: int,
+    tolerance_minutes: int = 60,
+) -> UsageReport:
+    """Compute the report from columns
+
+    user_ids, timestamps: one entry per feeding (timestamps - unix seconds, UTC)
+    schedule_user_ids: sorted ids of users with a schedule
+    slots: local minute-of-day per schedule row, padded with -1 (rows x max slots)
+    offsets: user utc offset in minutes per schedule row
+    schedule_starts: unix seconds when each schedule was set up
+    """
+    order = np.lexsort((timestamps, user_ids))
+    user_ids, timestamps = user_ids[order], timestamps[order]
+
+    # intervals - only between consecutive feedings of the same user
+    same_user = user_ids[1:] == user_ids[:-1]
+    intervals = np.diff(timestamps)[same_user] / 3600
+    if intervals.size:
+        percentiles = tuple(float(p) for p in np.percentile(intervals, [10, 50, 90]))
+    else:
+        percentiles = (0.0, 0.0, 0.0)
+    histogram, _ = np.histogram(intervals, bins=INTERVAL_BINS_HOURS)
+
+    # adherence - distance from each feeding to the nearest slot of its user's schedule
+    n_rows, max_slots = slots.shape
+    rows = np.searchsorted(schedule_user_ids, user_ids)
+    if n_rows:
+        scheduled = (rows < n_rows) & (schedule_user_ids[np.minimum(rows, n_rows - 1)] == user_ids)
+    else:
+        scheduled = np.zeros(user_ids.shape, dtype=bool)
+    rows, ts = rows[scheduled], timestamps[scheduled]
+
+    local_seconds = ts + offsets[rows] * 60
+    local_minute = (local_seconds // 60) % MINUTES_PER_DAY
+    user_slots = slots[rows]
+    distance = np.abs(user_slots - local_minute[:, None])
+    distance = np.minimum(distance, MINUTES_PER_DAY - distance)
+    distance = np.where(user_slots < 0, MINUTES_PER_DAY, distance)
+    nearest_slot = distance.argmin(axis=1)
+    on_time = distance[np.arange(len(rows)), nearest_slot] <= tolerance_minutes
+    adherence = float(on_time.mean()) if on_time.size else 0.0
+
+    # missed slots - each (user, day, slot) counts as hit at most once,
+    # only days since the schedule was set up are expected
+    first_day = np.clip((schedule_starts - window_start) // SECONDS_PER_DAY, 0, days)
+    local_day = local_seconds // SECONDS_PER_DAY - window_start // SECONDS_PER_DAY
+    in_window = on_time & (local_day >= first_day[rows]) & (local_day < days)
+    keys = (rows[in_window] * days + local_day[in_window]) * max_slots + nearest_slot[in_window]
+    hits_per_row = np.bincount(np.unique(keys) // (days * max_slots), minlength=n_rows)
+    expected_per_row = (slots >= 0).sum(axis=1) * (days - first_day)
+    expected = int(expected_per_row.sum())
+    missed_slot_rate = 1 - hits_per_row.sum() / expected if expected else 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        missed_per_row = 1 - hits_per_row / expected_per_row
+    users_missing_most = int(np.count_nonzero(missed_per_row[expected_per_row > 0] > 0.5))
+
+    return UsageReport(
+        days=days,
+        users=int(np.unique(user_ids).size),
+        feedings=int(user_ids.size),
+        interval_percentiles=percentiles,
+        interval_histogram=histogram.tolist(),
+        scheduled_users=n_rows,
+        adherence=adherence,
+        missed_slot_rate=float(missed_slot_rate),
+        users_missing_most=users_missing_most,
+    )
+
+
+async def load_schedule_columns(
+    db_manager: DatabaseManager,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Load active schedules as (sorted user ids, padded slot matrix, utc offsets, start times)"""
+    offset_cache: Dict[str, int] = {}
+    timezones: Dict[int, int] = {}
+    users = (
+        db_manager.collection("users", OP_STATS_READ)
+        .find({"timezone": {"$ne": None}}, {"_id": 0, "user_id": 1, "timezone": 1})
+        .batch_size(10000)
+    )
+    async for user in users:
+        tz = user["timezone"]
+        if tz not in offset_cache:
+            offset_cache[tz] = get_offset_minutes(tz)
+        timezones[user["user_id"]] = offset_cache[tz]
+
+    rows: List[Tuple[int, List[int], int]] = []
+    schedules = (
+        db_manager.collection("schedules", OP_STATS_READ)
+        .find(
+            {"times.0": {"$exists": True}},
+            {"_id": 0, "user_id": 1, "times": 1, "minutes": 1, "updated_at": 1},
+        )
+        .batch_size(10000)
+    )
+    async for schedule in schedules:
+        minutes = schedule.get("minutes")
+        if minutes is None:
+            minutes = [parse_time_of_day(t) for t in schedule["times"]]
+        started = int(schedule["updated_at"].replace(tzinfo=timezone.utc).timestamp())
+        rows.append((schedule["user_id"], minutes, started))
+    rows.sort()
+
+    max_slots = max((len(minutes) for _, minutes, _ in rows), default=1)
+    slots = np.full((len(rows), max_slots), -1, dtype=np.int64)
+    for i, (_, minutes, _) in enumerate(rows):
+        slots[i, : len(minutes)] = minutes
+    user_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    offsets = np.array([timezones.get(row[0], 0) for row in rows], dtype=np.int64)
+    starts = np.array([row[2] for row in rows], dtype=np.int64)
+    return user_ids, slots, offsets, starts
+
+
+async def build_usage_report(days: int = 30) -> UsageReport:
+    """Load the last `days` of feedings as columns and compute the usage report"""
+    db_manager = DatabaseManager()
+    now = datetime.now()
+    since = (now - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    user_ids = array("q")
+    timestamps = array("q")
+    async for feeding in db_manager.iter_feeding_timestamps(since):
+        user_ids.append(feeding["user_id"])
+        # feedings are stored as naive server time, which is treated as UTC across the bot
+        timestamps.append(int(feeding["timestamp"].replace(tzinfo=timezone.utc).timestamp()))
+
+    schedule_user_ids, slots, offsets, starts = await load_schedule_columns(db_manager)
+    window_start = int(since.replace(tzinfo=timezone.utc).timestamp())
+    return compute_report(
+        np.frombuffer(user_ids, dtype=np.int64),
+        np.frombuffer(timestamps, dtype=np.int64),
+        schedule_user_ids,
+        slots,
+        offsets,
+        starts,
+        window_start=window_start,
+        days=days,
+    )
@@ -1,20 +1,31 @@
+import importlib
 from os import getenv
 
-from aiogram import Bot, Dispatcher
+from aiogram import Bot, Dispatcher, Router
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.enums import ParseMode
 from botspot.core.bot_manager import BotManager
 from dotenv import load_dotenv
+from loguru import logger
 
-from src.routers.admin import router as admin_router
-from src.routers.chat import router as chat_router
-from src.routers.dev import router as dev_router
-from src.routers.feeding import router as feeding_router
-from src.routers.info import router as info_router
-from src.routers.schedule import router as schedule_router
-from src.routers.settings import router as settings_router
-from src.routers.start import router as start_router
-from src.startup_tasks import reload_schedules
+from src.database import DatabaseManager
+from src.fsm_storage import get_fsm_storage
+from src.journal import start_journal, stop_journal
+from src.loop_monitor import start_loop_monitor, stop_loop_monitor
+from src.namespace import (
+    NamespaceMiddleware,
+    hosted_bots,
+    install_namespaced_bot,
+    is_multi_bot,
+    parse_bot_tokens,
+    register_bot,
+    use_namespace,
+)
+from src.routers.lazy import LazyRouter
+from src.startup_report import FirstUpdateMiddleware, mark, measure_import
+from src.throttling import get_throttling_middleware
+from src.update_priority import get_priority_middleware
 
 # from src.routers.partners import router as partners_router
 
@@ -23,30 +34,118 @@ TOKEN = getenv("TELEGRAM_BOT_TOKEN")
 if TOKEN is None or TOKEN == "":
     raise ValueError("TELEGRAM_BOT_TOKEN is not set")
 
-dp = Dispatcher()
-dp.include_routers(
-    dev_router,
-    admin_router,
-    info_router,
-    feeding_router,
-    schedule_router,
-    settings_router,
-    start_router,
-    chat_router,
-)
+# order matters - chat is the catch-all fallback
+ROUTER_MODULES = [
+    "src.routers.dev",
+    "src.routers.admin",
+    "src.routers.info",
+    "src.routers.feeding",
+    "src.routers.schedule",
+    "src.routers.settings",
+    "src.routers.household",
+    "src.routers.start",
+    "src.routers.chat",
+]
+
+# routers that are only imported when one of their commands is used (LAZY_ROUTERS=true)
+# keep in sync with the commands registered in these modules
+LAZY_ROUTERS = {
+    "src.routers.dev": (
+        "hidden",
+        {
+            "dbwrite": "Write test feeding record",
+            "dbread": "Read feeding records",
+            "checktz": "Check timezone calculations",
+        },
+    ),
+    "src.routers.admin": (
+        "admin",
+        {
+            "list_users": "List all users",
+            "export_users": "Export users as a file: [csv|jsonl] [filter]",
+            "compact_feedings": "Copy feedings into per user-month buckets",
+            "usage_report": "Feeding regularity across all users: [days]",
+            "delivery_health": "Delivery outcomes and auto-paused users",
+            "loop_lag": "Event loop lag since startup",
+            "broadcast": "Send a message to all users: [text]",
+            "broadcast_status": "Progress of the latest broadcast",
+            "broadcast_cancel": "Stop the running broadcast",
+        },
+    ),
+}
+
+
+def load_routers(lazy: bool) -> list[Router]:
+    routers = []
+    for module in ROUTER_MODULES:
+        if lazy and module in LAZY_ROUTERS:
+            visibility, commands = LAZY_ROUTERS[module]
+            routers.append(LazyRouter(module, commands, visibility))
+            continue
+        with measure_import(module):
+            routers.append(importlib.import_module(module).router)
+    return routers
+
+
+dp = Dispatcher(storage=get_fsm_storage())
+dp.include_routers(*load_routers(lazy=getenv("LAZY_ROUTERS", "false").lower() == "true"))
 # dp.include_router(partners_router)
 
 
 # Add startup handler
 @dp.startup()
 async def on_startup() -> None:
-    await reload_schedules()
+    # imported here so the import-time breakdown is attributed to the router modules
+    from src.broadcast import resume_broadcasts
+    from src.dst_rebalancer import start_dst_rebalancer
+    from src.schedule_sync import start_schedule_sync
+    from src.snapshot import get_snapshot_watermark, restore_from_snapshot
+    from src.startup_tasks import reload_schedules, send_missed_reminders
+    from src.watchdog import start_overdue_watchdog
+
+    start_loop_monitor()
+    # before anything writes - also replays entries left over from the previous run
+    start_journal()
+    # read before the snapshot is consumed - the whole process was down since then
+    stopped_at = get_snapshot_watermark()
+    for namespace in hosted_bots:
+        with use_namespace(namespace):
+            await DatabaseManager().ensure_indexes()
+            # the snapshot only holds the main bot's jobs
+            if namespace is not None or not await restore_from_snapshot():
+                await reload_schedules()
+            if stopped_at is not None:
+                await send_missed_reminders(stopped_at)
+            start_overdue_watchdog()
+            start_schedule_sync()
+            start_dst_rebalancer()
+    mark("schedules restored")
+    for namespace in hosted_bots:
+        with use_namespace(namespace):
+            await resume_broadcasts()
+
+
+@dp.shutdown()
+async def on_shutdown() -> None:
+    from src.schedule_sync import stop_schedule_sync
+    from src.snapshot import save_snapshot
+
+    await stop_schedule_sync()
+    await save_snapshot()
+    await stop_journal()
+    await stop_loop_monitor()
 
 
-async def main() -> None:
+async def main(startup_report: bool = False) -> None:
     # Log server timezone on startup
-    # Initialize Bot instance with a default parse mode
-    bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    # Initialize Bot instances with a default parse mode - extra hosted bots (BOT_TOKENS)
+    # share the HTTP session, see src.namespace
+    session = AiohttpSession()
+    default = DefaultBotProperties(parse_mode=ParseMode.HTML)
+    bot = Bot(token=TOKEN, session=session, default=default)
+    register_bot(None, bot)
+    for name, token in parse_bot_tokens(getenv("BOT_TOKENS", "")):
+        register_bot(name, Bot(token=token, session=session, default=default))
 
     # Initialize BotManager with default components
     bm = BotManager(
@@ -60,6 +159,22 @@ async def main() -> None:
 
     # Setup dispatcher with our components
     bm.setup_dispatcher(dp)
+    dp.update.outer_middleware(FirstUpdateMiddleware(log_report=startup_report))
+    if is_multi_bot():
+        # botspot helpers send through the bot of the current namespace
+        install_namespaced_bot()
+        # before the middlewares below - the priority one runs handlers in a copied context
+        dp.update.outer_middleware(NamespaceMiddleware())
+        logger.info(
+            f"Hosting {len(hosted_bots)} bots: {', '.join(name or 'main' for name in hosted_bots)}"
+        )
+    # after the FSM middleware (registered by the Dispatcher) - both need raw_state.
+    # flooded updates are dropped before they take an update slot
+    throttling = get_throttling_middleware()
+    if throttling is not None:
+        dp.update.outer_middleware(throttling)
+    dp.update.outer_middleware(get_priority_middleware())
+    mark("dispatcher ready")
 
     # Start polling
-    await dp.start_polling(bot)
+    await dp.start_polling(*hosted_bots.values())
@@ -0,0 +1,147 @@
+"""
+Resumable admin broadcast to all users
+
+Recipients are streamed from `users` in user_id order, sent in batches of
+BROADCAST_BATCH_SIZE with at most BROADCAST_CONCURRENCY sends in flight and no more than
+BROADCAST_RATE messages per second (Telegram allows ~30/s without paid broadcasts). After
+every batch the last user_id and the counters are checkpointed to the `broadcasts`
+collection, and running broadcasts are resumed on startup - a restart re-sends at most
+one batch. A flood-wait from Telegram pauses all sends for the requested time.
+
+Outcomes go through src.delivery, so users who blocked the bot are counted as failed and
+eventually auto-paused - and skipped by the next broadcast.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+from botspot.utils import send_safe
+from loguru import logger
+
+from src.database import DatabaseManager
+from src.delivery import OUTCOME_DELIVERED, record_delivery, record_failure
+
+MAX_SEND_ATTEMPTS = 3
+
+# broadcast id -> task sending it in this process
+running_broadcasts: Dict[str, asyncio.Task] = {}
+
+
+class RateLimiter:
+    """Spaces calls evenly at `rate` per second"""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        self._next = max(self._next, time.monotonic() + seconds)
+
+
+async def send_one(chat_id: int, text: str, limiter: RateLimiter) -> bool:
+    for _ in range(MAX_SEND_ATTEMPTS):
+        await limiter.wait()
+        try:
+            await send_safe(chat_id, text)
+        except TelegramRetryAfter as e:
+            logger.warning(f"Broadcast hit the flood limit, pausing for {e.retry_after}s")
+            limiter.pause(e.retry_after)
+            continue
+        except TelegramAPIError as e:
+            await record_failure(chat_id, e)
+            return False
+        await record_delivery(chat_id, OUTCOME_DELIVERED)
+        return True
+    return False
+
+
+async def run_broadcast(broadcast: Dict[str, Any]) -> None:
+    """Send a broadcast from its checkpoint to the last user"""
+    dbm = DatabaseManager()
+    batch_size = int(os.getenv("BROADCAST_BATCH_SIZE", 100))
+    limiter = RateLimiter(float(os.getenv("BROADCAST_RATE", 25)))
+    semaphore = asyncio.Semaphore(int(os.getenv("BROADCAST_CONCURRENCY", 10)))
+    text = broadcast["text"]
+    last_user_id: Optional[int] = broadcast["last_user_id"]
+    sent, failed = broadcast["sent"], broadcast["failed"]
+    started = time.monotonic()
+    run_sent = 0
+
+    async def send_bounded(user_id: int) -> bool:
+        async with semaphore:
+            return await send_one(user_id, text, limiter)
+
+    async def flush(batch: List[int]) -> None:
+        nonlocal last_user_id, sent, failed, run_sent
+        results = await asyncio.gather(*(send_bounded(user_id) for user_id in batch))
+        batch_sent = sum(results)
+        last_user_id = batch[-1]
+        sent += batch_sent
+        failed += len(batch) - batch_sent
+        run_sent += len(batch)
+        await dbm.checkpoint_broadcast(
+            broadcast["_id"], last_user_id, batch_sent, len(batch) - batch_sent
+        )
+        rate = run_sent / max(time.monotonic() - started, 1e-9)
+        logger.info(f"Broadcast {broadcast['_id']}: {sent} sent, {failed} failed, {rate:.1f} msg/s")
+
+    batch: List[int] = []
+    async for user in dbm.iter_broadcast_recipients(last_user_id, batch_size):
+        batch.append(user["user_id"])
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    await dbm.set_broadcast_status(broadcast["_id"], "done")
+
+    elapsed = time.monotonic() - started
+    summary = (
+        f"Broadcast finished: {sent} sent, {failed} failed "
+        f"in {elapsed / 60:.1f} min ({run_sent / max(elapsed, 1e-9):.1f} msg/s)"
+    )
+    logger.info(summary)
+    try:
+        await send_safe(broadcast["created_by"], summary)
+    except TelegramAPIError as e:
+        logger.warning(f"Could not report the broadcast result: {str(e)}")
+
+
+def start_broadcast(broadcast: Dict[str, Any]) -> None:
+    broadcast_id = str(broadcast["_id"])
+    task = asyncio.create_task(run_broadcast(broadcast))
+    running_broadcasts[broadcast_id] = task
+
+    def on_done(task: asyncio.Task) -> None:
+        running_broadcasts.pop(broadcast_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            # status stays "running" - resumed from the checkpoint on the next start
+            logger.error(f"Broadcast {broadcast_id} stopped: {str(task.exception())}")
+
+    task.add_done_callback(on_done)
+
+
+async def cancel_broadcast(broadcast: Dict[str, Any]) -> None:
+    task = running_broadcasts.get(str(broadcast["_id"]))
+    if task is not None:
+        task.cancel()
+    await DatabaseManager().set_broadcast_status(broadcast["_id"], "cancelled")
+
+
+async def resume_broadcasts() -> None:
+    """Continue broadcasts interrupted by a restart"""
+    for broadcast in await DatabaseManager().get_running_broadcasts():
+        logger.info(f"Resuming broadcast {broadcast['_id']} after user {broadcast['last_user_id']}")
+        start_broadcast(broadcast)
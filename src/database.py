@@ -1,10 +1,63 @@
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+import os
+from datetime import datetime, timedelta
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 from aiogram.types import Message
-from botspot.utils.deps_getters import get_database
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from loguru import logger
+from motor.motor_asyncio import (
+    AsyncIOMotorCollection,
+    AsyncIOMotorCommandCursor,
+    AsyncIOMotorCursor,
+    AsyncIOMotorDatabase,
+)
 from pydantic import BaseModel
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from src.db_policies import (
+    OP_DEFAULT,
+    OP_FEEDING_WRITE,
+    OP_RESTORE,
+    OP_STATS_READ,
+    get_op_options,
+    get_pooled_database,
+    get_restore_batch_size,
+)
+from src.journal import get_journal
+from src.lookup_cache import get_lookup_cache
+from src.utils.timezone_utils import (
+    convert_minutes_to_utc,
+    format_minute_of_day,
+    get_offset_minutes,
+    parse_time_of_day,
+)
+
+USER_EXPORT_FIELDS = (
+    "user_id",
+    "username",
+    "full_name",
+    "timezone",
+    "partners",
+    "created_at",
+    "updated_at",
+)
+USER_FILTERS = (None, "no_timezone", "no_schedule", "inactive")
+# users per utc_minutes update - keeps the $in list well under the 16 MB command limit
+UTC_MINUTES_BATCH_SIZE = 10000
 
 
 class User(BaseModel):
@@ -21,6 +74,8 @@ class User(BaseModel):
 class Schedule(BaseModel):
     type: str  # "2 times", "3 times", "4 times", "Manual"
     times: List[str]  # ["08:00", "20:00"]
+    minutes: List[int] = []  # local minute of day - [480, 1200]
+    utc_minutes: List[int] = []  # UTC minute of day, indexed - "who is due at minute M"
     created_at: datetime
     updated_at: datetime
 
@@ -34,10 +89,99 @@ class Feeding(BaseModel):
     partners_notified: List[int] = []
 
 
+# compact records for hot read paths - only the projected fields are set, the rest stay None.
+# Full pydantic models above are for API boundaries only
+
+
+class UserRecord(NamedTuple):
+    user_id: int
+    username: Optional[str] = None
+    full_name: Optional[str] = None
+    timezone: Optional[str] = None
+    partners: Optional[List[int]] = None
+
+
+class ScheduleRecord(NamedTuple):
+    user_id: int
+    type: Optional[str] = None
+    times: Optional[List[str]] = None
+    minutes: Optional[List[int]] = None
+    utc_minutes: Optional[List[int]] = None
+
+
+class FeedingRecord(NamedTuple):
+    feeding_id: Any = None  # ObjectId (flat layout) or "{bucket_id}/{oid}" (bucketed layout)
+    timestamp: Optional[datetime] = None
+    schedule_type: Optional[str] = None
+    photo_id: Optional[str] = None
+    video_id: Optional[str] = None
+    partners_notified: Optional[List[int]] = None
+
+
+RecordT = TypeVar("RecordT", UserRecord, ScheduleRecord, FeedingRecord)
+
+
+def get_projection(record_cls: Type[RecordT], fields: Sequence[str]) -> Dict[str, int]:
+    unknown = set(fields) - set(record_cls._fields)
+    if unknown:
+        raise ValueError(f"Unknown {record_cls.__name__} fields: {', '.join(sorted(unknown))}")
+    return {"_id": 0, **dict.fromkeys(fields, 1)}
+
+
+def to_record(
+    record_cls: Type[RecordT], doc: Dict[str, Any], fields: Sequence[str], **values: Any
+) -> RecordT:
+    values.update((field, doc.get(field)) for field in fields if field not in values)
+    return record_cls(**values)
+
+
+def get_month_start(timestamp: datetime) -> datetime:
+    return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def get_overdue_after_minutes(minutes: List[int]) -> int:
+    """How long after a feeding the cat counts as overdue: longest gap between slots + grace"""
+    grace = int(os.getenv("OVERDUE_GRACE_MINUTES", 120))
+    minutes = sorted(minutes)
+    if len(minutes) < 2:
+        return 24 * 60 + grace
+    gaps = [b - a for a, b in zip(minutes, minutes[1:])]
+    gaps.append(minutes[0] + 24 * 60 - minutes[-1])
+    return max(gaps) + grace
+
+
+def get_overdue_at_expression(timestamp: datetime) -> Dict[str, Any]:
+    """Update-pipeline expression: timestamp + the schedule's overdue_after_minutes"""
+    default_minutes = 24 * 60 + int(os.getenv("OVERDUE_GRACE_MINUTES", 120))
+    overdue_after_minutes = {"$ifNull": ["$overdue_after_minutes", default_minutes]}
+    return {"$add": [timestamp, {"$multiply": [overdue_after_minutes, 60 * 1000]}]}
+
+
+def get_utc_minutes_expression(offset_minutes: int) -> Dict[str, Any]:
+    """Update-pipeline expression: the schedule's local minutes of day shifted to UTC"""
+    to_utc = {"$mod": [{"$add": [{"$subtract": ["$$this", offset_minutes]}, 24 * 60]}, 24 * 60]}
+    return {"$map": {"input": "$minutes", "in": to_utc}}
+
+
+def get_bucket_id(user_id: int, timestamp: datetime) -> str:
+    """Feedings bucket id - one document per user per month"""
+    return f"{user_id}:{timestamp:%Y-%m}"
+
+
 class DatabaseManager:
     @property
     def db(self) -> AsyncIOMotorDatabase:
-        return get_database()
+        return get_pooled_database()
+
+    def collection(self, name: str, op: str = OP_DEFAULT) -> AsyncIOMotorCollection:
+        """Collection with the read preference / write concern of an operation class"""
+        options = get_op_options(op)
+        return self.db.get_collection(name, **options) if options else self.db[name]
+
+    @property
+    def bucketed(self) -> bool:
+        """Whether feedings are stored in per user-month buckets instead of one doc per feeding"""
+        return os.getenv("FEEDINGS_LAYOUT", "flat").lower() == "bucketed"
 
     # todo: return User model here...
     async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
@@ -45,6 +189,15 @@ class DatabaseManager:
         # data = await self.db.users.find_one({"user_id": user_id})
         return await self.db.users.find_one({"user_id": user_id})
 
+    async def get_user_record(
+        self, user_id: int, fields: Sequence[str] = ("timezone",)
+    ) -> Optional[UserRecord]:
+        """Get only the given user fields as a compact record"""
+        doc = await self.db.users.find_one({"user_id": user_id}, get_projection(UserRecord, fields))
+        if doc is None:
+            return None
+        return to_record(UserRecord, doc, fields, user_id=user_id)
+
     async def create_or_update_user(self, message: Message) -> Dict[str, Any]:
         """Create or update user from message"""
         user = message.from_user
@@ -76,8 +229,16 @@ class DatabaseManager:
 
     async def update_user_timezone(self, user_id: int, timezone: str) -> None:
         """Update user's timezone"""
+        now = datetime.now()
         await self.db.users.update_one(
-            {"user_id": user_id}, {"$set": {"timezone": timezone, "updated_at": datetime.now()}}
+            {"user_id": user_id}, {"$set": {"timezone": timezone, "updated_at": now}}
+        )
+        get_lookup_cache().put("timezone", user_id, timezone)
+        # keep the indexed UTC slots in sync with the new offset
+        utc_minutes = get_utc_minutes_expression(get_offset_minutes(timezone))
+        await self.db.schedules.update_one(
+            {"user_id": user_id, "minutes": {"$exists": True}},
+            [{"$set": {"utc_minutes": utc_minutes, "updated_at": now}}],
         )
 
     async def add_partner(self, user_id: int, partner_id: int) -> None:
@@ -87,40 +248,481 @@ class DatabaseManager:
             {"$addToSet": {"partners": partner_id}, "$set": {"updated_at": datetime.now()}},
         )
 
-    async def save_user_schedule(self, user_id: int, schedule_type: str, times: List[str]) -> None:
-        """Save user's feeding schedule"""
+    async def get_household(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Household the user is a member of (members index)"""
+        return await self.db.households.find_one({"members": user_id})
+
+    # cached lookups for the journaled write paths (/fed, /setup) - see src.lookup_cache
+
+    async def get_cached_household(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return await get_lookup_cache().get(
+            "household", user_id, lambda: self.get_household(user_id), default=None
+        )
+
+    async def get_cached_schedule_type(self, user_id: int) -> Optional[str]:
+        async def load() -> Optional[str]:
+            record = await self.get_schedule_record(user_id, ("type",))
+            return record.type if record else None
+
+        return await get_lookup_cache().get("schedule_type", user_id, load, default=None)
+
+    async def get_cached_timezone(self, user_id: int) -> Optional[str]:
+        async def load() -> Optional[str]:
+            record = await self.get_user_record(user_id, ("timezone",))
+            return record.timezone if record else None
+
+        return await get_lookup_cache().get("timezone", user_id, load, default=None)
+
+    async def get_schedule_owner_id(self, user_id: int) -> int:
+        """Whose schedule drives the user's reminders - the household owner or the user"""
+        household = await self.db.households.find_one(
+            {"members": user_id}, {"_id": 0, "owner_id": 1}
+        )
+        return household["owner_id"] if household else user_id
+
+    async def create_household(self, owner_id: int) -> Dict[str, Any]:
+        """Create a household owned by the user, or return the one they are already in"""
+        household = await self.get_household(owner_id)
+        if household is not None:
+            return household
         now = datetime.now()
-        await self.db.schedules.update_one(
-            {"user_id": user_id},
+        household = {
+            "owner_id": owner_id,
+            "members": [owner_id],
+            "created_at": now,
+            "updated_at": now,
+        }
+        result = await self.db.households.insert_one(household)
+        get_lookup_cache().forget("household")
+        return {**household, "_id": result.inserted_id}
+
+    async def join_household(self, household_id: str, user_id: int) -> Optional[Dict[str, Any]]:
+        """Add a member - None if there is no such household.
+
+        Raises DuplicateKeyError if the user already is in another household.
+        """
+        if not ObjectId.is_valid(household_id):
+            return None
+        household = await self.db.households.find_one_and_update(
+            {"_id": ObjectId(household_id)},
+            {"$addToSet": {"members": user_id}, "$set": {"updated_at": datetime.now()}},
+            return_document=ReturnDocument.AFTER,
+        )
+        get_lookup_cache().forget("household")
+        return household
+
+    async def leave_household(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Remove a member; the owner leaving dissolves the household. Returns it as it was"""
+        household = await self.get_household(user_id)
+        if household is None:
+            return None
+        if household["owner_id"] == user_id:
+            await self.db.households.delete_one({"_id": household["_id"]})
+        else:
+            await self.db.households.update_one(
+                {"_id": household["_id"]},
+                {"$pull": {"members": user_id}, "$set": {"updated_at": datetime.now()}},
+            )
+        get_lookup_cache().forget("household")
+        return household
+
+    async def transfer_household(self, household_id: Any, owner_id: int, new_owner_id: int) -> bool:
+        """Make another member the owner and drop the old one - False if the owner changed"""
+        result = await self.db.households.update_one(
+            {"_id": household_id, "owner_id": owner_id, "members": new_owner_id},
             {
-                "$set": {"type": schedule_type, "times": times, "updated_at": now},
-                "$setOnInsert": {"created_at": now},
+                "$set": {"owner_id": new_owner_id, "updated_at": datetime.now()},
+                "$pull": {"members": owner_id},
             },
-            upsert=True,
         )
+        get_lookup_cache().forget("household")
+        return result.modified_count == 1
+
+    async def save_user_schedule(
+        self,
+        user_id: int,
+        schedule_type: str,
+        times: List[str],
+        timezone: Optional[str] = None,
+    ) -> None:
+        """Save user's feeding schedule
+
+        Times are stored both as "HH:MM" strings (for display) and as local / UTC
+        minutes of day, so readers never have to re-parse them.
+        """
+        now = datetime.now()
+        minutes = sorted({parse_time_of_day(time) for time in times} - {None})
+        fields: Dict[str, Any] = {
+            "type": schedule_type,
+            "times": [format_minute_of_day(minute) for minute in minutes],
+            "minutes": minutes,
+            "utc_minutes": convert_minutes_to_utc(minutes, timezone),
+            "updated_at": now,
+            "created_at": {"$ifNull": ["$created_at", now]},
+        }
+        update: List[Dict[str, Any]] = [{"$set": fields}]
+        if minutes:
+            overdue_after_minutes = get_overdue_after_minutes(minutes)
+            fields["overdue_after_minutes"] = overdue_after_minutes
+            # never fed, or resumed after a stop - the watchdog counts from the schedule save
+            fields["last_fed_at"] = {"$ifNull": ["$last_fed_at", now]}
+            fields["overdue_at"] = {
+                "$ifNull": ["$overdue_at", now + timedelta(minutes=overdue_after_minutes)]
+            }
+        else:
+            # stopped - nothing to watch
+            update.append({"$unset": ["overdue_at"]})
+        get_lookup_cache().put("schedule_type", user_id, schedule_type)
+        journal = get_journal()
+        if journal is not None:
+            await journal.append("save_user_schedule", {"user_id": user_id, "update": update})
+            return
+        await self._apply_schedule_update(user_id, update)
+
+    async def _apply_schedule_update(
+        self, user_id: int, update: Union[Dict[str, Any], List[Dict[str, Any]]]
+    ) -> None:
+        # an upsert of plain values and $ifNull defaults - applying it twice changes nothing
+        await self.db.schedules.update_one({"user_id": user_id}, update, upsert=True)
 
     async def get_user_schedule(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Get user's current schedule"""
         return await self.db.schedules.find_one({"user_id": user_id})
 
+    async def get_schedule_record(
+        self, user_id: int, fields: Sequence[str] = ("type",)
+    ) -> Optional[ScheduleRecord]:
+        """Get only the given schedule fields as a compact record"""
+        doc = await self.db.schedules.find_one(
+            {"user_id": user_id}, get_projection(ScheduleRecord, fields)
+        )
+        if doc is None:
+            return None
+        return to_record(ScheduleRecord, doc, fields, user_id=user_id)
+
     async def log_feeding(
         self,
         user_id: int,
         schedule_type: str,
         photo_id: Optional[str] = None,
         video_id: Optional[str] = None,
-    ) -> Dict[str, Any]:
-        """Log a feeding event"""
+        source: Optional[Tuple[int, int]] = None,
+        schedule_owner_id: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Log a feeding event
+
+        source: (chat_id, message_id) of the message that reported the feeding. Logging the
+        same source twice is a no-op and returns None.
+        schedule_owner_id: whose overdue deadline moves (household owner), the user by default
+
+        With the local journal running the feeding is only appended to it here and written
+        to Mongo by the replayer - a duplicate source is then dropped at replay instead.
+        """
+        timestamp = datetime.now()
+        # the id is chosen up front so that replaying the same entry twice is a no-op
+        feeding_id: Any = ObjectId()
+        if self.bucketed:
+            # bucket id is embedded into the feeding id, so lookups by feeding id hit the _id index
+            feeding_id = f"{get_bucket_id(user_id, timestamp)}/{feeding_id}"
         feeding_data = {
+            "_id": feeding_id,
             "user_id": user_id,
-            "timestamp": datetime.now(),
+            "timestamp": timestamp,
             "schedule_type": schedule_type,
             "photo_id": photo_id,
             "video_id": video_id,
             "partners_notified": [],
         }
-        result = await self.db.feedings.insert_one(feeding_data)
-        return await self.db.feedings.find_one({"_id": result.inserted_id})
+        if source is not None:
+            feeding_data["source"] = {"chat_id": source[0], "message_id": source[1]}
+        owner_id = schedule_owner_id or user_id
+
+        journal = get_journal()
+        if journal is not None:
+            await journal.append("log_feeding", {"feeding": feeding_data, "owner_id": owner_id})
+            return feeding_data
+        return await self._apply_feeding(feeding_data, owner_id)
+
+    async def _apply_feeding(
+        self, feeding_data: Dict[str, Any], owner_id: int
+    ) -> Optional[Dict[str, Any]]:
+        if self.bucketed:
+            feeding = await self._push_to_bucket(feeding_data)
+        else:
+            feeding = await self._insert_feeding(feeding_data)
+        if feeding is None:
+            logger.info(f"Feeding {feeding_data['_id']} is already logged, skipping")
+            return None
+        await self._touch_last_fed(owner_id, feeding_data["timestamp"])
+        return feeding
+
+    async def _insert_feeding(self, feeding_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Insert a feeding (flat layout), None if it or its source message is already logged"""
+        query: Dict[str, Any] = {"_id": feeding_data["_id"]}
+        if "source" in feeding_data:
+            source = feeding_data["source"]
+            query = {"source.chat_id": source["chat_id"], "source.message_id": source["message_id"]}
+        try:
+            result = await self.collection("feedings", OP_FEEDING_WRITE).update_one(
+                query, {"$setOnInsert": feeding_data}, upsert=True
+            )
+        except DuplicateKeyError:
+            # concurrent upsert of the same source won the race on the unique index,
+            # or the same feeding id was already inserted for another source
+            return None
+        if result.upserted_id is None:
+            return None
+        return feeding_data
+
+    async def _touch_last_fed(self, user_id: int, timestamp: datetime) -> None:
+        """Move the user's overdue deadline forward - the watchdog only looks at due deadlines
+
+        Never moves it back, so a feeding replayed late can't undo a newer one.
+        """
+        await self.collection("schedules", OP_FEEDING_WRITE).update_one(
+            {
+                "user_id": user_id,
+                "times.0": {"$exists": True},
+                "last_fed_at": {"$not": {"$gte": timestamp}},
+            },
+            [
+                {
+                    "$set": {
+                        "last_fed_at": timestamp,
+                        "overdue_at": get_overdue_at_expression(timestamp),
+                    }
+                }
+            ],
+        )
+
+    def get_users_due_at(self, utc_minutes: Iterable[int]) -> AsyncIOMotorCursor:
+        """Users with a feeding slot at any of the given UTC minutes of day
+
+        One lookup in the multikey utc_minutes index, however many users there are.
+        """
+        return self.db.schedules.find(
+            {"utc_minutes": {"$in": list(utc_minutes)}}, {"_id": 0, "user_id": 1}
+        )
+
+    def iter_schedules_with_timezones(self) -> AsyncIOMotorCommandCursor:
+        """Active schedules joined with the owner's timezone - for restoring reminders"""
+        pipeline = [
+            {"$match": {"times.0": {"$exists": True}}},
+            {
+                "$lookup": {
+                    "from": "users",
+                    "let": {"uid": "$user_id"},
+                    "pipeline": [
+                        {"$match": {"$expr": {"$eq": ["$user_id", "$$uid"]}}},
+                        {"$project": {"_id": 0, "timezone": 1}},
+                    ],
+                    "as": "user",
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "user_id": 1,
+                    "times": 1,
+                    "minutes": 1,
+                    "utc_minutes": 1,
+                    "timezone": {"$arrayElemAt": ["$user.timezone", 0]},
+                }
+            },
+        ]
+        return self.collection("schedules", OP_RESTORE).aggregate(
+            pipeline, batchSize=get_restore_batch_size()
+        )
+
+    def iter_overdue_schedules(self, now: datetime) -> AsyncIOMotorCursor:
+        """Schedules whose overdue deadline has passed - an index range scan over due rows only"""
+        return self.db.schedules.find(
+            {"overdue_at": {"$lte": now}},
+            {"_id": 0, "user_id": 1, "last_fed_at": 1},
+        )
+
+    def iter_updated_user_ids(self, collection: str, since: datetime) -> AsyncIOMotorCursor:
+        """user_id / updated_at of users or schedules changed after `since` (updated_at index)"""
+        return self.db[collection].find(
+            {"updated_at": {"$gt": since}}, {"_id": 0, "user_id": 1, "updated_at": 1}
+        )
+
+    async def get_scheduled_user_ids(self, user_ids: Iterable[int]) -> Set[int]:
+        """Which of the given users still have a non-empty schedule"""
+        cursor = self.db.schedules.find(
+            {"user_id": {"$in": list(user_ids)}, "times.0": {"$exists": True}},
+            {"_id": 0, "user_id": 1},
+        )
+        return {doc["user_id"] async for doc in cursor}
+
+    async def get_timezones_in_use(self) -> List[str]:
+        """Distinct user timezones - streamed by a $group, one small document per timezone"""
+        cursor = self.db.users.aggregate(
+            [{"$match": {"timezone": {"$nin": [None, ""]}}}, {"$group": {"_id": "$timezone"}}]
+        )
+        return [group["_id"] async for group in cursor]
+
+    async def get_schedules_in_timezone(self, timezone: str) -> List[Dict[str, Any]]:
+        """Active schedules (user_id, times, local minutes) of the users in a timezone"""
+        users = self.db.users.find({"timezone": timezone}, {"_id": 0, "user_id": 1})
+        user_ids = [user["user_id"] async for user in users]
+        cursor = self.db.schedules.find(
+            {"user_id": {"$in": user_ids}, "times.0": {"$exists": True}},
+            {"_id": 0, "user_id": 1, "times": 1, "minutes": 1},
+        )
+        return await cursor.to_list(length=None)
+
+    async def set_utc_minutes(self, user_ids: List[int], offset_minutes: int) -> None:
+        """Shift the indexed UTC slots of a timezone's users to its new offset
+
+        One update_many per UTC_MINUTES_BATCH_SIZE users, the server derives the slots from the
+        stored local minutes. Schedules without them are left to backfill_schedule_minutes.
+        updated_at is left alone - the user's local schedule did not change.
+        """
+        update = [{"$set": {"utc_minutes": get_utc_minutes_expression(offset_minutes)}}]
+        for start in range(0, len(user_ids), UTC_MINUTES_BATCH_SIZE):
+            await self.db.schedules.update_many(
+                {
+                    "user_id": {"$in": user_ids[start : start + UTC_MINUTES_BATCH_SIZE]},
+                    "minutes": {"$exists": True},
+                },
+                update,
+            )
+
+    async def record_delivery(self, user_id: int, outcome: str, permanent: bool) -> int:
+        """Count a send outcome - returns the number of permanent failures in a row"""
+        update: Dict[str, Any] = {
+            "$inc": {f"delivery.{outcome}": 1},
+            "$set": {"delivery.last_outcome": outcome, "delivery.last_at": datetime.now()},
+        }
+        if permanent:
+            update["$inc"]["delivery.failures_in_row"] = 1
+        elif outcome == "delivered":
+            update["$set"]["delivery.failures_in_row"] = 0
+            update["$unset"] = {"delivery.paused_at": ""}
+        doc = await self.db.users.find_one_and_update(
+            {"user_id": user_id},
+            update,
+            projection={"_id": 0, "delivery.failures_in_row": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        return ((doc or {}).get("delivery") or {}).get("failures_in_row", 0)
+
+    async def mark_delivery_paused(self, user_id: int) -> None:
+        await self.db.users.update_one(
+            {"user_id": user_id}, {"$set": {"delivery.paused_at": datetime.now()}}
+        )
+
+    async def get_delivery_health(self, outcomes: Sequence[str]) -> Dict[str, int]:
+        """Totals of send outcomes over all users, plus failing and auto-paused user counts"""
+        group: Dict[str, Any] = {"_id": None, "users": {"$sum": 1}}
+        group.update((outcome, {"$sum": f"$delivery.{outcome}"}) for outcome in outcomes)
+        group["failing"] = {"$sum": {"$cond": [{"$gt": ["$delivery.failures_in_row", 0]}, 1, 0]}}
+        group["paused"] = {"$sum": {"$cond": [{"$ifNull": ["$delivery.paused_at", False]}, 1, 0]}}
+        cursor = self.collection("users", OP_STATS_READ).aggregate(
+            [{"$match": {"delivery": {"$exists": True}}}, {"$group": group}]
+        )
+        result = await cursor.to_list(length=1)
+        if not result:
+            return {}
+        result[0].pop("_id")
+        return result[0]
+
+    async def create_broadcast(self, text: str, created_by: int) -> Optional[Dict[str, Any]]:
+        """Start a broadcast - None if one is already running"""
+        now = datetime.now()
+        broadcast = {
+            "text": text,
+            "created_by": created_by,
+            "status": "running",
+            "last_user_id": None,
+            "sent": 0,
+            "failed": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        try:
+            result = await self.db.broadcasts.insert_one(broadcast)
+        except DuplicateKeyError:
+            # the unique index on running broadcasts - another admin started one first
+            return None
+        return {"_id": result.inserted_id, **broadcast}
+
+    async def get_latest_broadcast(self) -> Optional[Dict[str, Any]]:
+        return await self.db.broadcasts.find_one(sort=[("created_at", -1)])
+
+    async def get_running_broadcasts(self) -> List[Dict[str, Any]]:
+        return await self.db.broadcasts.find({"status": "running"}).to_list(length=None)
+
+    def iter_broadcast_recipients(
+        self, after_user_id: Optional[int], batch_size: int
+    ) -> AsyncIOMotorCursor:
+        """Users in user_id order (unique index) after the checkpoint, auto-paused ones skipped"""
+        query: Dict[str, Any] = {"delivery.paused_at": {"$exists": False}}
+        if after_user_id is not None:
+            query["user_id"] = {"$gt": after_user_id}
+        return (
+            self.db.users.find(query, {"_id": 0, "user_id": 1})
+            .sort("user_id", 1)
+            .batch_size(batch_size)
+        )
+
+    async def checkpoint_broadcast(
+        self,
+        broadcast_id: ObjectId,
+        last_user_id: Optional[int],
+        sent: int,
+        failed: int,
+        status: Optional[str] = None,
+    ) -> None:
+        """Advance the checkpoint and the counters in one atomic update"""
+        update: Dict[str, Any] = {
+            "$set": {"last_user_id": last_user_id, "updated_at": datetime.now()},
+            "$inc": {"sent": sent, "failed": failed},
+        }
+        if status is not None:
+            update["$set"]["status"] = status
+        await self.db.broadcasts.update_one({"_id": broadcast_id}, update)
+
+    async def set_broadcast_status(self, broadcast_id: ObjectId, status: str) -> None:
+        await self.db.broadcasts.update_one(
+            {"_id": broadcast_id}, {"$set": {"status": status, "updated_at": datetime.now()}}
+        )
+
+    async def mark_overdue_alerted(self, user_id: int, now: datetime, cooldown: timedelta) -> None:
+        """Push the deadline past the cooldown so the user is not alerted on every sweep"""
+        await self.db.schedules.update_one(
+            {"user_id": user_id},
+            {"$set": {"overdue_at": now + cooldown, "overdue_alerted_at": now}},
+        )
+
+    async def _push_to_bucket(self, feeding_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Append a feeding to its user-month bucket (bucketed layout)
+
+        None if the bucket already holds this feeding or one from the same source message.
+        """
+        user_id = feeding_data["user_id"]
+        bucket_id = feeding_data["_id"].rsplit("/", 1)[0]
+        item = {k: v for k, v in feeding_data.items() if k != "user_id"}
+        query: Dict[str, Any] = {"_id": bucket_id, "feedings._id": {"$ne": item["_id"]}}
+        if "source" in feeding_data:
+            # a duplicate makes the filter miss, and the upsert then hits the _id index
+            query["feedings.source"] = {"$ne": feeding_data["source"]}
+        try:
+            await self.collection("feeding_buckets", OP_FEEDING_WRITE).update_one(
+                query,
+                {
+                    "$push": {"feedings": item},
+                    "$setOnInsert": {
+                        "user_id": user_id,
+                        "month": get_month_start(feeding_data["timestamp"]),
+                    },
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return None
+        return {**item, "user_id": user_id}
 
     # todo: return Feeding model here...
     async def get_user_feedings(
@@ -129,8 +731,15 @@ class DatabaseManager:
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         limit: int = 10,
+        op: str = OP_DEFAULT,
+        projection: Optional[Dict[str, int]] = None,
     ) -> List[Dict[str, Any]]:
         """Get user's feeding history"""
+        if self.bucketed:
+            return await self._get_bucketed_feedings(
+                user_id, start_date, end_date, limit, op, projection
+            )
+
         query = {"user_id": user_id}
         if start_date or end_date:
             query["timestamp"] = {}
@@ -139,11 +748,193 @@ class DatabaseManager:
             if end_date:
                 query["timestamp"]["$lte"] = end_date
 
-        cursor = self.db.feedings.find(query).sort("timestamp", -1).limit(limit)
+        cursor = self.collection("feedings", op).find(query, projection)
+        cursor = cursor.sort("timestamp", -1).limit(limit)
         return await cursor.to_list(length=limit)
 
+    async def _get_bucketed_feedings(
+        self,
+        user_id: int,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        limit: int,
+        op: str = OP_DEFAULT,
+        projection: Optional[Dict[str, int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Read feeding history from user-month buckets, newest first"""
+        query: Dict[str, Any] = {"user_id": user_id}
+        if start_date or end_date:
+            query["month"] = {}
+            if start_date:
+                query["month"]["$gte"] = get_month_start(start_date)
+            if end_date:
+                query["month"]["$lte"] = get_month_start(end_date)
+
+        # a bucket holds a whole month, so only a couple of documents are read per history
+        if projection is not None:
+            # same projection applied to the embedded feedings
+            projection = {f"feedings.{k}": v for k, v in projection.items() if v}
+            projection["feedings.timestamp"] = 1
+        cursor = self.collection("feeding_buckets", op).find(query, projection)
+        cursor = cursor.sort("month", -1).batch_size(2)
+        feedings: List[Dict[str, Any]] = []
+        async for bucket in cursor:
+            for item in sorted(bucket["feedings"], key=lambda f: f["timestamp"], reverse=True):
+                if start_date and item["timestamp"] < start_date:
+                    continue
+                if end_date and item["timestamp"] > end_date:
+                    continue
+                feedings.append({**item, "user_id": user_id})
+                if len(feedings) >= limit:
+                    return feedings
+        return feedings
+
+    async def get_feeding_records(
+        self,
+        user_id: int,
+        fields: Sequence[str] = ("timestamp",),
+        limit: int = 10,
+        op: str = OP_DEFAULT,
+    ) -> List[FeedingRecord]:
+        """Get user's feeding history as compact records with only the given fields"""
+        projection = get_projection(FeedingRecord, fields)
+        if "feeding_id" in fields:
+            projection.pop("feeding_id")
+            projection["_id"] = 1
+        projection["timestamp"] = 1  # needed for sorting buckets
+        feedings = await self.get_user_feedings(user_id, limit=limit, op=op, projection=projection)
+        return [
+            to_record(FeedingRecord, feeding, fields, feeding_id=feeding.get("_id"))
+            for feeding in feedings
+        ]
+
+    def stream_users(
+        self,
+        user_filter: Optional[str] = None,
+        *,
+        inactive_days: int = 30,
+        batch_size: int = 500,
+    ) -> AsyncIOMotorCommandCursor:
+        """Stream users through a projected cursor without loading them into memory
+
+        user_filter: None (all users), "no_timezone", "no_schedule" or "inactive"
+        """
+        if user_filter not in USER_FILTERS:
+            raise ValueError(f"Unknown user filter: {user_filter}")
+
+        pipeline: List[Dict[str, Any]] = [{"$sort": {"user_id": 1}}]
+        if user_filter == "no_timezone":
+            pipeline.append({"$match": {"timezone": None}})
+        elif user_filter == "no_schedule":
+            # stopped schedules are kept with an empty times list
+            pipeline += [
+                {
+                    "$lookup": {
+                        "from": "schedules",
+                        "let": {"uid": "$user_id"},
+                        "pipeline": [
+                            {"$match": {"$expr": {"$eq": ["$user_id", "$$uid"]}}},
+                            {"$match": {"times.0": {"$exists": True}}},
+                            {"$limit": 1},
+                            {"$project": {"_id": 1}},
+                        ],
+                        "as": "_schedule",
+                    }
+                },
+                {"$match": {"_schedule": []}},
+            ]
+        elif user_filter == "inactive":
+            since = datetime.now() - timedelta(days=inactive_days)
+            if self.bucketed:
+                collection, recent = "feeding_buckets", {"feedings.timestamp": {"$gte": since}}
+            else:
+                collection, recent = "feedings", {"timestamp": {"$gte": since}}
+            pipeline += [
+                {
+                    "$lookup": {
+                        "from": collection,
+                        "let": {"uid": "$user_id"},
+                        "pipeline": [
+                            {"$match": {"$expr": {"$eq": ["$user_id", "$$uid"]}}},
+                            {"$match": recent},
+                            {"$limit": 1},
+                            {"$project": {"_id": 1}},
+                        ],
+                        "as": "_recent_feedings",
+                    }
+                },
+                {"$match": {"_recent_feedings": []}},
+            ]
+        pipeline.append({"$project": {"_id": 0, **dict.fromkeys(USER_EXPORT_FIELDS, 1)}})
+
+        return self.collection("users", OP_STATS_READ).aggregate(
+            pipeline, batchSize=batch_size, allowDiskUse=True
+        )
+
+    def iter_feeding_timestamps(
+        self, since: datetime, batch_size: int = 10000
+    ) -> AsyncIOMotorCommandCursor:
+        """Stream only (user_id, timestamp) of feedings since a date - for analytics"""
+        if self.bucketed:
+            collection = self.collection("feeding_buckets", OP_STATS_READ)
+            pipeline = [
+                {"$match": {"month": {"$gte": get_month_start(since)}}},
+                {"$unwind": "$feedings"},
+                {"$match": {"feedings.timestamp": {"$gte": since}}},
+                {"$project": {"_id": 0, "user_id": 1, "timestamp": "$feedings.timestamp"}},
+            ]
+        else:
+            collection = self.collection("feedings", OP_STATS_READ)
+            pipeline = [
+                {"$match": {"timestamp": {"$gte": since}}},
+                {"$project": {"_id": 0, "user_id": 1, "timestamp": 1}},
+            ]
+        return collection.aggregate(pipeline, batchSize=batch_size)
+
+    async def apply_journal_entry(self, op: str, payload: Dict[str, Any]) -> None:
+        """Write an entry of the local journal (src.journal) to Mongo - safe to repeat"""
+        if op == "log_feeding":
+            await self._apply_feeding(payload["feeding"], payload["owner_id"])
+        elif op == "save_user_schedule":
+            await self._apply_schedule_update(payload["user_id"], payload["update"])
+        else:
+            logger.error(f"Unknown journal entry {op}, skipping")
+
     async def mark_partners_notified(self, feeding_id: str, partner_ids: List[int]) -> None:
         """Mark that partners were notified about a feeding"""
-        await self.db.feedings.update_one(
+        if self.bucketed:
+            bucket_id = feeding_id.rsplit("/", 1)[0]
+            await self.collection("feeding_buckets", OP_FEEDING_WRITE).update_one(
+                {"_id": bucket_id, "feedings._id": feeding_id},
+                {"$addToSet": {"feedings.$.partners_notified": {"$each": partner_ids}}},
+            )
+            return
+        await self.collection("feedings", OP_FEEDING_WRITE).update_one(
             {"_id": feeding_id}, {"$addToSet": {"partners_notified": {"$each": partner_ids}}}
         )
+
+    async def ensure_indexes(self) -> None:
+        """Create the indexes the queries above rely on"""
+        await self.db.users.create_index("user_id", unique=True)
+        await self.db.users.create_index("updated_at")
+        await self.db.users.create_index("timezone")
+        await self.db.schedules.create_index("updated_at")
+        await self.db.schedules.create_index("user_id", unique=True)
+        await self.db.feedings.create_index([("user_id", 1), ("timestamp", -1)])
+        await self.db.feedings.create_index(
+            [("source.chat_id", 1), ("source.message_id", 1)],
+            unique=True,
+            partialFilterExpression={"source": {"$exists": True}},
+        )
+        await self.db.feeding_buckets.create_index([("user_id", 1), ("month", -1)])
+        await self.db.schedules.create_index("overdue_at", sparse=True)
+        await self.db.schedules.create_index("utc_minutes")
+        # a user can be in one household only
+        await self.db.households.create_index("members", unique=True)
+        # one running broadcast at a time, also serves the lookup of running broadcasts
+        await self.db.broadcasts.create_index(
+            "status",
+            unique=True,
+            partialFilterExpression={"status": "running"},
+            name="status_running_unique",
+        )
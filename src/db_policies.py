@@ -0,0 +1,77 @@
+"""
+Mongo connection pool and per-operation read / write policies
+
+Operation classes:
+- default: primary reads, default write concern
+- feeding_write: journaled writes - a confirmed /fed must survive a mongod crash
+- stats_read: secondaryPreferred with bounded staleness - keeps heavy stats / export /
+  analytics reads off the primary that serves /fed
+- restore: primaryPreferred with large batches - startup restore of all schedules
+
+Pool size and timeouts come from env (MONGO_MAX_POOL_SIZE, ...). If none are set and only
+one bot is hosted, botspot's default database connection is used as is.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+from botspot.utils.deps_getters import get_database
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ReadPreference, WriteConcern
+from pymongo.read_preferences import SecondaryPreferred
+
+from src.namespace import get_database_name, is_multi_bot
+
+OP_DEFAULT = "default"
+OP_FEEDING_WRITE = "feeding_write"
+OP_STATS_READ = "stats_read"
+OP_RESTORE = "restore"
+
+# env var -> motor client option
+POOL_SETTINGS = {
+    "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGO_MIN_POOL_SIZE": "minPoolSize",
+    "MONGO_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "MONGO_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+    "MONGO_SOCKET_TIMEOUT_MS": "socketTimeoutMS",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+}
+
+_client: Optional[AsyncIOMotorClient] = None
+
+
+def get_pool_options() -> Dict[str, int]:
+    return {
+        option: int(os.environ[env]) for env, option in POOL_SETTINGS.items() if env in os.environ
+    }
+
+
+def get_pooled_database() -> AsyncIOMotorDatabase:
+    """Database with the configured pool, falls back to botspot's connection"""
+    global _client
+    pool_options = get_pool_options()
+    if not pool_options and not is_multi_bot():
+        return get_database()
+    if _client is None:
+        # one client for all hosted bots - the pool is shared, databases are per bot
+        _client = AsyncIOMotorClient(os.environ["BOTSPOT_MONGO_DATABASE_CONN_STR"], **pool_options)
+    return _client[get_database_name(os.environ["BOTSPOT_MONGO_DATABASE_DATABASE"])]
+
+
+def get_op_options(op: str) -> Dict[str, Any]:
+    """Collection options (read preference / write concern) for an operation class"""
+    if op == OP_FEEDING_WRITE:
+        w = os.getenv("MONGO_FEEDING_WRITE_W", "1")  # number of nodes or "majority"
+        return {"write_concern": WriteConcern(w=int(w) if w.isdigit() else w, j=True)}
+    if op == OP_STATS_READ:
+        # mongo requires maxStalenessSeconds >= 90
+        max_staleness = max(90, int(os.getenv("MONGO_STATS_MAX_STALENESS_SECONDS", 120)))
+        return {"read_preference": SecondaryPreferred(max_staleness=max_staleness)}
+    if op == OP_RESTORE:
+        return {"read_preference": ReadPreference.PRIMARY_PREFERRED}
+    return {}
+
+
+def get_restore_batch_size() -> int:
+    return int(os.getenv("MONGO_RESTORE_BATCH_SIZE", 5000))
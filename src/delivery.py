@@ -0,0 +1,122 @@
+"""
+Delivery outcome tracking and auto-pausing of unreachable users
+
+Every reminder and alert records its outcome in a compact counter on the user document
+(`users.delivery`). After DELIVERY_PAUSE_AFTER permanent failures in a row (the bot was
+blocked, the chat is gone) the schedule is paused the same way /stop does it and the
+user's jobs are removed - peak-minute sends only go to users who can receive them.
+In a household the unreachable member is dropped instead; an unreachable owner hands the
+household schedule to the next member. A successful delivery resets the streak.
+"""
+
+import os
+from typing import Any, Dict
+
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+from botspot.utils import send_safe
+from loguru import logger
+
+from src.database import DatabaseManager
+from src.utils.timezone_utils import parse_time_of_day
+
+OUTCOME_DELIVERED = "delivered"
+OUTCOME_FORBIDDEN = "forbidden"
+OUTCOME_CHAT_NOT_FOUND = "chat_not_found"
+OUTCOME_RATE_LIMITED = "rate_limited"
+OUTCOME_FAILED = "failed"
+
+OUTCOMES = (
+    OUTCOME_DELIVERED,
+    OUTCOME_FORBIDDEN,
+    OUTCOME_CHAT_NOT_FOUND,
+    OUTCOME_RATE_LIMITED,
+    OUTCOME_FAILED,
+)
+PERMANENT_OUTCOMES = {OUTCOME_FORBIDDEN, OUTCOME_CHAT_NOT_FOUND}
+
+
+def classify_error(error: Exception) -> str:
+    if isinstance(error, TelegramForbiddenError):
+        return OUTCOME_FORBIDDEN
+    if isinstance(error, TelegramRetryAfter):
+        return OUTCOME_RATE_LIMITED
+    if isinstance(error, TelegramBadRequest) and "chat not found" in str(error).lower():
+        return OUTCOME_CHAT_NOT_FOUND
+    return OUTCOME_FAILED
+
+
+async def record_delivery(chat_id: int, outcome: str) -> None:
+    """Count the outcome of a send, pause the user after too many permanent failures"""
+    dbm = DatabaseManager()
+    failures = await dbm.record_delivery(chat_id, outcome, outcome in PERMANENT_OUTCOMES)
+    if failures >= int(os.getenv("DELIVERY_PAUSE_AFTER", 3)):
+        await pause_user(chat_id, outcome)
+
+
+async def pause_user(chat_id: int, outcome: str) -> None:
+    """Stop an unreachable user's reminders - same as /stop, household members keep theirs"""
+    from src.routers.schedule import clear_user_schedule
+
+    dbm = DatabaseManager()
+    household = await dbm.get_household(chat_id)
+    if household is not None and len(household["members"]) > 1:
+        if household["owner_id"] != chat_id:
+            # members have no schedule of their own - just stop asking them
+            await dbm.leave_household(chat_id)
+            await dbm.mark_delivery_paused(chat_id)
+            logger.warning(f"Household member {chat_id} is unreachable ({outcome}), removed")
+            return
+        new_owner_id = next(member for member in household["members"] if member != chat_id)
+        await hand_over_household(household, new_owner_id)
+
+    clear_user_schedule(chat_id)
+    await dbm.save_user_schedule(chat_id, "stopped", [])
+    await dbm.mark_delivery_paused(chat_id)
+    logger.warning(f"User {chat_id} is unreachable ({outcome}), reminders paused")
+
+
+async def hand_over_household(household: Dict[str, Any], new_owner_id: int) -> None:
+    """Move the household and its schedule from the owner to another member"""
+    from src.routers.schedule import sync_user_reminders
+
+    dbm = DatabaseManager()
+    owner_id = household["owner_id"]
+    if not await dbm.transfer_household(household["_id"], owner_id, new_owner_id):
+        return
+    schedule = await dbm.get_user_schedule(owner_id)
+    if schedule is not None and schedule.get("times"):
+        # the times stay the same local times, in the new owner's timezone if they have one
+        new_owner = await dbm.get_user_record(new_owner_id, ("timezone",))
+        owner = await dbm.get_user_record(owner_id, ("timezone",))
+        timezone = (new_owner and new_owner.timezone) or (owner and owner.timezone)
+        await dbm.save_user_schedule(new_owner_id, schedule["type"], schedule["times"], timezone)
+        minutes = sorted({parse_time_of_day(time) for time in schedule["times"]} - {None})
+        sync_user_reminders(new_owner_id, minutes, timezone)
+    logger.warning(f"Household owner {owner_id} is unreachable, {new_owner_id} took over")
+    await send_tracked(
+        new_owner_id,
+        "The household owner can't be reached any more - you manage the household schedule "
+        "now. Use /setup to change it.",
+    )
+
+
+async def record_failure(chat_id: int, error: TelegramAPIError) -> None:
+    outcome = classify_error(error)
+    logger.warning(f"Message to {chat_id} not delivered ({outcome}): {str(error)}")
+    await record_delivery(chat_id, outcome)
+
+
+async def send_tracked(chat_id: int, text: str, **kwargs: Any) -> bool:
+    """send_safe that records the outcome. False if the message was not delivered"""
+    try:
+        await send_safe(chat_id, text, **kwargs)
+    except TelegramAPIError as e:
+        await record_failure(chat_id, e)
+        return False
+    await record_delivery(chat_id, OUTCOME_DELIVERED)
+    return True
@@ -0,0 +1,146 @@
+"""
+Daylight saving time rebalancer for daily reminders
+
+Cron jobs fire at a fixed UTC hour:minute computed when they are armed, so for users in
+a region/city timezone (Europe/Berlin, ...) an 08:00 reminder would drift by an hour after
+every DST change. Fixed GMT±HH:MM offsets never move and are not touched here.
+
+Every DST_CHECK_INTERVAL_HOURS the rebalancer looks for timezones in use whose UTC offset
+changes within the next window and arms a one-off job at the exact transition. That job
+recomputes the UTC slots of all users in the zone in one vectorized pass, re-arms only
+their daily reminders and shifts the indexed utc_minutes of the zone with update_many.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+from zoneinfo import ZoneInfo
+
+from botspot.utils import get_scheduler
+from loguru import logger
+
+from src.database import DatabaseManager
+from src.namespace import get_job_id, in_namespace
+from src.routers.schedule import add_reminder_job
+from src.utils.timezone_utils import (
+    clear_server_offset_cache,
+    get_offset_minutes,
+    get_zoneinfo,
+    parse_time_of_day,
+)
+
+REBALANCER_JOB_ID = "dst_rebalancer"
+TRANSITION_JOB_PREFIX = "dst_transition_"
+MINUTES_PER_DAY = 24 * 60
+
+
+def find_offset_change(timezone: str, start: datetime, end: datetime) -> Optional[datetime]:
+    """First minute in (start, end] at which the zone's UTC offset differs from the one at start"""
+    before = get_offset_minutes(timezone, start)
+    if get_offset_minutes(timezone, end) == before:
+        return None
+    low, high = start, end
+    while high - low > timedelta(minutes=1):
+        middle = low + (high - low) / 2
+        if get_offset_minutes(timezone, middle) == before:
+            low = middle
+        else:
+            high = middle
+    # offsets change on whole minutes, and `high` is less than a minute past the change
+    return high.replace(second=0, microsecond=0)
+
+
+async def rebalance_timezone(timezone: str) -> int:
+    """Re-arm the daily reminders of every user in the zone at its current offset
+
+    The reminders are in-process scheduler jobs, one per slot, so re-arming them is a loop by
+    nature - it only touches memory. The stored slots are shifted by the server in bulk.
+    """
+    # only needed at a transition - keep numpy out of the startup import path
+    import numpy as np
+
+    clear_server_offset_cache()
+    dbm = DatabaseManager()
+    schedules = await dbm.get_schedules_in_timezone(timezone)
+    if not schedules:
+        return 0
+
+    # flatten all slots of the zone into one array - one vectorized conversion for everybody
+    user_ids: List[int] = []
+    local_minutes: List[int] = []
+    for schedule in schedules:
+        minutes = schedule.get("minutes")
+        if minutes is None:
+            minutes = [parse_time_of_day(time) for time in schedule["times"]]
+        minutes = [minute for minute in minutes if minute is not None]
+        user_ids.extend([schedule["user_id"]] * len(minutes))
+        local_minutes.extend(minutes)
+    offset = get_offset_minutes(timezone)
+    local = np.asarray(local_minutes, dtype=np.int64)
+    utc = (local - offset) % MINUTES_PER_DAY
+
+    for user_id, minute, utc_minute in zip(user_ids, local.tolist(), utc.tolist()):
+        hour, local_minute = divmod(minute, 60)
+        gmt_hour, gmt_minute = divmod(utc_minute, 60)
+        # same job id (local time) - replaces the job armed at the old offset
+        add_reminder_job(user_id, hour, local_minute, gmt_hour, gmt_minute)
+    await dbm.set_utc_minutes([schedule["user_id"] for schedule in schedules], offset)
+
+    logger.info(
+        f"DST rebalance for {timezone}: re-armed {len(user_ids)} reminders "
+        f"of {len(schedules)} users"
+    )
+    return len(user_ids)
+
+
+async def schedule_transitions() -> None:
+    """Arm a rebalance job at every offset change expected within the lookahead window"""
+    window = timedelta(hours=float(os.getenv("DST_LOOKAHEAD_HOURS", 3)))
+    now = datetime.now(tz=ZoneInfo("UTC"))
+    scheduler = get_scheduler()
+    for timezone in await DatabaseManager().get_timezones_in_use():
+        if get_zoneinfo(timezone) is None:
+            continue
+        transition = find_offset_change(timezone, now, now + window)
+        if transition is None:
+            continue
+        scheduler.add_job(
+            in_namespace(rebalance_timezone),
+            "date",
+            run_date=transition,
+            args=[timezone],
+            id=get_job_id(f"{TRANSITION_JOB_PREFIX}{timezone}"),
+            replace_existing=True,
+            # a missed run is not retried by the next check - the transition is behind it then
+            misfire_grace_time=None,
+            coalesce=True,
+        )
+        logger.info(f"DST transition for {timezone} at {transition}, rebalance armed")
+
+
+async def get_shifted_timezones(since: datetime) -> List[str]:
+    """Zones in use whose UTC offset is different now than at `since`
+
+    `since` is aware or naive local time (datetime.now(), datetime.fromtimestamp())
+    """
+    since = since.astimezone(ZoneInfo("UTC"))
+    return [
+        timezone
+        for timezone in await DatabaseManager().get_timezones_in_use()
+        if get_zoneinfo(timezone) is not None
+        and get_offset_minutes(timezone, since) != get_offset_minutes(timezone)
+    ]
+
+
+def start_dst_rebalancer() -> None:
+    """Look for upcoming DST transitions now and every DST_CHECK_INTERVAL_HOURS"""
+    hours = float(os.getenv("DST_CHECK_INTERVAL_HOURS", 1))
+    get_scheduler().add_job(
+        in_namespace(schedule_transitions),
+        "interval",
+        hours=hours,
+        id=get_job_id(REBALANCER_JOB_ID),
+        next_run_time=datetime.now(tz=ZoneInfo("UTC")),
+        replace_existing=True,
+    )
+    logger.info(f"DST rebalancer started, checking every {hours:g} hours")
@@ -0,0 +1,92 @@
+"""
+FSM storage for ask_user conversations: a bounded in-memory LRU with expiry
+
+Every reminder and timezone prompt creates FSM state (see src.utils.create_state),
+and aiogram's default MemoryStorage keeps all of it forever.
+- at most FSM_CACHE_SIZE conversations are kept, the least recently used one is dropped first
+- a conversation expires FSM_STATE_TTL_HOURS after its last write; a cleared one (no state,
+  no data) is dropped right away
+
+Nothing is persisted: botspot waits for an ask_user answer on an in-process future, which a
+restart loses anyway, and a restored "waiting for response" state would only make its handler
+swallow the user's next message. Keys include the bot id, so hosted bots never share state.
+"""
+
+import copy
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+DEFAULT_TTL = timedelta(hours=24)
+
+
+class FSMRecord(NamedTuple):
+    state: Optional[str]
+    data: Dict[str, Any]
+    expires_at: datetime
+
+
+class BoundedMemoryStorage(BaseStorage):
+    def __init__(self, cache_size: int = 10000, ttl: timedelta = DEFAULT_TTL) -> None:
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.key_builder = DefaultKeyBuilder(
+            with_bot_id=True, with_business_connection_id=True, with_destiny=True
+        )
+        self._records: "OrderedDict[str, FSMRecord]" = OrderedDict()
+
+    def _load(self, key: str) -> Optional[FSMRecord]:
+        record = self._records.get(key)
+        if record is None:
+            return None
+        if record.expires_at <= datetime.now():
+            del self._records[key]
+            return None
+        self._records.move_to_end(key)
+        return record
+
+    def _save(self, key: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        if state is None and not data:
+            self._records.pop(key, None)
+            return
+        self._records[key] = FSMRecord(state, data, datetime.now() + self.ttl)
+        self._records.move_to_end(key)
+        while len(self._records) > self.cache_size:
+            self._records.popitem(last=False)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        record = self._load(storage_key)
+        state_name = state.state if isinstance(state, State) else state
+        self._save(storage_key, state_name, record.data if record else {})
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._load(self.key_builder.build(key))
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        storage_key = self.key_builder.build(key)
+        record = self._load(storage_key)
+        self._save(storage_key, record.state if record else None, copy.deepcopy(dict(data)))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._load(self.key_builder.build(key))
+        return copy.deepcopy(record.data) if record else {}
+
+    async def close(self) -> None:
+        self._records.clear()
+
+
+def get_fsm_storage() -> BaseStorage:
+    """FSM storage selected by FSM_STORAGE: bounded (default) or memory"""
+    if os.getenv("FSM_STORAGE", "bounded").lower() == "memory":
+        return MemoryStorage()
+    return BoundedMemoryStorage(
+        cache_size=int(os.getenv("FSM_CACHE_SIZE", 10000)),
+        ttl=timedelta(hours=float(os.getenv("FSM_STATE_TTL_HOURS", 24))),
+    )
@@ -0,0 +1,265 @@
+"""
+Local write-ahead journal for feeding and schedule writes
+
+DatabaseManager.log_feeding / save_user_schedule append an entry here and return once it
+is on disk - /fed no longer waits for Mongo, and an outage doesn't lose feedings.
+- entries are JSON lines (bson extended JSON) in segment files, rotated at
+  JOURNAL_SEGMENT_BYTES
+- appends are group-committed: one write + fsync per JOURNAL_FLUSH_MS for all pending entries
+- the replayer applies entries to Mongo in order right after each flush, reading the segments
+  in a worker thread, READ_CHUNK_BYTES at a time. If Mongo is
+  unreachable it retries with backoff; fully applied, rotated segments are deleted.
+  Every apply is idempotent (upserts keyed by pre-generated ids), so replaying a segment
+  again after a crash is safe.
+- an entry that can't be applied - unreadable, or failing JOURNAL_MAX_ATTEMPTS times for
+  any reason but a lost connection - is moved to quarantine.log next to the segments and
+  logged, so it doesn't hold back the entries behind it
+
+Empty JOURNAL_DIR disables the journal: writes go straight to Mongo.
+"""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from bson import json_util
+from loguru import logger
+from pymongo.errors import ConnectionFailure
+
+from src.namespace import get_namespace, use_namespace
+
+SEGMENT_PREFIX = "journal-"
+SEGMENT_SUFFIX = ".log"
+QUARANTINE_FILE = "quarantine.log"
+MAX_RETRY_SECONDS = 60
+# entries read from a segment per worker thread call - a backlog never blocks the event loop
+READ_CHUNK_BYTES = 256 * 1024
+
+
+def get_segment_index(path: Path) -> int:
+    return int(path.name[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)])
+
+
+class Journal:
+    def __init__(
+        self, directory: Path, segment_bytes: int, flush_interval: float, max_attempts: int = 5
+    ) -> None:
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._buffer: List[bytes] = []
+        self._waiters: List[asyncio.Future] = []
+        self._file: Optional[BinaryIO] = None
+        self._segment = 0
+        self._segment_size = 0
+        # replay position: (segment index, byte offset)
+        self._replayed: Tuple[int, int] = (0, 0)
+        # failed attempts of the entry at the replay position
+        self._attempts = 0
+        self._flushed = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def _segment_path(self, index: int) -> Path:
+        return self.directory / f"{SEGMENT_PREFIX}{index:012d}{SEGMENT_SUFFIX}"
+
+    def _segments(self) -> List[Path]:
+        return sorted(self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+
+    def open(self) -> None:
+        """Start a fresh segment after whatever is left from the previous run"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        segments = self._segments()
+        self._replayed = (get_segment_index(segments[0]), 0) if segments else (0, 0)
+        self._segment = get_segment_index(segments[-1]) + 1 if segments else 0
+        self._open_segment()
+        if segments:
+            logger.info(f"Journal: {len(segments)} segments from the previous run to replay")
+
+    def _open_segment(self) -> None:
+        self._file = self._segment_path(self._segment).open("ab")
+        self._segment_size = 0
+
+    def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._replay_loop()),
+        ]
+        self._flushed.set()  # replay leftovers right away
+
+    async def close(self) -> None:
+        """Flush pending entries and give the replayer one last chance"""
+        await self._flush()
+        # stop the replay loop first - two replays would apply and unlink the same segments
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        try:
+            await asyncio.wait_for(self.replay(), timeout=5)
+        except Exception as e:
+            logger.warning(f"Journal not fully replayed on shutdown, will resume on start: {e!r}")
+        if self._file is not None:
+            self._file.close()
+
+    async def append(self, op: str, payload: Dict[str, Any]) -> None:
+        """Add an entry - returns once it is fsynced to disk"""
+        entry = {"op": op, "payload": payload, "namespace": get_namespace()}
+        line = json_util.dumps(entry).encode() + b"\n"
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.append(line)
+        self._waiters.append(future)
+        await future
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if not self._buffer:
+            return
+        data = b"".join(self._buffer)
+        waiters = self._waiters
+        self._buffer, self._waiters = [], []
+        try:
+            # off the event loop - fsync can take milliseconds
+            await asyncio.to_thread(self._write, data)
+        except OSError as e:
+            logger.error(f"Journal write failed: {str(e)}")
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._flushed.set()
+
+    def _write(self, data: bytes) -> None:
+        assert self._file is not None
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._segment_size += len(data)
+        if self._segment_size >= self.segment_bytes:
+            self._file.close()
+            self._segment += 1
+            self._open_segment()
+
+    async def _replay_loop(self) -> None:
+        delay = 1.0
+        while True:
+            await self._flushed.wait()
+            self._flushed.clear()
+            try:
+                await self.replay()
+                delay = 1.0
+                continue
+            except ConnectionFailure as e:
+                logger.warning(f"Journal replay paused, Mongo unavailable: {str(e)}")
+            except Exception:
+                # the loop must survive anything - a dead replayer silently stops all writes
+                logger.exception("Journal replay failed, retrying")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_SECONDS)
+            self._flushed.set()
+
+    async def replay(self) -> int:
+        """Apply everything written so far to Mongo, in order"""
+        applied = 0
+        for path in await asyncio.to_thread(self._segments):
+            index = get_segment_index(path)
+            if index < self._replayed[0]:
+                continue
+            offset = self._replayed[1] if index == self._replayed[0] else 0
+            while True:
+                # rotated before the read - the read then sees everything ever written to it
+                sealed = index < self._segment
+                lines = await asyncio.to_thread(self._read_lines, path, offset)
+                if not lines:
+                    break
+                for line in lines:
+                    if await self._apply(line):
+                        applied += 1
+                    offset += len(line)
+                    self._replayed = (index, offset)
+                    self._attempts = 0
+            if sealed:
+                await asyncio.to_thread(path.unlink, missing_ok=True)
+                self._replayed = (index + 1, 0)
+        return applied
+
+    @staticmethod
+    def _read_lines(path: Path, offset: int) -> List[bytes]:
+        """Complete lines from offset on, about READ_CHUNK_BYTES of them"""
+        lines: List[bytes] = []
+        size = 0
+        with path.open("rb") as f:
+            f.seek(offset)
+            while size < READ_CHUNK_BYTES:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break  # end of the segment, or a partially written tail of the active one
+                lines.append(line)
+                size += len(line)
+        return lines
+
+    async def _apply(self, line: bytes) -> bool:
+        """Apply one entry - False if it was quarantined. Raises to retry it later"""
+        from src.database import DatabaseManager
+
+        try:
+            entry = json_util.loads(line)
+            # the hosted bot's database - see src.namespace
+            with use_namespace(entry.get("namespace")):
+                await DatabaseManager().apply_journal_entry(entry["op"], entry["payload"])
+            return True
+        except ConnectionFailure:
+            raise  # Mongo is down - not the entry's fault
+        except ValueError as e:
+            reason = f"unreadable: {e!r}"  # a corrupt line never gets better
+        except Exception as e:
+            self._attempts += 1
+            if self._attempts < self.max_attempts:
+                raise
+            reason = f"failed {self._attempts} times: {e!r}"
+        await asyncio.to_thread(self._quarantine, line)
+        logger.error(f"Journal entry moved to {QUARANTINE_FILE}, {reason}: {line[:200]!r}")
+        return False
+
+    def _quarantine(self, line: bytes) -> None:
+        with (self.directory / QUARANTINE_FILE).open("ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+_journal: Optional[Journal] = None
+
+
+def get_journal() -> Optional[Journal]:
+    """The running journal, None if disabled or not started (e.g. in migrations)"""
+    return _journal
+
+
+def start_journal() -> None:
+    global _journal
+    directory = os.getenv("JOURNAL_DIR", ".state/journal")
+    if not directory:
+        return
+    _journal = Journal(
+        Path(directory),
+        segment_bytes=int(os.getenv("JOURNAL_SEGMENT_BYTES", 4 * 1024 * 1024)),
+        flush_interval=float(os.getenv("JOURNAL_FLUSH_MS", 20)) / 1000,
+        max_attempts=int(os.getenv("JOURNAL_MAX_ATTEMPTS", 5)),
+    )
+    _journal.open()
+    _journal.start()
+
+
+async def stop_journal() -> None:
+    global _journal
+    if _journal is not None:
+        await _journal.close()
+        _journal = None
@@ -0,0 +1,109 @@
+"""
+Last known values of the reads on the /fed and /setup paths
+
+Their writes go to the local journal (src.journal); the household / schedule type /
+timezone they look up first come from here, so neither path waits for Mongo or fails
+while it is down:
+- an entry younger than LOOKUP_CACHE_TTL_SECONDS is served without touching Mongo
+- an older entry is served right away and refreshed in the background
+- a miss reads Mongo for at most LOOKUP_TIMEOUT_SECONDS - if that fails the caller's
+  default is used (no household, the default schedule type, no timezone)
+Writes of this process update the entries directly, see DatabaseManager. At most
+LOOKUP_CACHE_SIZE entries are kept, the least recently used are evicted.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Hashable, NamedTuple, Optional, Set, Tuple
+
+from loguru import logger
+from pymongo.errors import PyMongoError
+
+from src.namespace import get_namespace
+
+
+class LookupFailed(Exception):
+    pass
+
+
+class CachedValue(NamedTuple):
+    value: Any
+    loaded_at: float  # time.monotonic()
+
+
+class LookupCache:
+    def __init__(self, maxsize: int, ttl: float, timeout: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timeout = timeout
+        self._values: "OrderedDict[Tuple[Hashable, ...], CachedValue]" = OrderedDict()
+        self._refreshing: Set[asyncio.Task] = set()
+
+    def _key(self, kind: str, key: Hashable) -> Tuple[Hashable, ...]:
+        # the same user id is a different user in another hosted bot
+        return get_namespace(), kind, key
+
+    def put(self, kind: str, key: Hashable, value: Any) -> None:
+        cache_key = self._key(kind, key)
+        self._values[cache_key] = CachedValue(value, time.monotonic())
+        self._values.move_to_end(cache_key)
+        while len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+
+    def forget(self, kind: str) -> None:
+        """Drop every entry of a kind - for writes that change several keys at once"""
+        for cache_key in [k for k in self._values if k[:2] == (get_namespace(), kind)]:
+            del self._values[cache_key]
+
+    async def get(
+        self, kind: str, key: Hashable, load: Callable[[], Awaitable[Any]], default: Any
+    ) -> Any:
+        cache_key = self._key(kind, key)
+        cached = self._values.get(cache_key)
+        if cached is not None:
+            self._values.move_to_end(cache_key)
+            if time.monotonic() - cached.loaded_at > self.ttl:
+                # one refresh per ttl, the stale value is served meanwhile
+                self._values[cache_key] = cached._replace(loaded_at=time.monotonic())
+                task = asyncio.create_task(self._refresh(kind, key, load))
+                self._refreshing.add(task)
+                task.add_done_callback(self._refreshing.discard)
+            return cached.value
+        try:
+            return await self._load(kind, key, load)
+        except LookupFailed:
+            return default
+
+    async def _refresh(self, kind: str, key: Hashable, load: Callable[[], Awaitable[Any]]) -> None:
+        with suppress(LookupFailed):
+            await self._load(kind, key, load)
+
+    async def _load(self, kind: str, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        before = self._values.get(self._key(kind, key))
+        try:
+            value = await asyncio.wait_for(load(), timeout=self.timeout)
+        except (PyMongoError, asyncio.TimeoutError) as e:
+            logger.warning(f"Lookup of {kind} {key} failed, using the last known value: {e!r}")
+            raise LookupFailed(kind) from e
+        # a write of this process meanwhile is newer than Mongo - the journal may not be
+        # replayed yet
+        if self._values.get(self._key(kind, key)) is before:
+            self.put(kind, key, value)
+        return value
+
+
+_lookup_cache: Optional[LookupCache] = None
+
+
+def get_lookup_cache() -> LookupCache:
+    global _lookup_cache
+    if _lookup_cache is None:
+        _lookup_cache = LookupCache(
+            maxsize=int(os.getenv("LOOKUP_CACHE_SIZE", 10000)),
+            ttl=float(os.getenv("LOOKUP_CACHE_TTL_SECONDS", 300)),
+            timeout=float(os.getenv("LOOKUP_TIMEOUT_SECONDS", 2)),
+        )
+    return _lookup_cache
@@ -0,0 +1,113 @@
+"""
+Event loop lag monitor
+
+A heartbeat task on the loop stamps the time every LOOP_MONITOR_INTERVAL_MS, and a watcher
+thread checks the stamp. When the loop has not come back for LOOP_LAG_THRESHOLD_MS, some
+callback is blocking it (sync file or network IO, heavy CPU work) - the watcher grabs the
+loop thread's stack while it's still stuck and logs it, at most once per
+LOOP_LAG_LOG_SECONDS (the skipped stalls are counted in the next report).
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from loguru import logger
+
+
+class LoopMonitor:
+    def __init__(self, interval: float, threshold: float, log_interval: float) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.log_interval = log_interval
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_log = 0.0
+        self._suppressed = 0
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.max_lag = max(self.max_lag, now - expected)
+            self._last_beat = now
+
+    def _watch(self) -> None:
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            lag = time.monotonic() - beat
+            # one report per stall - the beat only moves once the loop is free again
+            if lag < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            self.stalls += 1
+            self._report(lag)
+
+    def _report(self, lag: float) -> None:
+        now = time.monotonic()
+        if now - self._last_log < self.log_interval:
+            self._suppressed += 1
+            return
+        frame = sys._current_frames().get(self._loop_thread_id or 0)
+        if frame is None:
+            return
+        stack = "".join(traceback.format_stack(frame))
+        suppressed = f" ({self._suppressed} more stalls since the last report)"
+        logger.warning(
+            f"Event loop blocked for over {lag * 1000:.0f} ms"
+            f"{suppressed if self._suppressed else ''}, blocking code:\n{stack}"
+        )
+        self._last_log = now
+        self._suppressed = 0
+
+
+_monitor: Optional[LoopMonitor] = None
+
+
+def get_loop_monitor() -> Optional[LoopMonitor]:
+    return _monitor
+
+
+def start_loop_monitor() -> None:
+    """Start watching the running loop - LOOP_MONITOR=false disables it"""
+    global _monitor
+    if os.getenv("LOOP_MONITOR", "true").lower() != "true":
+        return
+    _monitor = LoopMonitor(
+        interval=float(os.getenv("LOOP_MONITOR_INTERVAL_MS", 50)) / 1000,
+        threshold=float(os.getenv("LOOP_LAG_THRESHOLD_MS", 200)) / 1000,
+        log_interval=float(os.getenv("LOOP_LAG_LOG_SECONDS", 60)),
+    )
+    _monitor.start()
+    logger.info(f"Event loop monitor started, threshold {_monitor.threshold * 1000:.0f} ms")
+
+
+async def stop_loop_monitor() -> None:
+    global _monitor
+    if _monitor is not None:
+        await _monitor.stop()
+        _monitor = None
@@ -0,0 +1,179 @@
+"""
+Data migrations for the cat feeding bot
+
+compact_feedings: compact the flat `feedings` collection (one document per
+feeding) into `feeding_buckets` (one document per user per month). Run it
+before switching FEEDINGS_LAYOUT=bucketed.
+
+backfill_last_fed: fill `last_fed_at` / `overdue_at` on schedules from the
+feeding history, so the overdue watchdog also covers users who have not fed
+since it was deployed.
+
+backfill_schedule_minutes: store local / UTC minutes of day on schedules that
+only have "HH:MM" strings, so they show up in due-at-minute queries.
+
+    python -m src.migrations compact_feedings|backfill_last_fed|backfill_schedule_minutes
+"""
+
+import os
+from typing import Any, Dict, List
+
+from loguru import logger
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from src.database import get_bucket_id, get_month_start, get_overdue_at_expression
+from src.utils.timezone_utils import convert_minutes_to_utc, parse_time_of_day
+
+
+async def compact_feedings(db: AsyncIOMotorDatabase, batch_size: int = 1000) -> Dict[str, int]:
+    """Copy flat feedings into per user-month buckets
+
+    Safe to re-run: migrated items keep their original ids and are added with $addToSet.
+    The source collection is left untouched - drop it manually after checking the result.
+    """
+    stats = {"feedings": 0, "buckets": 0}
+    ops: List[UpdateOne] = []
+    bucket_id = None
+    items: List[Dict[str, Any]] = []
+
+    def flush_bucket() -> None:
+        if not items:
+            return
+        user_id, month = bucket_id.split(":")[0], get_month_start(items[0]["timestamp"])
+        ops.append(
+            UpdateOne(
+                {"_id": bucket_id},
+                {
+                    "$addToSet": {"feedings": {"$each": list(items)}},
+                    "$setOnInsert": {"user_id": int(user_id), "month": month},
+                },
+                upsert=True,
+            )
+        )
+        stats["buckets"] += 1
+        items.clear()
+
+    # sorted by user and time - so all feedings of one bucket arrive together
+    cursor = db.feedings.find({}).sort([("user_id", 1), ("timestamp", 1)]).batch_size(batch_size)
+    async for feeding in cursor:
+        feeding_bucket_id = get_bucket_id(feeding["user_id"], feeding["timestamp"])
+        if feeding_bucket_id != bucket_id:
+            flush_bucket()
+            bucket_id = feeding_bucket_id
+        # user_id is kept on the bucket itself, not on each item
+        feeding_id = feeding.pop("_id")
+        feeding.pop("user_id")
+        items.append({"_id": f"{bucket_id}/{feeding_id}", **feeding})
+        stats["feedings"] += 1
+
+        if len(ops) >= batch_size:
+            await db.feeding_buckets.bulk_write(ops, ordered=False)
+            ops.clear()
+
+    flush_bucket()
+    if ops:
+        await db.feeding_buckets.bulk_write(ops, ordered=False)
+
+    logger.info(f"Compacted {stats['feedings']} feedings into {stats['buckets']} bucket updates")
+    return stats
+
+
+async def backfill_last_fed(db: AsyncIOMotorDatabase, bucketed: bool = False) -> int:
+    """Set last feeding time and overdue deadline on active schedules from feeding history"""
+    if bucketed:
+        cursor = db.feeding_buckets.aggregate(
+            [
+                {"$unwind": "$feedings"},
+                {"$group": {"_id": "$user_id", "last_fed_at": {"$max": "$feedings.timestamp"}}},
+            ]
+        )
+    else:
+        cursor = db.feedings.aggregate(
+            [{"$group": {"_id": "$user_id", "last_fed_at": {"$max": "$timestamp"}}}]
+        )
+
+    ops: List[UpdateOne] = []
+    count = 0
+    async for row in cursor:
+        last_fed_at = row["last_fed_at"]
+        ops.append(
+            UpdateOne(
+                {"user_id": row["_id"], "times.0": {"$exists": True}},
+                [
+                    {
+                        "$set": {
+                            "last_fed_at": last_fed_at,
+                            "overdue_at": get_overdue_at_expression(last_fed_at),
+                        }
+                    }
+                ],
+            )
+        )
+        count += 1
+        if len(ops) >= 1000:
+            await db.schedules.bulk_write(ops, ordered=False)
+            ops.clear()
+    if ops:
+        await db.schedules.bulk_write(ops, ordered=False)
+
+    logger.info(f"Backfilled last feeding time for {count} users")
+    return count
+
+
+async def backfill_schedule_minutes(db: AsyncIOMotorDatabase) -> int:
+    """Store minutes / utc_minutes on schedules saved before they were introduced"""
+    ops: List[UpdateOne] = []
+    count = 0
+    cursor = db.schedules.find(
+        {"minutes": {"$exists": False}}, {"_id": 0, "user_id": 1, "times": 1}
+    )
+    async for schedule in cursor:
+        user = await db.users.find_one({"user_id": schedule["user_id"]}, {"_id": 0, "timezone": 1})
+        minutes = sorted({parse_time_of_day(t) for t in schedule.get("times", [])} - {None})
+        timezone = user.get("timezone") if user else None
+        ops.append(
+            UpdateOne(
+                {"user_id": schedule["user_id"]},
+                {
+                    "$set": {
+                        "minutes": minutes,
+                        "utc_minutes": convert_minutes_to_utc(minutes, timezone),
+                    }
+                },
+            )
+        )
+        count += 1
+        if len(ops) >= 1000:
+            await db.schedules.bulk_write(ops, ordered=False)
+            ops.clear()
+    if ops:
+        await db.schedules.bulk_write(ops, ordered=False)
+
+    logger.info(f"Backfilled minutes of day for {count} schedules")
+    return count
+
+
+MIGRATIONS = ("compact_feedings", "backfill_last_fed", "backfill_schedule_minutes")
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv()
+    if len(sys.argv) < 2 or sys.argv[1] not in MIGRATIONS:
+        print(f"Usage: python -m src.migrations {'|'.join(MIGRATIONS)}")
+        sys.exit(1)
+
+    client = AsyncIOMotorClient(os.environ["BOTSPOT_MONGO_DATABASE_CONN_STR"])
+    database = client[os.environ["BOTSPOT_MONGO_DATABASE_DATABASE"]]
+    if sys.argv[1] == "compact_feedings":
+        asyncio.run(compact_feedings(database))
+    elif sys.argv[1] == "backfill_schedule_minutes":
+        asyncio.run(backfill_schedule_minutes(database))
+    else:
+        layout = os.getenv("FEEDINGS_LAYOUT", "flat").lower()
+        asyncio.run(backfill_last_fed(database, bucketed=layout == "bucketed"))
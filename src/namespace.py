@@ -0,0 +1,132 @@
+"""
+Several bots in one process - per-bot namespaces over shared resources
+
+BOT_TOKENS="name:token,other:token" hosts extra bots next to TELEGRAM_BOT_TOKEN. All bots
+are polled by the one dispatcher (routers are module level singletons) and share:
+- one Motor client - each hosted bot gets its own database, `<database>_<name>`
+- one scheduler - a hosted bot's jobs get a `<name>:` id prefix and run in its namespace
+- one HTTP session and the delivery tracking of src.delivery
+
+The namespace lives in a context variable: set per update by NamespaceMiddleware, per job
+by the scheduler wrapper, per startup step by use_namespace(). aiogram's FSM middleware
+runs before any middleware of ours - the FSM storage keys by bot id instead. None is the
+main bot, which keeps its plain database name and job ids - a single-bot setup is unchanged.
+"""
+
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Bot
+
+NAMESPACE_PATTERN = re.compile(r"^[a-z0-9]+$")
+
+current_namespace: ContextVar[Optional[str]] = ContextVar("current_namespace", default=None)
+
+# namespace -> bot, the main bot under None
+hosted_bots: Dict[Optional[str], Bot] = {}
+# bot id -> namespace
+bot_namespaces: Dict[int, Optional[str]] = {}
+
+
+def parse_bot_tokens(value: str) -> List[Tuple[str, str]]:
+    """Parse "name:token,..." into (name, token) pairs - the token itself contains a colon"""
+    bots = []
+    for item in filter(None, (item.strip() for item in value.split(","))):
+        name, token = item.split(":", 1)
+        if not NAMESPACE_PATTERN.match(name):
+            raise ValueError(f"Bot name must be lowercase letters and digits: {name!r}")
+        bots.append((name, token))
+    return bots
+
+
+def register_bot(namespace: Optional[str], bot: Bot) -> None:
+    hosted_bots[namespace] = bot
+    bot_namespaces[bot.id] = namespace
+
+
+def is_multi_bot() -> bool:
+    return len(hosted_bots) > 1
+
+
+def get_namespace() -> Optional[str]:
+    return current_namespace.get()
+
+
+@contextmanager
+def use_namespace(namespace: Optional[str]) -> Iterator[None]:
+    token = current_namespace.set(namespace)
+    try:
+        yield
+    finally:
+        current_namespace.reset(token)
+
+
+def get_database_name(base: str) -> str:
+    namespace = get_namespace()
+    return f"{base}_{namespace}" if namespace else base
+
+
+def get_job_id(job_id: str) -> str:
+    """Scheduler job id in the current namespace"""
+    namespace = get_namespace()
+    return f"{namespace}:{job_id}" if namespace else job_id
+
+
+def get_job_namespace(job_id: str) -> Optional[str]:
+    """Namespace a scheduler job belongs to - main bot job ids have no `<name>:` prefix"""
+    for namespace in hosted_bots:
+        if namespace is not None and job_id.startswith(f"{namespace}:"):
+            return namespace
+    return None
+
+
+def in_namespace(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Job function that runs in the current namespace - job args stay as they are"""
+    namespace = get_namespace()
+    if namespace is None:
+        return func
+    return partial(run_in_namespace, namespace, func)
+
+
+async def run_in_namespace(
+    namespace: Optional[str], func: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any
+) -> Any:
+    with use_namespace(namespace):
+        return await func(*args, **kwargs)
+
+
+class NamespacedBot:
+    """Stands in for the main bot in botspot's dependencies: botspot helpers (send_safe,
+    ask_user, ...) then talk through the bot of the current namespace"""
+
+    def _get_bot(self) -> Bot:
+        return hosted_bots[get_namespace()]
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get_bot(), name)
+
+    async def __call__(self, method: Any, request_timeout: Optional[int] = None) -> Any:
+        return await self._get_bot()(method, request_timeout=request_timeout)
+
+
+def install_namespaced_bot() -> None:
+    from botspot.core.dependency_manager import get_dependency_manager
+
+    get_dependency_manager().bot = NamespacedBot()
+
+
+class NamespaceMiddleware(BaseMiddleware):
+    """Outer update middleware - the update's handlers run in its bot's namespace"""
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        bot = data.get("bot")
+        with use_namespace(bot_namespaces.get(bot.id) if bot is not None else None):
+            return await handler(event, data)
@@ -1,41 +1,244 @@
+import csv
+import json
 import os
+import tempfile
+from datetime import datetime
 
 from aiogram import Router
-from aiogram.filters import Command
-from aiogram.types import Message
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile, Message
 from botspot.components.bot_commands_menu import add_admin_command
 from botspot.utils import reply_safe
-from botspot.utils.deps_getters import get_database
 
-from src.database import User
+from src.database import (
+    USER_EXPORT_FIELDS,
+    USER_FILTERS,
+    DatabaseManager,
+    UserRecord,
+    get_projection,
+    to_record,
+)
+from src.db_policies import OP_STATS_READ
 
 router = Router()
 
 admin_user_id = os.getenv("ADMIN_USER_ID")
 
+LIST_USERS_LIMIT = 100
+EXPORT_FORMATS = ("csv", "jsonl")
+
+db_manager = DatabaseManager()
+
+
+def is_admin(message: Message) -> bool:
+    assert message.from_user is not None
+    return message.from_user.id == int(os.getenv("ADMIN_USER_ID", 0))
+
 
 @add_admin_command("list_users", "List all users")
 @router.message(Command("list_users"))
 async def list_users(message: Message) -> None:
+    if not is_admin(message):
+        await reply_safe(message, "You are not authorized to use this command.")
+        return
+    fields = ("user_id", "username", "full_name")
+    cursor = (
+        db_manager.collection("users", OP_STATS_READ)
+        .find({}, get_projection(UserRecord, fields))
+        .limit(LIST_USERS_LIMIT + 1)
+    )
+    users = [to_record(UserRecord, doc, fields) async for doc in cursor]
+
+    lines = [
+        f"@{user.username} ({user.user_id}) - {user.full_name}" for user in users[:LIST_USERS_LIMIT]
+    ]
+    if len(users) > LIST_USERS_LIMIT:
+        lines.append(f"... showing first {LIST_USERS_LIMIT}, use /export_users for the full list")
+    user_list = "\n".join(lines)
+    await reply_safe(message, f"Users:\n{user_list}")
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return " ".join(str(item) for item in value)
+    return value
+
+
+@add_admin_command("export_users", "Export users as a file: [csv|jsonl] [filter]")
+@router.message(Command("export_users"))
+async def export_users(message: Message, command: CommandObject) -> None:
+    """Export users to a csv / jsonl document
+
+    Usage: /export_users [csv|jsonl] [no_timezone|no_schedule|inactive]
+    """
+    if not is_admin(message):
+        await reply_safe(message, "You are not authorized to use this command.")
+        return
+
+    export_format = "csv"
+    user_filter = None
+    for arg in (command.args or "").split():
+        if arg in EXPORT_FORMATS:
+            export_format = arg
+        elif arg in USER_FILTERS:
+            user_filter = arg
+        else:
+            filters = ", ".join(f for f in USER_FILTERS if f)
+            await reply_safe(
+                message,
+                f"Unknown argument: {arg}\n"
+                f"Usage: /export_users [{'|'.join(EXPORT_FORMATS)}] [{filters}]",
+            )
+            return
+
+    # write rows to a temp file as they arrive - memory stays flat regardless of user count
+    count = 0
+    file = tempfile.NamedTemporaryFile(
+        "w", suffix=f".{export_format}", delete=False, encoding="utf-8", newline=""
+    )
+    path = file.name
+    try:
+        with file:
+            writer = csv.DictWriter(file, fieldnames=USER_EXPORT_FIELDS)
+            if export_format == "csv":
+                writer.writeheader()
+            async for user in db_manager.stream_users(user_filter):
+                if export_format == "csv":
+                    writer.writerow({k: _format_value(user.get(k)) for k in USER_EXPORT_FIELDS})
+                else:
+                    file.write(json.dumps(user, default=str, ensure_ascii=False) + "\n")
+                count += 1
+
+        filename = f"users_{user_filter or 'all'}_{datetime.now():%Y%m%d_%H%M}.{export_format}"
+        await message.answer_document(
+            FSInputFile(path, filename=filename),
+            caption=f"Exported {count} users (filter: {user_filter or 'none'})",
+        )
+    finally:
+        os.remove(path)
+
+
+@add_admin_command("compact_feedings", "Copy feedings into per user-month buckets")
+@router.message(Command("compact_feedings"))
+async def compact_feedings_command(message: Message) -> None:
+    if not is_admin(message):
+        await reply_safe(message, "You are not authorized to use this command.")
+        return
+    from src.migrations import compact_feedings
+
+    await reply_safe(message, "Compacting feedings into buckets...")
+    stats = await compact_feedings(db_manager.db)
+    await reply_safe(
+        message,
+        f"Done: {stats['feedings']} feedings in {stats['buckets']} bucket updates.\n"
+        "Set FEEDINGS_LAYOUT=bucketed and restart to switch to the new layout.",
+    )
+
+
+@add_admin_command("usage_report", "Feeding regularity across all users: [days]")
+@router.message(Command("usage_report"))
+async def usage_report(message: Message, command: CommandObject) -> None:
+    if not is_admin(message):
+        await reply_safe(message, "You are not authorized to use this command.")
+        return
+    # numpy is only needed here - keep it out of the bot's import path
+    from src.analytics import build_usage_report
+
+    days = max(1, int(command.args)) if command.args and command.args.isdigit() else 30
+    report = await build_usage_report(days=days)
+    await reply_safe(message, report.format())
+
+
+@add_admin_command("delivery_health", "Delivery outcomes and auto-paused users")
+@router.message(Command("delivery_health"))
+async def delivery_health(message: Message) -> None:
+    if not is_admin(message):
+        await reply_safe(message, "You are not authorized to use this command.")
+        return
+    from src.delivery import OUTCOMES
+
+    health = await db_manager.get_delivery_health(OUTCOMES)
+    if not health:
+        await reply_safe(message, "No deliveries recorded yet.")
+        return
+    lines = [f"Delivery health ({health['users']} users):"]
+    lines.extend(f"{outcome}: {health.get(outcome, 0)}" for outcome in OUTCOMES)
+    lines.append(f"\nFailing right now: {health['failing']}")
+    lines.append(f"Auto-paused: {health['paused']}")
+    await reply_safe(message, "\n".join(lines))
+
+
+@add_admin_command("loop_lag", "Event loop lag since startup")
+@router.message(Command("loop_lag"))
+async def loop_lag(message: Message) -> None:
+    if not is_admin(message):
+        await reply_safe(message, "You are not authorized to use this command.")
+        return
+    from src.loop_monitor import get_loop_monitor
+
+    monitor = get_loop_monitor()
+    if monitor is None:
+        await reply_safe(message, "Event loop monitor is off (LOOP_MONITOR=false).")
+        return
+    await reply_safe(
+        message,
+        f"Max event loop lag: {monitor.max_lag * 1000:.0f} ms\n"
+        f"Stalls over {monitor.threshold * 1000:.0f} ms: {monitor.stalls}",
+    )
+
+
+@add_admin_command("broadcast", "Send a message to all users: [text]")
+@router.message(Command("broadcast"))
+async def broadcast(message: Message, command: CommandObject) -> None:
+    """Send a message to every user - resumes after a restart"""
+    if not is_admin(message):
+        await reply_safe(message, "You are not authorized to use this command.")
+        return
     assert message.from_user is not None
-    if message.from_user.id != int(os.getenv("ADMIN_USER_ID", 0)):
-        await reply_safe(message, "You are not authorized to use this command.")
-        return
-    db = get_database()
-    users = await db.users.find().to_list(length=100)
-    users_formatted = [User.model_validate(user) for user in users]
-    # todo: format the output better
-    # class User(BaseModel):
-    #     user_id: int
-    #     chat_id: int
-    #     username: Optional[str]
-    #     full_name: str
-    #     timezone: Optional[str] = None
-    #     partners: list[int] = []
-    #     created_at: datetime
-    #     updated_at: datetime
-    user_list = ""
-
-    for user in users_formatted:
-        user_list += f"@{user.username} ({user.user_id}) - {user.full_name}\n"
-    await reply_safe(message, f"Users: {user_list}")
+    from src.broadcast import start_broadcast
+
+    if not command.args:
+        await reply_safe(message, "Usage: /broadcast <text>")
+        return
+    created = await db_manager.create_broadcast(command.args, message.from_user.id)
+    if created is None:
+        await reply_safe(message, "A broadcast is already running, see /broadcast_status.")
+        return
+    start_broadcast(created)
+    await reply_safe(message, "Broadcast started. Progress: /broadcast_status")
+
+
+@add_admin_command("broadcast_status", "Progress of the latest broadcast")
+@router.message(Command("broadcast_status"))
+async def broadcast_status(message: Message) -> None:
+    if not is_admin(message):
+        await reply_safe(message, "You are not authorized to use this command.")
+        return
+    latest = await db_manager.get_latest_broadcast()
+    if latest is None:
+        await reply_safe(message, "No broadcasts yet.")
+        return
+    elapsed = (latest["updated_at"] - latest["created_at"]).total_seconds()
+    processed = latest["sent"] + latest["failed"]
+    await reply_safe(
+        message,
+        f"Broadcast from {latest['created_at']:%Y-%m-%d %H:%M}: {latest['status']}\n"
+        f"Sent: {latest['sent']}, failed: {latest['failed']}\n"
+        f"Throughput: {processed / max(elapsed, 1):.1f} msg/s",
+    )
+
+
+@add_admin_command("broadcast_cancel", "Stop the running broadcast")
+@router.message(Command("broadcast_cancel"))
+async def broadcast_cancel(message: Message) -> None:
+    if not is_admin(message):
+        await reply_safe(message, "You are not authorized to use this command.")
+        return
+    from src.broadcast import cancel_broadcast
+
+    running = await db_manager.get_running_broadcasts()
+    for item in running:
+        await cancel_broadcast(item)
+    await reply_safe(message, "Broadcast cancelled." if running else "No broadcast is running.")
@@ -8,7 +8,7 @@ SCHEDULES = {
     "2 times": ["08:00", "20:00"],
     "3 times": ["08:00", "14:00", "20:00"],
     "4 times": ["08:00", "12:00", "16:00", "20:00"],
-    "Manual": None,  # Not implemented yet
+    "Manual": None,  # times are entered by the user
 }
 
 db_manager = DatabaseManager()
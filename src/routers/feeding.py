@@ -1,31 +1,59 @@
+import asyncio
 import json
 import random
 from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Optional
 from zoneinfo import ZoneInfo
 
 from aiogram import Router
+from aiogram.exceptions import TelegramAPIError
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 from botspot.components.ask_user_handler import ask_user_raw
 from botspot.components.bot_commands_menu import add_command
-from botspot.utils import reply_safe, send_safe
+from botspot.utils import reply_safe
 from loguru import logger
 
+from src.delivery import OUTCOME_DELIVERED, record_delivery, record_failure, send_tracked
+from src.namespace import get_namespace
 from src.routers.common import db_manager
-from src.utils import create_state, repo_root
+from src.utils import RecentKeys, create_state, repo_root
 from src.utils.timezone_utils import get_user_local_time
 
 router = Router()
 
 
+@lru_cache(maxsize=1)
+def load_responses() -> Dict[str, Any]:
+    """Reply texts from resources/responses.json - read once, not on every /fed"""
+    with open(repo_root / "src" / "resources" / "responses.json", encoding="utf-8") as file:
+        return json.load(file)
+
+
+# (namespace, chat_id, message_id) of recently handled feeding messages - redelivered updates
+# stop here, the unique source index in mongo catches whatever slips through. Chat and
+# message ids repeat across hosted bots, see src.namespace
+recent_feedings = RecentKeys()
+
+
+# household id -> set when a member registers a feeding while a shared reminder is open
+open_household_reminders: Dict[Any, asyncio.Event] = {}
+
+
 async def send_reminder(
-    chat_id: int, reschedule_if_missed: bool = True, log_reminder: bool = True
+    chat_id: int,
+    reschedule_if_missed: bool = True,
+    log_reminder: bool = True,
+    whole_household: bool = True,
 ) -> None:
-    """Send feeding reminder"""
+    """Send feeding reminder
+
+    chat_id owns the schedule; if they own a household, every member is reminded at once.
+    """
     # Get user's timezone for logging
-    user = await db_manager.get_user(chat_id)
-    timezone = user.get("timezone") if user else None
+    timezone = await db_manager.get_cached_timezone(chat_id)
 
     now = datetime.now(ZoneInfo("UTC"))
     if timezone:
@@ -55,14 +83,26 @@ async def send_reminder(
     # step 3: if no (timeout) -> remind in 1 hour?
     # bonus: track last fed time (per user) and if recently - cancel the next reminder
 
+    if whole_household:
+        household = await db_manager.get_cached_household(chat_id)
+        if household is not None and len(household["members"]) > 1:
+            await remind_household(chat_id, household, reschedule_if_missed, log_reminder)
+            return
+
     # step 1: ask user something like 'did you feed your cat?'
     state = create_state(chat_id)
-    response = await ask_user_raw(
-        chat_id=chat_id,
-        question="Time to feed your cat! Did you?",
-        state=state,
-        timeout=300.0,
-    )
+    try:
+        response = await ask_user_raw(
+            chat_id=chat_id,
+            question="Time to feed your cat! Did you?",
+            state=state,
+            timeout=300.0,
+        )
+    except TelegramAPIError as e:
+        # blocked bot / deleted chat - counted, and the user is paused after a few in a row
+        await record_failure(chat_id, e)
+        return
+    await record_delivery(chat_id, OUTCOME_DELIVERED)
 
     if response is not None:
         await register_meal(response, state=state, log_reminder=log_reminder)
@@ -74,60 +114,155 @@ async def send_reminder(
         if reschedule_if_missed:
             reply_text += " Will remind again in 1 hour."
             await schedule_reminder(chat_id, timestamp=datetime.now() + timedelta(hours=1))
-        await send_safe(chat_id, reply_text)
+        await send_tracked(chat_id, reply_text)
+
+
+async def ask_member(member_id: int, state: FSMContext) -> Optional[Message]:
+    """Reminder prompt for one household member - None on timeout or failed delivery"""
+    try:
+        response = await ask_user_raw(
+            chat_id=member_id,
+            question="Time to feed your cat! Did you?",
+            state=state,
+            timeout=300.0,
+        )
+    except TelegramAPIError as e:
+        await record_failure(member_id, e)
+        return None
+    await record_delivery(member_id, OUTCOME_DELIVERED)
+    return response
+
+
+async def remind_household(
+    chat_id: int, household: Dict[str, Any], reschedule_if_missed: bool, log_reminder: bool
+) -> None:
+    """One reminder for the whole household - the first answer or /fed resolves it for all"""
+    members = household["members"]
+    states = {member_id: create_state(member_id) for member_id in members}
+    asks = {
+        asyncio.create_task(ask_member(member_id, states[member_id])): member_id
+        for member_id in members
+    }
+    resolved = open_household_reminders.setdefault(household["_id"], asyncio.Event())
+    resolved_wait = asyncio.create_task(resolved.wait())
+
+    response = None
+    pending = set(asks)
+    try:
+        while pending and response is None and not resolved.is_set():
+            done, _ = await asyncio.wait(
+                pending | {resolved_wait}, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done - {resolved_wait}:
+                pending.discard(task)
+                if response is None and task.result() is not None:
+                    response = task.result()
+    finally:
+        resolved_wait.cancel()
+        open_household_reminders.pop(household["_id"], None)
+        for task in pending:
+            task.cancel()
+            # a cancelled prompt leaves the member's conversation state behind
+            await states[asks[task]].clear()
+
+    if response is not None:
+        await register_meal(response, state=states[response.chat.id], log_reminder=log_reminder)
+        return
+    if resolved.is_set():
+        # a member used /fed meanwhile - register_meal already told everybody
+        return
+
+    from src.routers.schedule import schedule_reminder
+
+    reply_text = "Time's up!"
+    if reschedule_if_missed:
+        reply_text += " Will remind again in 1 hour."
+        await schedule_reminder(chat_id, timestamp=datetime.now() + timedelta(hours=1))
+    await asyncio.gather(*(send_tracked(member_id, reply_text) for member_id in members))
+
+
+async def notify_household(household: Dict[str, Any], message: Message) -> None:
+    """Resolve an open household reminder and tell the other members"""
+    assert message.from_user is not None
+    resolved = open_household_reminders.get(household["_id"])
+    if resolved is not None:
+        resolved.set()
+    text = f"🐱 {message.from_user.full_name} fed the cat, no need to do it again"
+    await asyncio.gather(
+        *(
+            send_tracked(member_id, text)
+            for member_id in household["members"]
+            if member_id != message.from_user.id
+        )
+    )
 
 
 @add_command("fed", "Register a feeding")
 @router.message(Command("fed"))
 async def register_meal(message: Message, state: FSMContext, log_reminder: bool = True) -> None:
     """Register a feeding"""
-    # Get user's current schedule
     assert message.from_user is not None
-    user_schedule = await db_manager.get_user_schedule(message.from_user.id)
-    schedule_type = user_schedule["type"] if user_schedule else "manual"
-
-    # Todo: check for 'yes' or 'no' in the response using gpt
-    # Todo: add a button or command. Command should be /fed. good for now
-
-    # Get response message
-    responses_path = repo_root / "src" / "resources" / "responses.json"
-    with open(responses_path, encoding="utf-8") as file:
-        responses = json.load(file)
-
-    reply_text = random.choice(responses["feed_success"])
-
-    photo_id = None
-    video_id = None
-    if message.photo:
-        photo_id = message.photo[-1].file_id
-        reply_text += "\nWow, you added a photo! "
-    elif message.video:
-        video_id = message.video.file_id if message.video else None
-        reply_text += "\nWow, you added a VIIDEEO!!!"
-    else:
-        new_message = await ask_user_raw(message.chat.id, "No photo though? :(", state=state)
-        if new_message is not None:
-            if new_message.photo:
-                photo_id = new_message.photo[-1].file_id
-                reply_text += "\nNice pic!"
-            if new_message.video:
-                video_id = new_message.video.file_id
-                reply_text += "\nNice vid!"
+    source = (message.chat.id, message.message_id)
+    key = (get_namespace(), *source)
+    if log_reminder and not recent_feedings.add(key):
+        logger.debug(f"Feeding message {source} was already handled, ignoring")
+        return
+
+    # marked before the write, so a redelivery during the photo prompt is dropped - but until
+    # the feeding is logged, a retry of the same message has to go through
+    try:
+        # Get user's current schedule - the household's one for members. Cached, like the
+        # feeding write is journaled: /fed works while Mongo is down
+        household = await db_manager.get_cached_household(message.from_user.id)
+        owner_id = household["owner_id"] if household else message.from_user.id
+        schedule_type = await db_manager.get_cached_schedule_type(owner_id) or "manual"
+
+        # Todo: check for 'yes' or 'no' in the response using gpt
+        # Todo: add a button or command. Command should be /fed. good for now
+
+        # Get response message
+        reply_text = random.choice(load_responses()["feed_success"])
+
+        photo_id = None
+        video_id = None
+        if message.photo:
+            photo_id = message.photo[-1].file_id
+            reply_text += "\nWow, you added a photo! "
+        elif message.video:
+            video_id = message.video.file_id if message.video else None
+            reply_text += "\nWow, you added a VIIDEEO!!!"
         else:
-            reply_text = "Just text then... Anyways, " + reply_text.lower()
+            new_message = await ask_user_raw(message.chat.id, "No photo though? :(", state=state)
+            if new_message is not None:
+                if new_message.photo:
+                    photo_id = new_message.photo[-1].file_id
+                    reply_text += "\nNice pic!"
+                if new_message.video:
+                    video_id = new_message.video.file_id
+                    reply_text += "\nNice vid!"
+            else:
+                reply_text = "Just text then... Anyways, " + reply_text.lower()
 
-    # todo: record the timestamp - ask user if there's custom time
+        # todo: record the timestamp - ask user if there's custom time
 
-    # Log the feeding - save timestamp
-    if log_reminder:
-        await db_manager.log_feeding(
-            user_id=message.from_user.id,
-            schedule_type=schedule_type,
-            photo_id=photo_id,
-            video_id=video_id,
-        )
+        # Log the feeding - save timestamp
+        if log_reminder:
+            await db_manager.log_feeding(
+                user_id=message.from_user.id,
+                schedule_type=schedule_type,
+                photo_id=photo_id,
+                video_id=video_id,
+                source=source,
+                schedule_owner_id=owner_id,
+            )
+    except BaseException:  # cancellation too - nothing was logged either way
+        if log_reminder:
+            recent_feedings.discard(key)
+        raise
 
     await reply_safe(message, reply_text)
+    if household is not None and log_reminder:
+        await notify_household(household, message)
     # bonus: track last fed time (per user) and if recently - cancel the next reminder
 
     # todo: send the photo to other responsible people
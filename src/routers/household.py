@@ -0,0 +1,88 @@
+import asyncio
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from botspot.components.bot_commands_menu import add_command
+from botspot.utils import reply_safe
+from pymongo.errors import DuplicateKeyError
+
+from src.delivery import send_tracked
+from src.routers.common import db_manager
+from src.routers.schedule import clear_user_schedule
+
+router = Router()
+
+
+@add_command("household", "Share one feeding schedule with your household")
+@router.message(Command("household"))
+async def household_command(message: Message) -> None:
+    """Show the user's household, creating one if needed"""
+    assert message.from_user is not None
+    household = await db_manager.create_household(message.from_user.id)
+    members = len(household["members"])
+    await reply_safe(
+        message,
+        f"Your household has {members} member{'s' if members != 1 else ''}.\n"
+        "Everybody gets the same reminders, and the first /fed counts for all.\n\n"
+        f"To invite someone, ask them to send:\n/join_household {household['_id']}",
+    )
+
+
+@add_command("join_household", "Join a household: [invite code]")
+@router.message(Command("join_household"))
+async def join_household_command(message: Message, command: CommandObject) -> None:
+    """Join a household by its invite code"""
+    assert message.from_user is not None
+    user_id = message.from_user.id
+    if not command.args:
+        await reply_safe(message, "Usage: /join_household <invite code>")
+        return
+    if await db_manager.get_household(user_id) is not None:
+        await reply_safe(message, "You are already in a household, use /leave_household first.")
+        return
+
+    try:
+        household = await db_manager.join_household(command.args.strip(), user_id)
+    except DuplicateKeyError:
+        household = None
+    if household is None:
+        await reply_safe(message, "Invalid invite code.")
+        return
+
+    # the household schedule replaces the member's own one
+    clear_user_schedule(user_id)
+    await db_manager.save_user_schedule(user_id, "stopped", [])
+
+    await reply_safe(
+        message, "You joined the household - you'll get the household's reminders from now on."
+    )
+    await send_tracked(
+        household["owner_id"], f"🐱 {message.from_user.full_name} joined your household"
+    )
+
+
+@add_command("leave_household", "Leave your household")
+@router.message(Command("leave_household"))
+async def leave_household_command(message: Message) -> None:
+    """Leave the household; the owner leaving dissolves it"""
+    assert message.from_user is not None
+    user_id = message.from_user.id
+    household = await db_manager.leave_household(user_id)
+    if household is None:
+        await reply_safe(message, "You are not in a household.")
+        return
+
+    if household["owner_id"] == user_id:
+        others = [member_id for member_id in household["members"] if member_id != user_id]
+        await asyncio.gather(
+            *(
+                send_tracked(
+                    member_id, "The household was dissolved. Use /setup to create your schedule."
+                )
+                for member_id in others
+            )
+        )
+        await reply_safe(message, "Household dissolved, your schedule stays as it is.")
+        return
+    await reply_safe(message, "You left the household. Use /setup to create your own schedule.")
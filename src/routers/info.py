@@ -13,11 +13,14 @@ from botspot.components.bot_commands_menu import Visibility, add_command
 from botspot.utils import reply_safe
 
 from src.database import DatabaseManager
+from src.db_policies import OP_STATS_READ
 from src.utils.timezone_utils import get_timezone_obj, get_user_local_time
 
 router = Router()
 db_manager = DatabaseManager()
 
+FEEDING_STATS_FIELDS = ("timestamp", "photo_id", "video_id")
+
 
 @add_command("stats", "Show your feeding statistics")
 @router.message(Command("stats"))
@@ -26,19 +29,21 @@ async def show_stats(message: Message) -> None:
     assert message.from_user is not None
 
     # Get user's timezone
-    user = await db_manager.get_user(message.from_user.id)
+    user = await db_manager.get_user_record(message.from_user.id, ("timezone",))
 
-    timezone = user.get("timezone") if user else "UTC"
+    timezone = (user.timezone if user else None) or "UTC"
 
     now = get_user_local_time(timezone)
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
     week_start = today_start - timedelta(days=today_start.weekday())
 
-    feedings = await db_manager.get_user_feedings(message.from_user.id)
+    feedings = await db_manager.get_feeding_records(
+        message.from_user.id, FEEDING_STATS_FIELDS, op=OP_STATS_READ
+    )
 
     utc = ZoneInfo("UTC")
-    today_feedings = [f for f in feedings if f["timestamp"].replace(tzinfo=utc) >= today_start]
-    week_feedings = [f for f in feedings if f["timestamp"].replace(tzinfo=utc) >= week_start]
+    today_feedings = [f for f in feedings if f.timestamp.replace(tzinfo=utc) >= today_start]
+    week_feedings = [f for f in feedings if f.timestamp.replace(tzinfo=utc) >= week_start]
 
     # Calculate stats
     stats_text = (
@@ -46,8 +51,8 @@ async def show_stats(message: Message) -> None:
         f"Today: {len(today_feedings)} feedings\n"
         f"This week: {len(week_feedings)} feedings\n"
         f"Total: {len(feedings)} feedings\n\n"
-        f"Photos shared: {sum(1 for f in feedings if f.get('photo_id'))}\n"
-        f"Videos shared: {sum(1 for f in feedings if f.get('video_id'))}"
+        f"Photos shared: {sum(1 for f in feedings if f.photo_id)}\n"
+        f"Videos shared: {sum(1 for f in feedings if f.video_id)}"
     )
 
     await reply_safe(message, stats_text)
@@ -60,17 +65,19 @@ async def show_full_stats(message: Message) -> None:
     assert message.from_user is not None
 
     # Get user's timezone
-    user = await db_manager.get_user(message.from_user.id)
-    timezone = user.get("timezone") if user else "UTC"
+    user = await db_manager.get_user_record(message.from_user.id, ("timezone",))
+    timezone = (user.timezone if user else None) or "UTC"
     tz = get_timezone_obj(timezone)
 
-    feedings = await db_manager.get_user_feedings(message.from_user.id)
+    feedings = await db_manager.get_feeding_records(
+        message.from_user.id, FEEDING_STATS_FIELDS, op=OP_STATS_READ
+    )
     if not feedings:
         await reply_safe(message, "No feeding history found.")
         return
 
     # Sort feedings by timestamp
-    feedings.sort(key=lambda x: x["timestamp"], reverse=True)
+    feedings.sort(key=lambda x: x.timestamp, reverse=True)
 
     # Generate detailed stats
     stats_text = "📊 <b>Detailed Feeding Statistics</b>\n\n"
@@ -78,11 +85,11 @@ async def show_full_stats(message: Message) -> None:
     # Last 5 feedings
     stats_text += "<b>Recent Feedings:</b>\n"
     for feeding in feedings[:5]:
-        timestamp = feeding["timestamp"].astimezone(tz)
+        timestamp = feeding.timestamp.astimezone(tz)
         media = ""
-        if feeding.get("photo_id"):
+        if feeding.photo_id:
             media = " 📷"
-        elif feeding.get("video_id"):
+        elif feeding.video_id:
             media = " 🎥"
         stats_text += f"- {timestamp.strftime('%Y-%m-%d %H:%M')}{media}\n"
 
@@ -94,18 +101,18 @@ async def show_full_stats(message: Message) -> None:
         day_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
         day_end = day_start + timedelta(days=1)
         day_feedings = [
-            f for f in feedings if day_start <= f["timestamp"].replace(tzinfo=utc) < day_end
+            f for f in feedings if day_start <= f.timestamp.replace(tzinfo=utc) < day_end
         ]
 
         day_name = "Today" if i == 0 else "Yesterday" if i == 1 else date.strftime("%A")
         stats_text += f"- {day_name}: {len(day_feedings)} feedings\n"
 
     # Schedule info
-    user_schedule = await db_manager.get_user_schedule(message.from_user.id)
+    user_schedule = await db_manager.get_schedule_record(message.from_user.id, ("type", "times"))
     if user_schedule:
-        stats_text += f"\n<b>Current Schedule:</b> {user_schedule['type']}\n"
-        if user_schedule.get("times"):
-            stats_text += f"Times: {', '.join(user_schedule['times'])}\n"
+        stats_text += f"\n<b>Current Schedule:</b> {user_schedule.type}\n"
+        if user_schedule.times:
+            stats_text += f"Times: {', '.join(user_schedule.times)}\n"
 
     await reply_safe(message, stats_text)
 
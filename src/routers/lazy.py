@@ -0,0 +1,47 @@
+"""
+Lazy routers - import a router module only when one of its commands is used
+
+The stub router only knows the command names. On the first matching message it
+imports the real module and hands the event over to the real router, so rarely
+used routers (dev, admin) don't slow down startup.
+"""
+
+import importlib
+from typing import Any, Dict, Optional
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+from botspot.components.bot_commands_menu import add_admin_command, add_hidden_command
+from loguru import logger
+
+from src.startup_report import measure_import
+
+MENU_REGISTRARS = {"admin": add_admin_command, "hidden": add_hidden_command}
+
+
+class LazyRouter(Router):
+    def __init__(self, module: str, commands: Dict[str, str], visibility: str) -> None:
+        """
+        module: module with a `router` attribute
+        commands: command -> description, registered in the commands menu right away
+        visibility: "admin" or "hidden"
+        """
+        super().__init__(name=f"lazy:{module}")
+        self.module = module
+        self._router: Optional[Router] = None
+
+        register = MENU_REGISTRARS[visibility]
+        for command, description in commands.items():
+            register(command, description)(self._dispatch)
+        self.message.register(self._dispatch, Command(*commands))
+
+    def load(self) -> Router:
+        if self._router is None:
+            with measure_import(self.module):
+                self._router = importlib.import_module(self.module).router
+            logger.debug(f"Lazily loaded router {self.module}")
+        return self._router
+
+    async def _dispatch(self, message: Message, **kwargs: Any) -> Any:
+        return await self.load().propagate_event("message", message, **kwargs)
@@ -1,27 +1,37 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
-from botspot import ask_user_choice
+from apscheduler.job import Job
+from botspot import ask_user, ask_user_choice
 from botspot.components.bot_commands_menu import add_command
 from botspot.utils import get_scheduler, reply_safe
 from loguru import logger
 
+from src.namespace import get_job_id, get_job_namespace, get_namespace, in_namespace
 from src.routers.common import SCHEDULES, db_manager
 from src.routers.feeding import send_reminder
-from src.utils.timezone_utils import convert_time_to_gmt
+from src.utils.timezone_utils import (
+    convert_minutes_to_utc,
+    convert_time_to_gmt,
+    format_minute_of_day,
+    get_effective_timezone,
+    parse_time_of_day,
+)
 
 router = Router()
 
+MAX_MANUAL_TIMES = 12
+
 
 @add_command("setup", "Setup feeding schedule")
 @router.message(Command("setup"))
 async def setup_schedule(message: Message, state: FSMContext) -> None:
     """Setup feeding schedule"""
-    choices = {k: f"{k} - {v}" for k, v in SCHEDULES.items()}
+    choices = {k: f"{k} - {v or 'pick your own times'}" for k, v in SCHEDULES.items()}
     choices["Cancel"] = "Cancel"
     choice = await ask_user_choice(message.chat.id, "Pick a schedule", choices, state, timeout=None)
 
@@ -29,21 +39,25 @@ async def setup_schedule(message: Message, state: FSMContext) -> None:
         return
 
     if choice == "Manual":
-        await reply_safe(message, "Manual schedule setup is not implemented yet.")
-        return
-
-    schedule = SCHEDULES[choice]
+        schedule = await ask_manual_times(message, state)
+        if schedule is None:
+            return
+    else:
+        schedule = SCHEDULES[choice]
     assert message.from_user is not None
+    # household members share the owner's schedule - reminders run in the owner's timezone.
+    # Cached lookups and a journaled save: /setup works while Mongo is down
+    household = await db_manager.get_cached_household(message.from_user.id)
+    owner_id = household["owner_id"] if household else message.from_user.id
 
     # Clear existing schedule before setting up new one
-    clear_user_schedule(message.chat.id)
-
-    # Save new schedule to database
-    await db_manager.save_user_schedule(message.from_user.id, choice, schedule)
+    clear_user_schedule(owner_id)
 
     # Get user's timezone
-    user = await db_manager.get_user(message.from_user.id)
-    timezone = user.get("timezone") if user else None
+    timezone = await db_manager.get_cached_timezone(owner_id)
+
+    # Save new schedule to database
+    await db_manager.save_user_schedule(owner_id, choice, schedule, timezone)
 
     # Log schedule setup
     logger.debug(
@@ -57,16 +71,18 @@ async def setup_schedule(message: Message, state: FSMContext) -> None:
     # Add new jobs
     local_times = []
     for time in schedule:
-        hour, minute = map(int, time.split(":"))
-        local_times.append(f"{hour:02d}:{minute:02d}")
+        minute_of_day = parse_time_of_day(time)
+        assert minute_of_day is not None
+        hour, minute = divmod(minute_of_day, 60)
+        local_times.append(format_minute_of_day(minute_of_day))
 
         # No need to convert time - let the scheduler handle it
         await schedule_reminder(
-            chat_id=message.chat.id,
+            chat_id=owner_id,
             hour=hour,  # Pass local time
             minute=minute,
             reschedule_if_missed=True,
-            timezone=timezone,
+            timezone=get_effective_timezone(timezone),
         )
 
     # Log the final schedule
@@ -79,23 +95,56 @@ async def setup_schedule(message: Message, state: FSMContext) -> None:
     )
 
     # Show schedule to user
+    utc_note = "" if timezone else "\n\nNote: Times are in UTC. Use /timezone to set your timezone."
     await reply_safe(
         message,
-        f"Scheduled to feed your cat {choice} times per day"
+        f"Scheduled to feed your cat {len(local_times)} times per day"
         f"{f' (in your timezone {timezone})' if timezone else ''}:\n"
         f"{', '.join(local_times)}"
-        f"{'' if timezone else '\n\nNote: Times are in UTC. Use /timezone to set your timezone.'}",
+        f"{utc_note}",
     )
 
     # Send a test reminder right away
     await reply_safe(message, "Here's how the reminders will look:")
-    await send_reminder(message.chat.id, reschedule_if_missed=False, log_reminder=False)
+    await send_reminder(
+        message.chat.id, reschedule_if_missed=False, log_reminder=False, whole_household=False
+    )
+
+
+async def ask_manual_times(message: Message, state: FSMContext) -> Optional[List[str]]:
+    """Ask user for custom feeding times, returns sorted HH:MM list or None if cancelled"""
+    while True:
+        response = await ask_user(
+            chat_id=message.chat.id,
+            question=(
+                "Send your feeding times in HH:MM format, separated by spaces or commas\n"
+                "Example: 07:30 13:00 19:45\n"
+                "Type 'cancel' to cancel"
+            ),
+            state=state,
+            timeout=300.0,
+        )
+        if not response or response.strip().lower() == "cancel":
+            await reply_safe(message, "Schedule setup cancelled.")
+            return None
+
+        parts = response.replace(",", " ").split()
+        minutes = [parse_time_of_day(part) for part in parts]
+        if not parts or None in minutes:
+            await reply_safe(message, "Invalid time format. Please use HH:MM, e.g. 08:00 20:00")
+            continue
+        if len(set(minutes)) > MAX_MANUAL_TIMES:
+            await reply_safe(message, f"Too many times - up to {MAX_MANUAL_TIMES} per day please")
+            continue
+        return [format_minute_of_day(minute) for minute in sorted(set(minutes))]
 
 
 def clear_user_schedule(chat_id: int) -> None:
     """Clear all scheduled reminders for a user"""
     scheduler = get_scheduler()
     for job in scheduler.get_jobs():
+        if get_job_namespace(job.id) != get_namespace():
+            continue  # the same chat id in another hosted bot
         if f"_{chat_id}_" in job.id:
             scheduler.remove_job(job.id)
         elif chat_id in job.args or chat_id in job.kwargs.values():
@@ -122,9 +171,9 @@ async def schedule_reminder(
             f"Time until reminder: {timestamp - datetime.now()}"
         )
 
-        job_id = f"followup_{chat_id}_{timestamp.strftime('%Y%m%d_%H%M')}"
+        job_id = get_job_id(f"followup_{chat_id}_{timestamp.strftime('%Y%m%d_%H%M')}")
         scheduler.add_job(
-            send_reminder,
+            in_namespace(send_reminder),
             "date",
             run_date=timestamp,
             id=job_id,
@@ -145,15 +194,65 @@ async def schedule_reminder(
             f"GMT time: {gmt_hour:02d}:{gmt_minute:02d}"
         )
 
-        job_id = f"feed_{chat_id}_{hour:02d}:{minute:02d}"
-        scheduler.add_job(
-            send_reminder,
-            "cron",
-            hour=gmt_hour,
-            minute=gmt_minute,
-            id=job_id,
-            args=[chat_id],
-            kwargs={"reschedule_if_missed": reschedule_if_missed},
-        )
+        add_reminder_job(chat_id, hour, minute, gmt_hour, gmt_minute, reschedule_if_missed)
     else:
         raise ValueError("Either timestamp or hour and minute must be provided")
+
+
+def add_reminder_job(
+    chat_id: int,
+    hour: int,
+    minute: int,
+    gmt_hour: int,
+    gmt_minute: int,
+    reschedule_if_missed: bool = True,
+) -> None:
+    """Arm a daily reminder job - local time goes into the job id, GMT time into the trigger"""
+    get_scheduler().add_job(
+        in_namespace(send_reminder),
+        "cron",
+        hour=gmt_hour,
+        minute=gmt_minute,
+        id=get_job_id(f"feed_{chat_id}_{hour:02d}:{minute:02d}"),
+        args=[chat_id],
+        kwargs={"reschedule_if_missed": reschedule_if_missed},
+        replace_existing=True,
+    )
+
+
+def get_job_utc_minute(job: Job) -> int:
+    """UTC minute of day a daily reminder job fires at (from its cron trigger)"""
+    fields = {field.name: str(field) for field in job.trigger.fields}
+    return int(fields["hour"]) * 60 + int(fields["minute"])
+
+
+def sync_user_reminders(chat_id: int, minutes: List[int], timezone: Optional[str]) -> bool:
+    """Make the user's daily reminder jobs match the given local minutes of day
+
+    Jobs that already fire at the right UTC time are left alone, follow-ups are not touched.
+    Returns True if any job was added or removed.
+    """
+    scheduler = get_scheduler()
+    prefix = get_job_id(f"feed_{chat_id}_")
+    wanted = {
+        f"{prefix}{format_minute_of_day(minute)}": (minute, utc_minute)
+        for minute, utc_minute in zip(minutes, convert_minutes_to_utc(minutes, timezone))
+    }
+    changed = False
+    for job in scheduler.get_jobs():
+        if not job.id.startswith(prefix):
+            continue
+        target = wanted.get(job.id)
+        if target is not None and get_job_utc_minute(job) == target[1]:
+            del wanted[job.id]
+            continue
+        if target is None:
+            scheduler.remove_job(job.id)
+            changed = True
+
+    for minute, utc_minute in wanted.values():
+        hour, local_minute = divmod(minute, 60)
+        gmt_hour, gmt_minute = divmod(utc_minute, 60)
+        add_reminder_job(chat_id, hour, local_minute, gmt_hour, gmt_minute)
+        changed = True
+    return changed
@@ -1,21 +1,36 @@
 from datetime import datetime
+from typing import Optional
 from zoneinfo import ZoneInfo
 
-from aiogram import Router
+from aiogram import F, Router
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message
-from botspot import ask_user
+from aiogram.types import (
+    KeyboardButton,
+    Location,
+    Message,
+    ReplyKeyboardMarkup,
+    ReplyKeyboardRemove,
+)
+from botspot.components.ask_user_handler import ask_user_raw
 from botspot.components.bot_commands_menu import add_command
 from botspot.utils import reply_safe
 from loguru import logger
 
 from src.routers.common import db_manager
+from src.schedule_sync import rearm_user
 from src.utils import create_state
-from src.utils.timezone_utils import get_user_local_time, parse_timezone_offset
+from src.utils.timezone_locator import find_timezone, get_longitude_timezone
+from src.utils.timezone_utils import get_user_local_time, get_zoneinfo, parse_timezone_offset
 
 router = Router()
 
+LOCATION_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[[KeyboardButton(text="📍 Share my location", request_location=True)]],
+    resize_keyboard=True,
+    one_time_keyboard=True,
+)
+
 
 @add_command("timezone", "Set your timezone")
 @router.message(Command("timezone"))
@@ -24,44 +39,74 @@ async def timezone_setup(message: Message, state: FSMContext) -> None:
     await setup_timezone(message)
 
 
-async def setup_timezone(message: Message, timezone_str=None) -> None:
+async def setup_timezone(
+    message: Message, timezone_str=None, location: Optional[Location] = None
+) -> None:
     """Ask user for timezone and save it"""
     state = create_state(message.chat.id)
 
     while True:
-        if timezone_str is None:
-            response = await ask_user(
+        if timezone_str is None and location is None:
+            await message.answer(
+                "Tap the button below to share your location - your timezone is detected "
+                "from it, daylight saving time included.",
+                reply_markup=LOCATION_KEYBOARD,
+            )
+            # raw message - the answer may be a location instead of text
+            response = await ask_user_raw(
                 chat_id=message.chat.id,
                 question=(
-                    "Please enter your timezone in GMT±HH:MM format\n"
-                    "Examples: GMT+3, GMT+03:00, GMT-5:30\n"
+                    "Or enter your timezone in GMT±HH:MM format or as a region/city\n"
+                    "Examples: GMT+3, GMT+03:00, GMT-5:30, Europe/Berlin\n"
+                    "Region/city timezones follow daylight saving time\n"
                     "Type 'cancel' to cancel"
                 ),
                 state=state,
                 timeout=300.0,
             )
 
-            if not response or response.lower() == "cancel":
-                await reply_safe(message, "Timezone setup cancelled.")
+            if response is not None and response.location is not None:
+                location = response.location
+            elif response is None or not response.text or response.text.lower() == "cancel":
+                await message.answer(
+                    "Timezone setup cancelled.", reply_markup=ReplyKeyboardRemove()
+                )
                 return
-
-            timezone_str = response.strip()
-        timezone_offset = parse_timezone_offset(timezone_str)
-
-        if timezone_offset is None:
+            else:
+                timezone_str = response.text.strip()
+        if location is not None:
+            timezone_str = await find_timezone(location.latitude, location.longitude)
+            if timezone_str is None:
+                timezone_str = await confirm_longitude_timezone(message, state, location)
+                if timezone_str is None:
+                    await message.answer(
+                        "Timezone setup cancelled.", reply_markup=ReplyKeyboardRemove()
+                    )
+                    return
+            location = None
+        zone = get_zoneinfo(timezone_str)
+        timezone_offset = parse_timezone_offset(timezone_str) if zone is None else None
+
+        if zone is None and timezone_offset is None:
             await reply_safe(
                 message,
-                "Invalid timezone format. Please use GMT±HH:MM format.\n"
-                "Examples: GMT+3, GMT+03:00, GMT-5:30",
+                "Invalid timezone format. Please use GMT±HH:MM format or a region/city.\n"
+                "Examples: GMT+3, GMT+03:00, GMT-5:30, Europe/Berlin",
             )
+            timezone_str = None
             continue
 
-        hours, minutes = timezone_offset
-        formatted_timezone = f"GMT{'+' if hours >= 0 else ''}{hours:02d}:{abs(minutes):02d}"
+        if zone is not None:
+            formatted_timezone = zone.key
+        else:
+            hours, minutes = timezone_offset
+            formatted_timezone = f"GMT{'+' if hours >= 0 else ''}{hours:02d}:{abs(minutes):02d}"
 
         # Save to database
         assert message.from_user is not None
         await db_manager.update_user_timezone(message.from_user.id, formatted_timezone)
+        # move the reminders right away - the schedule sync would otherwise catch up later
+        await rearm_user(message.from_user.id)
 
         # Get current time in user's timezone
         user_time = get_user_local_time(formatted_timezone)
@@ -74,9 +119,39 @@ async def setup_timezone(message: Message, timezone_str=None) -> None:
             f"Calculated user time: {user_time}\n"
         )
 
-        await reply_safe(
-            message,
+        await message.answer(
             f"Timezone set to {formatted_timezone}\n"
             f"Your current time should be around {user_time.strftime('%H:%M')}",
+            reply_markup=ReplyKeyboardRemove(),
         )
         return
+
+
+@router.message(F.location)
+async def location_handler(message: Message) -> None:
+    """A location shared outside of the timezone prompt - set the timezone from it"""
+    assert message.location is not None
+    await setup_timezone(message, location=message.location)
+
+
+async def confirm_longitude_timezone(
+    message: Message, state: FSMContext, location: Location
+) -> Optional[str]:
+    """No boundary data covers the location - let the user accept the rough offset or type one"""
+    estimate = get_longitude_timezone(location.longitude)
+    response = await ask_user_raw(
+        chat_id=message.chat.id,
+        question=(
+            "Couldn't pinpoint the timezone of this location. By longitude alone it is about "
+            f"{estimate}, without daylight saving time - local time may differ.\n"
+            "Reply 'yes' to use it, or enter your timezone as a region/city or GMT±HH:MM\n"
+            "Examples: Asia/Kolkata, Europe/Madrid, GMT+5:30\n"
+            "Type 'cancel' to cancel"
+        ),
+        state=state,
+        timeout=300.0,
+    )
+    if response is None or not response.text or response.text.lower() == "cancel":
+        return None
+    answer = response.text.strip()
+    return estimate if answer.lower() == "yes" else answer
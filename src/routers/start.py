@@ -44,12 +44,13 @@ async def command_start_handler(message: Message, state: FSMContext) -> None:
 @add_command("stop", "Stop all reminders")
 @router.message(Command("stop"))
 async def stop_command(message: Message) -> None:
-    """Stop all reminders for the user"""
-    clear_user_schedule(message.chat.id)
-
+    """Stop all reminders for the user (for the whole household, if they are in one)"""
     assert message.from_user is not None
+    owner_id = await db_manager.get_schedule_owner_id(message.from_user.id)
+    clear_user_schedule(owner_id)
+
     # Update user's schedule in database
-    await db_manager.save_user_schedule(message.from_user.id, "stopped", [])
+    await db_manager.save_user_schedule(owner_id, "stopped", [])
 
     await reply_safe(
         message,
@@ -0,0 +1,199 @@
+"""
+Keep armed reminders in sync with Mongo without full reloads
+
+Watches change streams on `users` (timezone changes) and `schedules` (new times, deletes)
+and re-arms only the affected user's daily reminders - including edits made directly in
+Mongo, e.g. through mongo-express. Change streams need a replica set: on a standalone
+mongod (or with SCHEDULE_SYNC=poll) both collections are polled by their `updated_at`
+watermark instead. Polling does not see deleted schedules.
+
+Local single-node replica set to try the streams:
+    docker run -d -p 27017:27017 mongo --replSet rs0
+    docker exec <container> mongosh --eval "rs.initiate()"
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, List
+
+from botspot.utils import get_scheduler
+from loguru import logger
+from pymongo.errors import OperationFailure, PyMongoError
+
+from src.database import DatabaseManager
+from src.namespace import get_job_id
+from src.routers.schedule import sync_user_reminders
+from src.utils.timezone_utils import parse_time_of_day
+
+# "$changeStream is only supported on replica sets" / unknown stage on very old servers
+CHANGE_STREAMS_UNSUPPORTED = {40573, 40324}
+RETRY_SECONDS = 5
+
+USERS_PIPELINE = [
+    {
+        "$match": {
+            "$or": [
+                {"operationType": "replace"},
+                {
+                    "operationType": "update",
+                    "updateDescription.updatedFields.timezone": {"$exists": True},
+                },
+            ]
+        }
+    }
+]
+# feedings update schedules too (last_fed_at, overdue_at) - only react to the times.
+# utc_minutes alone is not watched: timezone changes come through users, and DST shifts
+# are re-armed in bulk by src.dst_rebalancer
+SCHEDULES_PIPELINE = [
+    {
+        "$match": {
+            "$or": [
+                {"operationType": {"$in": ["insert", "replace", "delete"]}},
+                {
+                    "operationType": "update",
+                    "$or": [
+                        {f"updateDescription.updatedFields.{field}": {"$exists": True}}
+                        for field in ("times", "minutes")
+                    ],
+                },
+            ]
+        }
+    }
+]
+
+
+async def rearm_user(user_id: int) -> bool:
+    """Re-arm one user's daily reminders from Mongo. True if any job changed"""
+    dbm = DatabaseManager()
+    schedule = await dbm.get_schedule_record(user_id, ("times",))
+    user = await dbm.get_user_record(user_id, ("timezone",))
+    # times, not minutes - that's the field people edit by hand
+    times = (schedule.times if schedule else None) or []
+    minutes = sorted({parse_time_of_day(time) for time in times} - {None})
+    changed = sync_user_reminders(user_id, minutes, user.timezone if user else None)
+    if changed:
+        logger.info(f"Re-armed reminders for user {user_id}: {', '.join(times) or 'none'}")
+    return changed
+
+
+class ScheduleSync:
+    def __init__(self, mode: str = "auto", poll_seconds: float = 30) -> None:
+        """mode: auto (change streams, polling if unsupported) or poll"""
+        self.mode = mode
+        self.poll_seconds = poll_seconds
+        self.watermark = datetime.now()
+        self.dbm = DatabaseManager()
+        self._tasks: List[asyncio.Task] = []
+        self._polling = False
+
+    def start(self) -> None:
+        if self.mode == "poll":
+            self._start_polling()
+            return
+        self._tasks.append(asyncio.create_task(self._watch("users", USERS_PIPELINE)))
+        self._tasks.append(asyncio.create_task(self._watch("schedules", SCHEDULES_PIPELINE)))
+        logger.info("Schedule sync: watching change streams on users and schedules")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def _start_polling(self) -> None:
+        if self._polling:
+            return
+        self._polling = True
+        self._tasks.append(asyncio.create_task(self._poll()))
+        logger.info(f"Schedule sync: polling for changes every {self.poll_seconds:g}s")
+
+    async def _watch(self, collection: str, pipeline: List[Dict[str, Any]]) -> None:
+        resume_token = None
+        while True:
+            try:
+                async with self.dbm.db[collection].watch(
+                    pipeline, full_document="updateLookup", resume_after=resume_token
+                ) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        await self._handle_change(change)
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    logger.warning(f"Change streams are not available ({e.code}), polling instead")
+                    self._start_polling()
+                    return
+                logger.error(f"Change stream on {collection} failed: {str(e)}")
+            except PyMongoError as e:
+                logger.error(f"Change stream on {collection} failed: {str(e)}")
+            await asyncio.sleep(RETRY_SECONDS)
+
+    async def _handle_change(self, change: Dict[str, Any]) -> None:
+        try:
+            if change["operationType"] == "delete":
+                # the deleted document is gone - find armed users without a schedule instead
+                await self._disarm_deleted()
+                return
+            document = change.get("fullDocument")
+            if document and "user_id" in document:
+                await rearm_user(document["user_id"])
+        except Exception as e:
+            logger.error(f"Failed to apply change {change.get('_id')}: {str(e)}")
+
+    async def _disarm_deleted(self) -> None:
+        prefix = get_job_id("feed_")
+        armed = {
+            int(job.id[len(prefix) :].split("_")[0])
+            for job in get_scheduler().get_jobs()
+            if job.id.startswith(prefix)
+        }
+        if not armed:
+            return
+        for user_id in armed - await self.dbm.get_scheduled_user_ids(armed):
+            sync_user_reminders(user_id, [], None)
+            logger.info(f"Schedule of user {user_id} was deleted, reminders disarmed")
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.poll_once()
+            except PyMongoError as e:
+                logger.error(f"Schedule sync poll failed: {str(e)}")
+
+    async def poll_once(self) -> int:
+        """Re-arm users whose user or schedule document changed since the last poll"""
+        user_ids = set()
+        watermark = self.watermark
+        for collection in ("users", "schedules"):
+            async for doc in self.dbm.iter_updated_user_ids(collection, self.watermark):
+                user_ids.add(doc["user_id"])
+                watermark = max(watermark, doc["updated_at"])
+        changed = 0
+        for user_id in user_ids:
+            try:
+                changed += await rearm_user(user_id)
+            except Exception as e:
+                logger.error(f"Failed to re-arm reminders for user {user_id}: {str(e)}")
+        self.watermark = watermark
+        return changed
+
+
+# one per hosted bot - the watch / poll tasks inherit the namespace they were started in
+_syncs: List[ScheduleSync] = []
+
+
+def start_schedule_sync() -> None:
+    """Start syncing reminders with Mongo - SCHEDULE_SYNC: auto (default), poll or off"""
+    mode = os.getenv("SCHEDULE_SYNC", "auto").lower()
+    if mode == "off":
+        return
+    sync = ScheduleSync(mode, poll_seconds=float(os.getenv("SCHEDULE_SYNC_POLL_SECONDS", 30)))
+    sync.start()
+    _syncs.append(sync)
+
+
+async def stop_schedule_sync() -> None:
+    while _syncs:
+        await _syncs.pop().stop()
@@ -0,0 +1,182 @@
+"""
+Warm restart: binary snapshot of armed reminder jobs
+
+On graceful shutdown every reminder job (daily slots and pending follow-ups) is
+written as a fixed-size record to a local file. On startup the file is
+memory-mapped and re-armed directly, skipping the Mongo reload - unless any user
+or schedule was updated after the snapshot was taken (one indexed query each).
+
+Layout (little endian):
+    header: magic (4s) | version (H) | watermark, unix seconds (d) | record count (I)
+    record: chat_id (q) | kind (B) | reschedule_if_missed (B) |
+            local minute of day (H) | utc minute of day (H) | run at, unix seconds (d)
+"""
+
+import mmap
+import os
+import struct
+from datetime import datetime
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+from botspot.utils import get_scheduler
+from loguru import logger
+
+from src.database import DatabaseManager
+
+MAGIC = b"CFSN"
+VERSION = 1
+HEADER = struct.Struct("<4sHdI")
+RECORD = struct.Struct("<qBBHHd")
+
+KIND_DAILY = 0
+KIND_FOLLOWUP = 1
+
+
+class JobRecord(NamedTuple):
+    chat_id: int
+    kind: int
+    reschedule_if_missed: bool
+    local_minute: int
+    utc_minute: int
+    run_at: float
+
+
+def get_snapshot_path() -> Optional[Path]:
+    path = os.getenv("SNAPSHOT_PATH", ".state/scheduler.snapshot")
+    return Path(path) if path else None
+
+
+def collect_job_records() -> List[JobRecord]:
+    """Turn armed reminder jobs into snapshot records"""
+    from src.routers.schedule import get_job_utc_minute
+
+    records = []
+    for job in get_scheduler().get_jobs():
+        reschedule = bool(job.kwargs.get("reschedule_if_missed", True))
+        try:
+            if job.id.startswith("feed_"):
+                # feed_{chat_id}_{HH:MM} - local time in the id, GMT time in the trigger
+                _, chat_id, local_time = job.id.split("_", 2)
+                hour, minute = map(int, local_time.split(":"))
+                utc_minute = get_job_utc_minute(job)
+                records.append(
+                    JobRecord(
+                        int(chat_id), KIND_DAILY, reschedule, hour * 60 + minute, utc_minute, 0
+                    )
+                )
+            elif job.id.startswith("followup_"):
+                chat_id = job.args[0]
+                run_at = job.trigger.run_date.timestamp()
+                records.append(JobRecord(chat_id, KIND_FOLLOWUP, reschedule, 0, 0, run_at))
+        except (ValueError, KeyError, AttributeError, IndexError) as e:
+            logger.warning(f"Job {job.id} can't be snapshotted, skipping: {str(e)}")
+    return records
+
+
+def write_snapshot(path: Path, records: List[JobRecord], watermark: datetime) -> None:
+    """Write records atomically - a crash mid-write leaves the previous file intact"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with tmp_path.open("wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, watermark.timestamp(), len(records)))
+        f.write(b"".join(RECORD.pack(*record) for record in records))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: Path) -> Optional[Tuple[datetime, List[JobRecord]]]:
+    """Read a snapshot, None if missing or not readable"""
+    try:
+        with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, version, watermark, count = HEADER.unpack_from(data, 0)
+            if magic != MAGIC or version != VERSION:
+                logger.warning(f"Unknown snapshot format in {path}, ignoring")
+                return None
+            body = data[HEADER.size : HEADER.size + count * RECORD.size]
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Failed to read snapshot {path}: {str(e)}")
+        return None
+    if len(body) != count * RECORD.size:
+        logger.warning(f"Snapshot {path} is truncated, ignoring")
+        return None
+    records = [JobRecord(*fields) for fields in RECORD.iter_unpack(body)]
+    return datetime.fromtimestamp(watermark), records
+
+
+def get_snapshot_watermark() -> Optional[datetime]:
+    """When the previous run shut down gracefully - None after a crash or with snapshots off"""
+    path = get_snapshot_path()
+    if path is None or not path.exists():
+        return None
+    snapshot = read_snapshot(path)
+    return snapshot[0] if snapshot is not None else None
+
+
+async def save_snapshot() -> None:
+    """Snapshot armed reminder jobs - call on graceful shutdown"""
+    path = get_snapshot_path()
+    if path is None:
+        return
+    records = collect_job_records()
+    write_snapshot(path, records, watermark=datetime.now())
+    logger.info(f"Saved {len(records)} reminder jobs to {path}")
+
+
+async def is_snapshot_stale(watermark: datetime) -> bool:
+    """Anything changed in Mongo after the snapshot was taken? Two indexed lookups"""
+    from src.dst_rebalancer import get_shifted_timezones
+
+    db = DatabaseManager().db
+    query = {"updated_at": {"$gt": watermark}}
+    for collection in (db.users, db.schedules):
+        if await collection.find_one(query, {"_id": 1}) is not None:
+            return True
+    # a DST change while the bot was down moves the UTC times of the saved jobs
+    return bool(await get_shifted_timezones(watermark))
+
+
+async def restore_from_snapshot() -> bool:
+    """Re-arm reminder jobs from the snapshot. False if a full reload is needed"""
+    from src.routers.schedule import add_reminder_job, schedule_reminder
+
+    path = get_snapshot_path()
+    if path is None or not path.exists():
+        return False
+    snapshot = read_snapshot(path)
+    # consume the snapshot - after a crash the next start must do a full reload
+    path.unlink(missing_ok=True)
+    if snapshot is None:
+        return False
+
+    watermark, records = snapshot
+    if await is_snapshot_stale(watermark):
+        logger.info(f"Snapshot from {watermark} is stale, doing a full reload")
+        return False
+
+    now = datetime.now()
+    daily = followups = 0
+    for record in records:
+        if record.kind == KIND_DAILY:
+            hour, minute = divmod(record.local_minute, 60)
+            gmt_hour, gmt_minute = divmod(record.utc_minute, 60)
+            add_reminder_job(
+                record.chat_id, hour, minute, gmt_hour, gmt_minute, record.reschedule_if_missed
+            )
+            daily += 1
+        elif record.kind == KIND_FOLLOWUP:
+            # naive server time, same as follow-ups created in send_reminder
+            run_at = datetime.fromtimestamp(record.run_at)
+            if run_at <= now:
+                logger.debug(f"Follow-up for {record.chat_id} expired during restart, dropping")
+                continue
+            await schedule_reminder(
+                record.chat_id,
+                timestamp=run_at,
+                reschedule_if_missed=record.reschedule_if_missed,
+            )
+            followups += 1
+
+    logger.info(f"Restored {daily} daily reminders and {followups} follow-ups from snapshot")
+    return True
@@ -0,0 +1,61 @@
+"""
+Startup timing: import-time breakdown and time to first update
+
+Stdlib only on purpose - run.py imports it before anything else.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict
+
+# close enough to process start - this module is imported first thing in run.py
+PROCESS_START = time.perf_counter()
+
+import_times: Dict[str, float] = {}
+events: Dict[str, float] = {}
+
+
+@contextmanager
+def measure_import(name: str):
+    """Record how long the wrapped import took"""
+    start = time.perf_counter()
+    yield
+    import_times[name] = time.perf_counter() - start
+
+
+def mark(event: str) -> None:
+    """Record the time since process start for a startup milestone"""
+    events.setdefault(event, time.perf_counter() - PROCESS_START)
+
+
+def format_report() -> str:
+    lines = ["Startup report:", "Imports:"]
+    for name, seconds in sorted(import_times.items(), key=lambda item: -item[1]):
+        lines.append(f"  {name}: {seconds * 1000:.0f} ms")
+    lines.append("Milestones (since process start):")
+    for event, seconds in sorted(events.items(), key=lambda item: item[1]):
+        lines.append(f"  {event}: {seconds * 1000:.0f} ms")
+    return "\n".join(lines)
+
+
+class FirstUpdateMiddleware:
+    """Outer update middleware: marks the first processed update and logs the report once"""
+
+    def __init__(self, log_report: bool = False) -> None:
+        self.log_report = log_report
+        self.seen = False
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not self.seen:
+            self.seen = True
+            mark("first update")
+            if self.log_report:
+                from loguru import logger
+
+                logger.info(format_report())
+        return await handler(event, data)
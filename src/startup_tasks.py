@@ -1,28 +1,40 @@
+import os
+from datetime import datetime, timedelta
+from typing import List
+from zoneinfo import ZoneInfo
+
 from loguru import logger
 
 from src.database import DatabaseManager
 from src.routers.schedule import schedule_reminder
+from src.utils.timezone_utils import get_effective_timezone, parse_time_of_day
+
+MINUTES_PER_DAY = 24 * 60
 
 
 async def reload_schedules() -> None:
     """Reload all user schedules from database on bot startup"""
     dbm = DatabaseManager()
 
-    # Get all schedules from database
-    schedules = dbm.db.schedules.find({})
-
-    async for schedule in schedules:
+    # Get all active schedules together with the user's timezone - one query
+    async for schedule in dbm.iter_schedules_with_timezones():
         user_id = schedule["user_id"]
+        # same default as /setup - users without a timezone get their reminders in UTC
+        timezone = get_effective_timezone(schedule.get("timezone"))
 
-        # Get user's timezone
-        user = await dbm.get_user(user_id)
-        if not user or not user.get("timezone"):
-            logger.warning(f"User {user_id} has schedule but no timezone set, skipping...")
-            continue
+        # schedules saved before minutes were stored only have "HH:MM" strings
+        minutes = schedule.get("minutes")
+        if minutes is None:
+            minutes = [parse_time_of_day(time) for time in schedule["times"]]
 
         # Schedule each reminder time
-        for time in schedule["times"]:
-            hour, minute = map(int, time.split(":"))
+        for minute_of_day in minutes:
+            if minute_of_day is None:
+                logger.warning(
+                    f"User {user_id} has an invalid time in {schedule['times']}, skipping"
+                )
+                continue
+            hour, minute = divmod(minute_of_day, 60)
 
             try:
                 await schedule_reminder(
@@ -30,14 +42,46 @@ async def reload_schedules() -> None:
                     hour=hour,
                     minute=minute,
                     reschedule_if_missed=True,
-                    timezone=user["timezone"],
+                    timezone=timezone,
                 )
                 logger.info(
-                    f"Restored schedule for user {user_id}: "
-                    f"{hour:02d}:{minute:02d} {user['timezone']}"
+                    f"Restored schedule for user {user_id}: {hour:02d}:{minute:02d} {timezone}"
                 )
             except Exception as e:
                 logger.error(
                     f"Failed to restore schedule for user {user_id} at "
                     f"{hour:02d}:{minute:02d}: {str(e)}"
                 )
+
+
+def get_missed_utc_minutes(stopped_at: datetime, now: datetime) -> List[int]:
+    """UTC minutes of day in (stopped_at, now], at most MISSED_REMINDERS_WINDOW_MINUTES back"""
+    window = timedelta(minutes=float(os.getenv("MISSED_REMINDERS_WINDOW_MINUTES", 60)))
+    start = max(stopped_at.astimezone(ZoneInfo("UTC")), now - window)
+    start = start.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    # the current minute counts too - its cron fire time (second 0) has passed already
+    count = (now - start) // timedelta(minutes=1) + 1
+    first = start.hour * 60 + start.minute
+    return sorted({(first + offset) % MINUTES_PER_DAY for offset in range(max(count, 0))})
+
+
+async def send_missed_reminders(stopped_at: datetime) -> int:
+    """Remind users whose feeding slot passed while the bot was down
+
+    One indexed query over the missed UTC minutes; the reminders go out as follow-ups a
+    minute from now, once startup has settled. Returns the number of users reminded.
+    """
+    minutes = get_missed_utc_minutes(stopped_at, datetime.now(tz=ZoneInfo("UTC")))
+    if not minutes:
+        return 0
+    # naive server time, same as follow-ups created in send_reminder
+    run_at = datetime.now() + timedelta(minutes=1)
+    user_ids = {doc["user_id"] async for doc in DatabaseManager().get_users_due_at(minutes)}
+    for user_id in user_ids:
+        try:
+            await schedule_reminder(user_id, timestamp=run_at)
+        except Exception as e:
+            logger.error(f"Failed to schedule missed reminder for user {user_id}: {str(e)}")
+    if user_ids:
+        logger.info(f"Reminding {len(user_ids)} users of feedings missed since {stopped_at}")
+    return len(user_ids)
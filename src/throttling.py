@@ -0,0 +1,154 @@
+"""
+Per-user anti-flood for commands and the chat fallback
+
+Sliding-window counters per (user, command) and per user overall, kept in memory with LRU
+eviction past THROTTLE_MAX_KEYS keys. Keys include the bot namespace (see src.namespace), so
+each hosted bot has its own budget. An update is counted only if both windows allow it;
+over-limit updates are dropped before they take an
+update slot or touch Mongo; the first drop in a window gets one short cooldown notice,
+the rest are dropped silently.
+
+Limits are "count/seconds":
+- THROTTLE_CHATTER: non-command messages (each one costs a long help reply)
+- THROTTLE_COMMAND: any single command, button presses count as one command
+- THROTTLE_HEAVY: stats commands that run aggregations
+- THROTTLE_USER: everything a user sends
+Answers to a pending prompt (reminder, /setup, /timezone) are never throttled.
+"""
+
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+from botspot.utils import reply_safe
+from loguru import logger
+
+from src.namespace import get_namespace
+from src.update_priority import get_command
+
+HEAVY_COMMANDS = {"stats", "full_stats"}
+CHATTER = "chatter"
+CALLBACK = "callback"
+COOLDOWN_NOTICE = "Too many messages - please slow down and try again in a minute."
+
+
+def parse_limit(value: str) -> Tuple[int, float]:
+    count, seconds = value.split("/", 1)
+    return int(count), float(seconds)
+
+
+class SlidingWindowCounter:
+    """Timestamps of recent hits per key, the least recently used keys evicted past max_keys"""
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max_keys
+        self._hits: OrderedDict[Hashable, Deque[float]] = OrderedDict()
+
+    def allows(self, key: Hashable, limit: int, window: float, now: float) -> bool:
+        """Would a hit be counted? Nothing is recorded"""
+        hits = self._hits.get(key)
+        if hits is None:
+            return limit > 0
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+        return len(hits) < limit
+
+    def hit(self, key: Hashable, limit: int, window: float, now: float) -> bool:
+        """Count a hit - False (and not counted) if the key already has `limit` in the window"""
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = self._hits[key] = deque(maxlen=limit)
+            if len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+        else:
+            self._hits.move_to_end(key)
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+        if len(hits) >= limit:
+            return False
+        hits.append(now)
+        return True
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Outer update middleware - register after the FSM middleware to see raw_state"""
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[int, float]],
+        user_limit: Tuple[int, float],
+        max_keys: int,
+    ) -> None:
+        self.limits = limits
+        self.user_limit = user_limit
+        self.counter = SlidingWindowCounter(max_keys)
+        # cooldown notices sent - one per (user, bucket) and window
+        self.noticed = SlidingWindowCounter(max_keys)
+        self.dropped = 0
+
+    def get_bucket(self, event: Update) -> Optional[str]:
+        if event.callback_query is not None:
+            return CALLBACK
+        if event.message is None:
+            return None
+        command = get_command(event.message)
+        if command is None:
+            return CHATTER if event.message.chat.type == "private" else None
+        return command
+
+    def get_limit(self, bucket: str) -> Tuple[int, float]:
+        if bucket == CHATTER:
+            return self.limits[CHATTER]
+        return self.limits["heavy" if bucket in HEAVY_COMMANDS else "command"]
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update) or data.get("raw_state") is not None:
+            return await handler(event, data)
+        user = data.get("event_from_user")
+        bucket = self.get_bucket(event)
+        if user is None or bucket is None:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        # set by NamespaceMiddleware, which runs first - every hosted bot has its own budget
+        namespace = get_namespace()
+        limit, window = self.get_limit(bucket)
+        windows = [
+            ((namespace, user.id, bucket), limit, window),
+            ((namespace, user.id), *self.user_limit),
+        ]
+        # check both before counting - a dropped update must not use up any budget
+        if all(self.counter.allows(*entry, now) for entry in windows):
+            for entry in windows:
+                self.counter.hit(*entry, now)
+            return await handler(event, data)
+
+        self.dropped += 1
+        logger.debug(f"Throttled {bucket} from user {user.id} ({self.dropped} total)")
+        if event.message is not None and self.noticed.hit(
+            (namespace, user.id, bucket), 1, window, now
+        ):
+            await reply_safe(event.message, COOLDOWN_NOTICE)
+        return None
+
+
+def get_throttling_middleware() -> Optional[ThrottlingMiddleware]:
+    if os.getenv("THROTTLE", "true").lower() != "true":
+        return None
+    return ThrottlingMiddleware(
+        limits={
+            CHATTER: parse_limit(os.getenv("THROTTLE_CHATTER", "5/60")),
+            "command": parse_limit(os.getenv("THROTTLE_COMMAND", "10/60")),
+            "heavy": parse_limit(os.getenv("THROTTLE_HEAVY", "3/60")),
+        },
+        user_limit=parse_limit(os.getenv("THROTTLE_USER", "30/60")),
+        max_keys=int(os.getenv("THROTTLE_MAX_KEYS", 10000)),
+    )
@@ -0,0 +1,163 @@
+"""
+Priority classes and backpressure for incoming updates
+
+Every update takes a slot from a shared pool before its handlers run:
+- feeding: /fed, replies to a pending prompt (reminders, /setup, /timezone) - may use every
+  slot, including UPDATE_RESERVED_SLOTS kept free for this class only
+- read: other commands and button presses - wait in line behind queued feeding updates
+- chatter: everything else (the chat fallback) - never waits, answered with a short "busy"
+  reply when no slot is free
+
+A slot is a lease: handlers that wait for the user's answer (ask_user) give the slot back
+after UPDATE_SLOT_LEASE_SECONDS and keep running outside the pool.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message, Update
+from botspot.utils import reply_safe
+from loguru import logger
+
+PRIORITY_FEEDING = 0
+PRIORITY_READ = 1
+PRIORITY_CHATTER = 2
+
+FEEDING_COMMANDS = {"fed"}
+BUSY_REPLY = "I'm a bit busy right now, please try again in a minute."
+
+
+def get_command(message: Message) -> Optional[str]:
+    text = message.text or message.caption or ""
+    if not text.startswith("/"):
+        return None
+    parts = text[1:].split(maxsplit=1)
+    return parts[0].split("@", 1)[0].lower() if parts else None
+
+
+def get_priority(update: Update, raw_state: Optional[str]) -> int:
+    if raw_state is not None:
+        # the user is answering a prompt - a reminder, /setup or /timezone
+        return PRIORITY_FEEDING
+    if update.callback_query is not None:
+        return PRIORITY_READ
+    if update.message is None:
+        return PRIORITY_CHATTER
+    command = get_command(update.message)
+    if command is None:
+        return PRIORITY_CHATTER
+    return PRIORITY_FEEDING if command in FEEDING_COMMANDS else PRIORITY_READ
+
+
+class PriorityLimiter:
+    """Slot pool where waiters are served by priority (lower first), then arrival order"""
+
+    def __init__(self, capacity: int, reserved: int = 0) -> None:
+        self.capacity = capacity
+        self.reserved = reserved
+        self.in_use = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    def _limit(self, priority: int) -> int:
+        return self.capacity if priority == PRIORITY_FEEDING else self.capacity - self.reserved
+
+    def _drop_cancelled(self) -> None:
+        while self._waiters and self._waiters[0][2].cancelled():
+            heapq.heappop(self._waiters)
+
+    def try_acquire(self, priority: int) -> bool:
+        """Take a slot if one is free and nobody with the same or higher priority is waiting"""
+        if self.in_use >= self._limit(priority):
+            return False
+        self._drop_cancelled()
+        if self._waiters and self._waiters[0][0] <= priority:
+            return False
+        self.in_use += 1
+        return True
+
+    async def acquire(self, priority: int) -> None:
+        if self.try_acquire(priority):
+            return
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._counter), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # the slot was handed over right before the cancellation
+                self.release()
+            elif entry in self._waiters:
+                # a cancelled head would hold back the waiters behind it
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._wake()
+            raise
+
+    def release(self) -> None:
+        self.in_use -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """Hand free slots to the waiters at the head of the queue"""
+        while True:
+            self._drop_cancelled()
+            if not self._waiters:
+                break
+            priority, _, future = self._waiters[0]
+            if self.in_use >= self._limit(priority):
+                break
+            heapq.heappop(self._waiters)
+            self.in_use += 1
+            future.set_result(None)
+
+
+class PriorityMiddleware(BaseMiddleware):
+    """Outer update middleware - register after the FSM middleware to see raw_state"""
+
+    def __init__(self, capacity: int, reserved: int, lease_seconds: float) -> None:
+        self.limiter = PriorityLimiter(capacity, reserved)
+        self.lease_seconds = lease_seconds
+        self.shed = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+
+        priority = get_priority(event, data.get("raw_state"))
+        if priority == PRIORITY_CHATTER:
+            if not self.limiter.try_acquire(priority):
+                self.shed += 1
+                logger.debug(f"Busy, shedding update {event.update_id} ({self.shed} total)")
+                if event.message is not None:
+                    await reply_safe(event.message, BUSY_REPLY)
+                return None
+        else:
+            await self.limiter.acquire(priority)
+
+        task = asyncio.ensure_future(handler(event, data))
+        try:
+            await asyncio.wait({task}, timeout=self.lease_seconds)
+        finally:
+            self.limiter.release()
+        return await task
+
+
+def get_priority_middleware() -> PriorityMiddleware:
+    capacity = int(os.getenv("UPDATE_CONCURRENCY", 32))
+    reserved = int(os.getenv("UPDATE_RESERVED_SLOTS", max(1, capacity // 8)))
+    return PriorityMiddleware(
+        capacity=capacity,
+        reserved=min(reserved, capacity - 1),
+        lease_seconds=float(os.getenv("UPDATE_SLOT_LEASE_SECONDS", 10)),
+    )
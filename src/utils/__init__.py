@@ -1,5 +1,7 @@
 import sys
+from collections import OrderedDict
 from pathlib import Path
+from typing import Hashable
 
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.storage.base import StorageKey
@@ -30,6 +32,28 @@ def create_state(chat_id: int) -> FSMContext:
     return state
 
 
+class RecentKeys:
+    """Bounded set of recently seen keys - a cheap first line of deduplication"""
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._keys: "OrderedDict[Hashable, None]" = OrderedDict()
+
+    def add(self, key: Hashable) -> bool:
+        """Remember the key. False if it was already seen"""
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return False
+        self._keys[key] = None
+        if len(self._keys) > self.maxsize:
+            self._keys.popitem(last=False)
+        return True
+
+    def discard(self, key: Hashable) -> None:
+        """Forget the key - the next add() of it succeeds again"""
+        self._keys.pop(key, None)
+
+
 def setup_logger(logger, level: str = "INFO"):
     logger.remove()  # Remove default handler
     logger.add(
@@ -0,0 +1,32 @@
+"""
+Offline timezone lookup for a shared Telegram location
+
+timezonefinder (a dependency) ships timezone-boundary-builder's polygons in a compact binary
+form and reads them from disk per lookup (in_memory=False), so no boundary data is held in
+memory and no network call is made.
+
+When it does not know the location, find_timezone returns None - the caller falls back to
+get_longitude_timezone, a rough fixed offset the user has to confirm.
+"""
+
+import asyncio
+from functools import lru_cache
+from typing import Any, Optional
+
+
+def get_longitude_timezone(lon: float) -> str:
+    """Nautical timezone - 15 degrees of longitude per hour, no DST, often not the local time"""
+    return f"GMT{round(lon / 15):+03d}:00"
+
+
+async def find_timezone(lat: float, lon: float) -> Optional[str]:
+    """IANA timezone at a location - None if the boundary data does not cover it"""
+    return await asyncio.to_thread(get_timezone_finder().timezone_at, lng=lon, lat=lat)
+
+
+@lru_cache(maxsize=1)
+def get_timezone_finder() -> Any:
+    """timezonefinder's finder, created on the first lookup"""
+    from timezonefinder import TimezoneFinder
+
+    return TimezoneFinder(in_memory=False)
@@ -1,11 +1,19 @@
 import re
 from datetime import datetime, timedelta
 from functools import lru_cache
-from typing import Optional, Tuple
-from zoneinfo import ZoneInfo
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from loguru import logger
 
+# reminders of users who never set a timezone run in UTC
+DEFAULT_TIMEZONE = "GMT+00:00"
+
+
+def get_effective_timezone(timezone_str: Optional[str]) -> str:
+    """Timezone the user's reminders run in - UTC until one is set with /timezone"""
+    return timezone_str or DEFAULT_TIMEZONE
+
 
 @lru_cache(maxsize=1)
 def get_server_offset() -> timedelta:
@@ -27,6 +35,19 @@ def clear_server_offset_cache() -> None:
     get_server_offset.cache_clear()
 
 
+def get_zoneinfo(timezone_str: Optional[str]) -> Optional[ZoneInfo]:
+    """
+    IANA timezone (e.g. Europe/Berlin) - these follow daylight saving time.
+    Returns None for fixed GMT±HH:MM offsets and unknown names
+    """
+    if not timezone_str or timezone_str.upper().startswith("GMT"):
+        return None
+    try:
+        return ZoneInfo(timezone_str.strip())
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
 def parse_timezone_offset(timezone_str: str) -> Optional[Tuple[int, int]]:
     """
     Parse timezone string in format GMT±HH:MM or GMT±HH
@@ -49,8 +70,12 @@ def parse_timezone_offset(timezone_str: str) -> Optional[Tuple[int, int]]:
 
 
 def convert_time_to_gmt(hour: int, minute: int, timezone_str: str) -> Tuple[int, int]:
-    """Convert hour:minute from given timezone to GMT hour:minute"""
-    offset = parse_timezone_offset(timezone_str)
+    """Convert hour:minute from given timezone to GMT hour:minute (at the current UTC offset)"""
+    zone = get_zoneinfo(timezone_str)
+    if zone is not None:
+        offset = divmod(get_offset_minutes(timezone_str), 60)
+    else:
+        offset = parse_timezone_offset(timezone_str)
     if offset is None:
         logger.warning(f"Invalid timezone format: {timezone_str}, using original time")
         return hour, minute
@@ -83,10 +108,53 @@ def convert_time_to_gmt(hour: int, minute: int, timezone_str: str) -> Tuple[int,
     return gmt_hour, gmt_minute
 
 
+def parse_time_of_day(time_str: str) -> Optional[int]:
+    """
+    Parse time of day in format HH:MM or H:MM
+    Returns minute of day (0..1439) or None if invalid
+    """
+    match = re.match(r"^(?P<hours>\d{1,2}):(?P<minutes>\d{2})$", time_str.strip())
+    if not match:
+        return None
+    hours, minutes = int(match.group("hours")), int(match.group("minutes"))
+    if hours > 23 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+
+def format_minute_of_day(minute_of_day: int) -> str:
+    """Format minute of day as HH:MM"""
+    return f"{minute_of_day // 60:02d}:{minute_of_day % 60:02d}"
+
+
+def get_offset_minutes(timezone_str: Optional[str], at: Optional[datetime] = None) -> int:
+    """User's UTC offset in minutes at the given moment, now by default (0 if not set or invalid)"""
+    zone = get_zoneinfo(timezone_str)
+    if zone is not None:
+        utc_offset = (at or datetime.now(tz=ZoneInfo("UTC"))).astimezone(zone).utcoffset()
+        return int(utc_offset.total_seconds() // 60) if utc_offset is not None else 0
+    offset = parse_timezone_offset(timezone_str) if timezone_str else None
+    if offset is None:
+        return 0
+    return offset[0] * 60 + offset[1]
+
+
+def convert_minutes_to_utc(
+    minutes: List[int], timezone_str: Optional[str], at: Optional[datetime] = None
+) -> List[int]:
+    """Convert local minutes of day to UTC minutes of day"""
+    offset = get_offset_minutes(timezone_str, at)
+    return [(minute - offset) % (24 * 60) for minute in minutes]
+
+
 def get_user_local_time(timezone_str: str) -> datetime:
     """Convert GMT time to user's local time for display purposes"""
     base_time = datetime.now(tz=ZoneInfo("UTC"))
 
+    zone = get_zoneinfo(timezone_str)
+    if zone is not None:
+        return base_time.astimezone(zone)
+
     offset = parse_timezone_offset(timezone_str)
     if offset is None:
         logger.warning(f"Invalid timezone format: {timezone_str}, using original time")
@@ -110,6 +178,10 @@ def get_timezone_obj(timezone_str: str):
 
     from datetime import timedelta, timezone
 
+    zone = get_zoneinfo(timezone_str)
+    if zone is not None:
+        return zone
+
     offset = parse_timezone_offset(timezone_str)
     if offset is None:
         logger.warning(f"Invalid timezone format: {timezone_str}, using original time")
@@ -0,0 +1,76 @@
+"""
+Overdue-cat watchdog
+
+Every feeding moves the user's `overdue_at` deadline forward (see
+DatabaseManager.log_feeding) and saving a schedule sets the first one, so a sweep
+is one indexed range query that only touches users who are actually overdue - its
+cost does not grow with the total number of users. One interval job for everybody
+instead of a timer per user.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from botspot.utils import get_scheduler
+from loguru import logger
+
+from src.database import DatabaseManager
+from src.delivery import send_tracked
+from src.namespace import get_job_id, in_namespace
+
+WATCHDOG_JOB_ID = "overdue_watchdog"
+
+
+async def alert_overdue_user(dbm: DatabaseManager, user_id: int, last_fed_at: datetime) -> None:
+    hours = int((datetime.now() - last_fed_at).total_seconds() // 3600)
+    user = await dbm.get_user_record(user_id, ("full_name", "partners"))
+    name = user.full_name if user else None
+
+    # the schedule may belong to a household - everybody there shares the cat
+    household = await dbm.get_household(user_id)
+    members = household["members"] if household else [user_id]
+    text = f"⚠️ Your cat hasn't been fed for {hours} hours!\nUse /fed when done."
+    sends = [send_tracked(member_id, text) for member_id in members]
+    for partner_id in (user.partners if user else None) or []:
+        sends.append(
+            send_tracked(
+                partner_id,
+                f"⚠️ {name or 'Your partner'}'s cat hasn't been fed for {hours} hours!",
+            )
+        )
+    await asyncio.gather(*sends)
+
+
+async def check_overdue_feedings() -> None:
+    """Alert users (and their partners) whose cat is overdue for a feeding"""
+    dbm = DatabaseManager()
+    now = datetime.now()
+    cooldown = timedelta(hours=float(os.getenv("OVERDUE_ALERT_COOLDOWN_HOURS", 6)))
+
+    alerted = 0
+    async for schedule in dbm.iter_overdue_schedules(now):
+        user_id = schedule["user_id"]
+        # mark first - a failing send should not turn into an alert on every sweep
+        await dbm.mark_overdue_alerted(user_id, now, cooldown)
+        try:
+            await alert_overdue_user(dbm, user_id, schedule["last_fed_at"])
+            alerted += 1
+        except Exception as e:
+            logger.error(f"Failed to send overdue alert to user {user_id}: {str(e)}")
+
+    if alerted:
+        logger.info(f"Overdue watchdog: alerted {alerted} users")
+
+
+def start_overdue_watchdog() -> None:
+    """Register the periodic watchdog sweep"""
+    minutes = float(os.getenv("OVERDUE_CHECK_INTERVAL_MINUTES", 5))
+    get_scheduler().add_job(
+        in_namespace(check_overdue_feedings),
+        "interval",
+        minutes=minutes,
+        id=get_job_id(WATCHDOG_JOB_ID),
+        replace_existing=True,
+    )
+    logger.info(f"Overdue watchdog started, sweeping every {minutes:g} minutes")
@@ -0,0 +1,128 @@
+import asyncio
+import math
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from src import database
+from src.database import DatabaseManager
+
+
+class FakeJournal:
+    def __init__(self) -> None:
+        self.entries = []
+
+    async def append(self, op, payload):
+        self.entries.append((op, payload))
+
+
+@pytest.fixture
+def journal(monkeypatch):
+    journal = FakeJournal()
+    monkeypatch.setattr(database, "get_journal", lambda: journal)
+    monkeypatch.setenv("OVERDUE_GRACE_MINUTES", "120")
+    return journal
+
+
+def save_schedule(journal, times):
+    asyncio.run(DatabaseManager().save_user_schedule(1, "2 times", times, "GMT+3"))
+    op, payload = journal.entries[-1]
+    assert op == "save_user_schedule"
+    return payload["update"]
+
+
+def test_new_schedule_is_covered_by_the_overdue_watchdog(journal):
+    before = datetime.now()
+    (stage,) = save_schedule(journal, ["08:00", "20:00"])
+    fields = stage["$set"]
+
+    assert fields["utc_minutes"] == [300, 1020]
+    assert fields["overdue_after_minutes"] == 12 * 60 + 120
+    # kept if the user has fed before, seeded from the save otherwise
+    last_fed_field, last_fed_at = fields["last_fed_at"]["$ifNull"]
+    overdue_field, overdue_at = fields["overdue_at"]["$ifNull"]
+    assert (last_fed_field, overdue_field) == ("$last_fed_at", "$overdue_at")
+    assert before <= last_fed_at <= datetime.now()
+    assert overdue_at == last_fed_at + timedelta(hours=14)
+
+
+def test_stopped_schedule_is_not_watched(journal):
+    stage, unset = save_schedule(journal, [])
+
+    assert "overdue_at" not in stage["$set"]
+    assert unset == {"$unset": ["overdue_at"]}
+
+
+class FakeBroadcasts:
+    """broadcasts collection with its unique index on running broadcasts"""
+
+    def __init__(self) -> None:
+        self.documents = []
+
+    async def insert_one(self, document):
+        if document["status"] == "running" and any(
+            other["status"] == "running" for other in self.documents
+        ):
+            raise DuplicateKeyError("status_running_unique")
+        self.documents.append(document)
+        return SimpleNamespace(inserted_id=len(self.documents))
+
+
+def test_only_one_broadcast_runs_at_a_time(monkeypatch):
+    broadcasts = FakeBroadcasts()
+    monkeypatch.setattr(
+        database, "get_pooled_database", lambda: SimpleNamespace(broadcasts=broadcasts)
+    )
+    db_manager = DatabaseManager()
+
+    async def two_admins():
+        return await asyncio.gather(
+            db_manager.create_broadcast("Hello", created_by=1),
+            db_manager.create_broadcast("Hi", created_by=2),
+        )
+
+    first, second = asyncio.run(two_admins())
+    assert first["_id"] == 1 and first["text"] == "Hello"
+    assert second is None
+    assert len(broadcasts.documents) == 1
+
+
+def evaluate(expression, document, this=None):
+    """The few aggregation operators of the utc_minutes pipeline"""
+    if isinstance(expression, str):
+        return this if expression == "$$this" else document[expression[1:]]
+    if not isinstance(expression, dict):
+        return expression
+    ((operator, args),) = expression.items()
+    if operator == "$map":
+        return [evaluate(args["in"], document, item) for item in document[args["input"][1:]]]
+    a, b = (evaluate(arg, document, this) for arg in args)
+    # $mod keeps the sign of the dividend, unlike Python's %
+    operations = {"$add": a + b, "$subtract": a - b, "$mod": int(math.fmod(a, b))}
+    return operations[operator]
+
+
+class FakeSchedules:
+    def __init__(self) -> None:
+        self.updates = []
+
+    async def update_many(self, query, update):
+        self.updates.append((query, update))
+
+
+def test_utc_minutes_are_shifted_in_batches(monkeypatch):
+    schedules = FakeSchedules()
+    monkeypatch.setattr(
+        database, "get_pooled_database", lambda: SimpleNamespace(schedules=schedules)
+    )
+    monkeypatch.setattr(database, "UTC_MINUTES_BATCH_SIZE", 2)
+
+    # GMT+14 - the largest offset, local slots before it map to the previous UTC day
+    asyncio.run(DatabaseManager().set_utc_minutes([1, 2, 3], 14 * 60))
+
+    assert [query["user_id"]["$in"] for query, _ in schedules.updates] == [[1, 2], [3]]
+    (stage,) = schedules.updates[0][1]
+    utc_minutes = evaluate(stage["$set"]["utc_minutes"], {"minutes": [0, 480, 1200]})
+    assert utc_minutes == [600, 1080, 360]
@@ -0,0 +1,109 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src import delivery
+from src.routers import schedule
+
+
+class FakeDatabase:
+    def __init__(self) -> None:
+        self.household = {"_id": "h1", "owner_id": 1, "members": [1, 2, 3]}
+        self.schedules = {1: {"type": "2 times", "times": ["08:00", "20:00"]}}
+        self.timezones = {1: "Europe/Berlin", 2: None, 3: "GMT+3"}
+        self.paused = []
+        self.failures = 0
+
+    async def get_household(self, user_id):
+        if self.household and user_id in self.household["members"]:
+            return dict(self.household, members=list(self.household["members"]))
+        return None
+
+    async def leave_household(self, user_id):
+        self.household["members"].remove(user_id)
+
+    async def transfer_household(self, household_id, owner_id, new_owner_id):
+        self.household["owner_id"] = new_owner_id
+        self.household["members"].remove(owner_id)
+        return True
+
+    async def get_user_schedule(self, user_id):
+        return self.schedules.get(user_id)
+
+    async def get_user_record(self, user_id, fields):
+        return SimpleNamespace(timezone=self.timezones.get(user_id))
+
+    async def save_user_schedule(self, user_id, schedule_type, times, timezone=None):
+        self.schedules[user_id] = {"type": schedule_type, "times": times, "timezone": timezone}
+
+    async def mark_delivery_paused(self, user_id):
+        self.paused.append(user_id)
+
+    async def record_delivery(self, user_id, outcome, permanent):
+        self.failures = self.failures + 1 if permanent else 0
+        return self.failures
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    sent = []
+    cleared = []
+    synced = []
+
+    async def send_safe(chat_id, text, **kwargs):
+        sent.append(chat_id)
+
+    monkeypatch.setattr(delivery, "DatabaseManager", lambda: database)
+    monkeypatch.setattr(delivery, "send_safe", send_safe)
+    monkeypatch.setattr(schedule, "clear_user_schedule", cleared.append)
+    monkeypatch.setattr(schedule, "sync_user_reminders", lambda *args: synced.append(args))
+    database.sent, database.cleared, database.synced = sent, cleared, synced
+    return database
+
+
+def test_unreachable_member_leaves_the_household(database):
+    asyncio.run(delivery.pause_user(2, delivery.OUTCOME_FORBIDDEN))
+
+    assert database.household == {"_id": "h1", "owner_id": 1, "members": [1, 3]}
+    assert database.paused == [2]
+    assert database.cleared == []
+    assert database.schedules[1]["times"] == ["08:00", "20:00"]
+
+
+def test_unreachable_owner_hands_the_schedule_over(database):
+    database.timezones[2] = "GMT+3"
+    asyncio.run(delivery.pause_user(1, delivery.OUTCOME_FORBIDDEN))
+
+    assert database.household == {"_id": "h1", "owner_id": 2, "members": [2, 3]}
+    assert database.schedules[2] == {
+        "type": "2 times",
+        "times": ["08:00", "20:00"],
+        "timezone": "GMT+3",
+    }
+    assert database.synced == [(2, [480, 1200], "GMT+3")]
+    assert database.sent == [2]
+    # the old owner is paused like a single user
+    assert database.cleared == [1]
+    assert database.schedules[1]["type"] == "stopped"
+    assert database.paused == [1]
+
+
+def test_new_owner_without_timezone_keeps_the_old_one(database):
+    asyncio.run(delivery.pause_user(1, delivery.OUTCOME_FORBIDDEN))
+
+    assert database.synced == [(2, [480, 1200], "Europe/Berlin")]
+
+
+def test_single_user_is_paused_after_repeated_failures(database, monkeypatch):
+    monkeypatch.setenv("DELIVERY_PAUSE_AFTER", "2")
+    database.household = None
+
+    asyncio.run(delivery.record_delivery(1, delivery.OUTCOME_FORBIDDEN))
+    assert database.paused == []
+    asyncio.run(delivery.record_delivery(1, delivery.OUTCOME_CHAT_NOT_FOUND))
+
+    assert database.paused == [1]
+    assert database.cleared == [1]
+    assert database.schedules[1] == {"type": "stopped", "times": [], "timezone": None}
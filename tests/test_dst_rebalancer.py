@@ -0,0 +1,108 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from src import dst_rebalancer
+from src.database import DatabaseManager
+from src.utils.timezone_utils import get_offset_minutes
+
+UTC = ZoneInfo("UTC")
+
+
+class FakeScheduler:
+    def __init__(self) -> None:
+        self.jobs = {}
+
+    def add_job(self, func, trigger, **kwargs):
+        self.jobs[kwargs["id"]] = (trigger, kwargs)
+
+
+def get_last_transition(timezone: str) -> datetime:
+    now = datetime.now(tz=UTC)
+    day = now
+    while get_offset_minutes(timezone, day) == get_offset_minutes(timezone, now):
+        day -= timedelta(days=1)
+    return dst_rebalancer.find_offset_change(timezone, day, day + timedelta(days=1))
+
+
+@pytest.fixture
+def timezones_in_use(monkeypatch):
+    async def get_timezones_in_use(self):
+        return ["Europe/Berlin", "GMT+3"]
+
+    monkeypatch.setattr(DatabaseManager, "get_timezones_in_use", get_timezones_in_use)
+
+
+@pytest.fixture
+def local_timezone(monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Tokyo")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_find_offset_change():
+    start = datetime(2026, 3, 28, 22, tzinfo=UTC)
+    change = dst_rebalancer.find_offset_change("Europe/Berlin", start, start + timedelta(hours=6))
+    assert change == datetime(2026, 3, 29, 1, tzinfo=UTC)
+    assert dst_rebalancer.find_offset_change("GMT+3", start, start + timedelta(hours=6)) is None
+
+
+def test_transition_job_survives_a_missed_run(monkeypatch, timezones_in_use):
+    scheduler = FakeScheduler()
+    monkeypatch.setattr(dst_rebalancer, "get_scheduler", lambda: scheduler)
+    transition = get_last_transition("Europe/Berlin")
+
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return transition - timedelta(hours=1)
+
+    monkeypatch.setattr(dst_rebalancer, "datetime", FixedDatetime)
+    asyncio.run(dst_rebalancer.schedule_transitions())
+
+    trigger, kwargs = scheduler.jobs["dst_transition_Europe/Berlin"]
+    assert trigger == "date"
+    assert kwargs["run_date"] == transition
+    assert kwargs["misfire_grace_time"] is None
+    assert kwargs["coalesce"] is True
+    assert len(scheduler.jobs) == 1
+
+
+def test_shifted_timezones_take_local_watermarks(local_timezone, timezones_in_use):
+    transition = get_last_transition("Europe/Berlin")
+    # how snapshot.read_snapshot returns the watermark - naive local time
+    watermark = datetime.fromtimestamp((transition - timedelta(hours=4)).timestamp())
+
+    assert asyncio.run(dst_rebalancer.get_shifted_timezones(watermark)) == ["Europe/Berlin"]
+    after = datetime.fromtimestamp((transition + timedelta(hours=1)).timestamp())
+    assert asyncio.run(dst_rebalancer.get_shifted_timezones(after)) == []
+
+
+def test_rebalance_rearms_at_the_current_offset(monkeypatch):
+    armed = []
+    saved = []
+
+    async def get_schedules_in_timezone(self, timezone):
+        return [
+            {"user_id": 1, "minutes": [480, 1200]},
+            {"user_id": 2, "times": ["07:30", "bad"]},
+        ]
+
+    async def set_utc_minutes(self, user_ids, offset_minutes):
+        saved.append((user_ids, offset_minutes))
+
+    monkeypatch.setattr(DatabaseManager, "get_schedules_in_timezone", get_schedules_in_timezone)
+    monkeypatch.setattr(DatabaseManager, "set_utc_minutes", set_utc_minutes)
+    monkeypatch.setattr(dst_rebalancer, "add_reminder_job", lambda *args: armed.append(args))
+
+    assert asyncio.run(dst_rebalancer.rebalance_timezone("Europe/Berlin")) == 3
+    offset = get_offset_minutes("Europe/Berlin")
+    assert saved == [([1, 2], offset)]
+    assert [(args[0], args[1], args[2]) for args in armed] == [(1, 8, 0), (1, 20, 0), (2, 7, 30)]
+    expected = [(480 - offset) % 1440, (1200 - offset) % 1440, (450 - offset) % 1440]
+    assert [args[3] * 60 + args[4] for args in armed] == expected
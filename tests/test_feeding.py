@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from aiogram.types import Chat, Message, User
+from pymongo.errors import ServerSelectionTimeoutError
+
+from src.routers import feeding
+
+MESSAGE = Message(
+    message_id=7,
+    date=datetime.now(),
+    chat=Chat(id=1, type="private"),
+    from_user=User(id=1, is_bot=False, first_name="Cat"),
+    text="/fed",
+)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = SimpleNamespace(logged=[], failures=[])
+
+    async def log_feeding(**kwargs):
+        if database.failures:
+            raise database.failures.pop(0)
+        database.logged.append(kwargs["source"])
+
+    async def get_cached_household(user_id):
+        return None
+
+    async def get_cached_schedule_type(user_id):
+        return "2 times"
+
+    async def noop(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(
+        feeding,
+        "db_manager",
+        SimpleNamespace(
+            log_feeding=log_feeding,
+            get_cached_household=get_cached_household,
+            get_cached_schedule_type=get_cached_schedule_type,
+        ),
+    )
+    monkeypatch.setattr(feeding, "ask_user_raw", noop)
+    monkeypatch.setattr(feeding, "reply_safe", noop)
+    monkeypatch.setattr(feeding, "recent_feedings", feeding.RecentKeys())
+    return database
+
+
+def register(message=MESSAGE):
+    asyncio.run(feeding.register_meal(message, state=None))
+
+
+def test_redelivered_feeding_is_logged_once(database):
+    register()
+    register()
+
+    assert database.logged == [(1, 7)]
+
+
+def test_failed_feeding_can_be_retried(database):
+    database.failures.append(ServerSelectionTimeoutError("mongo is down"))
+    with pytest.raises(ServerSelectionTimeoutError):
+        register()
+    register()
+
+    assert database.logged == [(1, 7)]
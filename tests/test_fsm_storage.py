@@ -0,0 +1,63 @@
+import asyncio
+from datetime import timedelta
+
+from aiogram.fsm.storage.base import StorageKey
+
+from src.fsm_storage import BoundedMemoryStorage
+
+MAIN_BOT_ID = 100
+OTHER_BOT_ID = 200
+
+
+def make_key(user_id: int, bot_id: int = MAIN_BOT_ID) -> StorageKey:
+    return StorageKey(bot_id=bot_id, chat_id=user_id, user_id=user_id)
+
+
+def test_least_recently_used_conversation_is_dropped():
+    storage = BoundedMemoryStorage(cache_size=2)
+
+    async def scenario():
+        for user_id in (1, 2):
+            await storage.set_state(make_key(user_id), "waiting")
+        await storage.get_state(make_key(1))
+        await storage.set_data(make_key(3), {"step": 1})
+        return [await storage.get_state(make_key(user_id)) for user_id in (1, 2, 3)]
+
+    assert asyncio.run(scenario()) == ["waiting", None, None]
+    assert asyncio.run(storage.get_data(make_key(3))) == {"step": 1}
+
+
+def test_conversations_expire():
+    storage = BoundedMemoryStorage(ttl=timedelta(0))
+
+    async def scenario():
+        await storage.set_state(make_key(1), "waiting")
+        return await storage.get_state(make_key(1))
+
+    assert asyncio.run(scenario()) is None
+    assert not storage._records
+
+
+def test_cleared_conversation_is_dropped():
+    storage = BoundedMemoryStorage()
+
+    async def scenario():
+        await storage.set_state(make_key(1), "waiting")
+        await storage.set_state(make_key(1), None)
+
+    asyncio.run(scenario())
+    assert not storage._records
+
+
+def test_hosted_bots_do_not_share_state():
+    storage = BoundedMemoryStorage()
+
+    async def scenario():
+        # aiogram's FSM middleware runs before NamespaceMiddleware - the key's bot id decides
+        await storage.set_state(make_key(1), "waiting")
+        await storage.set_state(make_key(1, OTHER_BOT_ID), "choosing")
+        return await storage.get_state(make_key(1)), await storage.get_state(
+            make_key(1, OTHER_BOT_ID)
+        )
+
+    assert asyncio.run(scenario()) == ("waiting", "choosing")
@@ -1,7 +1,23 @@
+import importlib
+
 import pytest
 
+# the modules listed in src.bot.ROUTER_MODULES - src.bot itself needs TELEGRAM_BOT_TOKEN
+ROUTER_MODULES = [
+    "src.routers.dev",
+    "src.routers.admin",
+    "src.routers.info",
+    "src.routers.feeding",
+    "src.routers.schedule",
+    "src.routers.settings",
+    "src.routers.household",
+    "src.routers.start",
+    "src.routers.chat",
+]
+
 
-def test_imports():
-    from project_name.main import main
+@pytest.mark.parametrize("module_name", ROUTER_MODULES)
+def test_router_modules_import(module_name):
+    module = importlib.import_module(module_name)
 
-    assert main
+    assert module.router
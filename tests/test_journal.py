@@ -0,0 +1,177 @@
+import asyncio
+import threading
+
+import pytest
+from pymongo.errors import AutoReconnect, OperationFailure
+
+from src import journal as journal_module
+from src.database import DatabaseManager
+from src.journal import QUARANTINE_FILE, Journal
+
+
+class FakeMongo:
+    """apply_journal_entry that fails on demand"""
+
+    def __init__(self) -> None:
+        self.applied = []
+        self.failures = {}  # user id -> exceptions to raise, in order
+
+    async def apply(self, dbm, op, payload):
+        errors = self.failures.get(payload["user_id"])
+        if errors:
+            raise errors.pop(0)
+        self.applied.append(payload["user_id"])
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    mongo = FakeMongo()
+
+    async def apply_journal_entry(self, op, payload):
+        await mongo.apply(self, op, payload)
+
+    monkeypatch.setattr(DatabaseManager, "apply_journal_entry", apply_journal_entry)
+    monkeypatch.setattr("src.journal.MAX_RETRY_SECONDS", 0.01)
+    return mongo
+
+
+def make_journal(tmp_path, segment_bytes=1 << 20, max_attempts=3):
+    journal = Journal(tmp_path, segment_bytes, flush_interval=0.001, max_attempts=max_attempts)
+    journal.open()
+    return journal
+
+
+async def wait_for(condition, timeout=5.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def test_entries_are_replayed_in_order_and_segments_deleted(tmp_path, mongo):
+    async def scenario():
+        journal = make_journal(tmp_path, segment_bytes=64)
+        journal.start()
+        for user_id in range(5):
+            await journal.append("save_user_schedule", {"user_id": user_id})
+        await wait_for(lambda: len(mongo.applied) == 5)
+        await journal.close()
+
+    asyncio.run(scenario())
+    assert mongo.applied == [0, 1, 2, 3, 4]
+    # only the segment that was active at shutdown is left
+    assert len(list(tmp_path.glob("journal-*.log"))) == 1
+
+
+def test_lost_connection_is_retried(tmp_path, mongo):
+    mongo.failures[1] = [AutoReconnect("down"), AutoReconnect("down")]
+
+    async def scenario():
+        journal = make_journal(tmp_path, max_attempts=1)
+        journal.start()
+        for user_id in range(3):
+            await journal.append("save_user_schedule", {"user_id": user_id})
+        await wait_for(lambda: len(mongo.applied) == 3)
+        await journal.close()
+
+    asyncio.run(scenario())
+    # a connection error is never the entry's fault - nothing is quarantined
+    assert mongo.applied == [0, 1, 2]
+    assert not (tmp_path / QUARANTINE_FILE).exists()
+
+
+def test_poison_entry_is_quarantined(tmp_path, mongo):
+    mongo.failures[1] = [OperationFailure("bad update")] * 3
+
+    async def scenario():
+        journal = make_journal(tmp_path, max_attempts=3)
+        journal.start()
+        for user_id in range(3):
+            await journal.append("save_user_schedule", {"user_id": user_id})
+        await wait_for(lambda: len(mongo.applied) == 2)
+        await journal.close()
+
+    asyncio.run(scenario())
+    assert mongo.applied == [0, 2]
+    assert b'"user_id": 1' in (tmp_path / QUARANTINE_FILE).read_bytes()
+
+
+def test_transient_error_is_retried_before_quarantine(tmp_path, mongo):
+    mongo.failures[0] = [RuntimeError("bug"), OperationFailure("busy")]
+
+    async def scenario():
+        journal = make_journal(tmp_path, max_attempts=3)
+        journal.start()
+        await journal.append("save_user_schedule", {"user_id": 0})
+        await journal.append("save_user_schedule", {"user_id": 1})
+        await wait_for(lambda: len(mongo.applied) == 2)
+        await journal.close()
+
+    asyncio.run(scenario())
+    assert mongo.applied == [0, 1]
+    assert not (tmp_path / QUARANTINE_FILE).exists()
+
+
+def test_corrupt_line_is_quarantined_on_restart(tmp_path, mongo):
+    (tmp_path / "journal-000000000000.log").write_bytes(
+        b'{"op": "save_user_schedule", "payload": {"user_id": 0}}\n'
+        b"{not json\n"
+        b'{"op": "save_user_schedule", "payload": {"user_id": 2}}\n'
+    )
+
+    async def scenario():
+        journal = make_journal(tmp_path)
+        journal.start()
+        await wait_for(lambda: len(mongo.applied) == 2)
+        await journal.close()
+
+    asyncio.run(scenario())
+    assert mongo.applied == [0, 2]
+    assert (tmp_path / QUARANTINE_FILE).read_bytes() == b"{not json\n"
+    assert not (tmp_path / "journal-000000000000.log").exists()
+
+
+def test_close_replays_what_is_left_once(tmp_path, mongo):
+    mongo.failures[0] = [AutoReconnect("down")]
+
+    async def scenario():
+        journal = make_journal(tmp_path)
+        journal.start()
+        await journal.append("save_user_schedule", {"user_id": 0})
+        await journal.append("save_user_schedule", {"user_id": 1})
+        # the replay loop is backing off after the first failure
+        await journal.close()
+
+    asyncio.run(scenario())
+    assert mongo.applied == [0, 1]
+
+
+def test_backlog_is_read_in_chunks_off_the_event_loop(tmp_path, mongo, monkeypatch):
+    (tmp_path / "journal-000000000000.log").write_bytes(
+        b"".join(
+            b'{"op": "save_user_schedule", "payload": {"user_id": %d}}\n' % user_id
+            for user_id in range(10)
+        )
+        + b'{"op": "save_user_schedule", "payl'  # torn write of the crashed run
+    )
+    monkeypatch.setattr(journal_module, "READ_CHUNK_BYTES", 100)
+    reads = []
+    read_lines = Journal._read_lines
+
+    def record_read(path, offset):
+        lines = read_lines(path, offset)
+        reads.append((threading.current_thread() is threading.main_thread(), len(lines)))
+        return lines
+
+    monkeypatch.setattr(Journal, "_read_lines", staticmethod(record_read))
+
+    async def scenario():
+        journal = make_journal(tmp_path)
+        await journal.replay()
+
+    asyncio.run(scenario())
+    assert mongo.applied == list(range(10))
+    # the torn tail is left alone, then the fresh segment of this run is empty
+    assert [lines for _, lines in reads] == [2, 2, 2, 2, 2, 0, 0]
+    assert not any(on_event_loop for on_event_loop, _ in reads)
@@ -0,0 +1,98 @@
+import asyncio
+
+from pymongo.errors import ServerSelectionTimeoutError
+
+from src.lookup_cache import LookupCache
+from src.namespace import use_namespace
+
+
+class FakeLookup:
+    def __init__(self, value) -> None:
+        self.value = value
+        self.calls = 0
+        self.down = False
+        self.delay = 0.0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.down:
+            raise ServerSelectionTimeoutError("mongo is down")
+        return self.value
+
+
+def test_cached_value_is_served_while_mongo_is_down():
+    async def scenario():
+        cache = LookupCache(maxsize=10, ttl=0, timeout=1)
+        lookup = FakeLookup("GMT+3")
+        assert await cache.get("timezone", 1, lookup, default=None) == "GMT+3"
+        lookup.down = True
+        # stale - served right away, the failed refresh keeps the last known value
+        assert await cache.get("timezone", 1, lookup, default=None) == "GMT+3"
+        await asyncio.sleep(0.01)
+        assert await cache.get("timezone", 1, lookup, default=None) == "GMT+3"
+        # nothing known about this user - the default
+        assert await cache.get("timezone", 2, lookup, default="none") == "none"
+
+    asyncio.run(scenario())
+
+
+def test_fresh_value_does_not_touch_mongo():
+    async def scenario():
+        cache = LookupCache(maxsize=10, ttl=60, timeout=1)
+        lookup = FakeLookup({"owner_id": 1})
+        for _ in range(3):
+            await cache.get("household", 1, lookup, default=None)
+        return lookup.calls
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_slow_mongo_gives_up_after_the_timeout():
+    async def scenario():
+        cache = LookupCache(maxsize=10, ttl=60, timeout=0.01)
+        lookup = FakeLookup("manual")
+        lookup.delay = 1
+        return await cache.get("schedule_type", 1, lookup, default=None)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_local_write_wins_over_an_older_read():
+    async def scenario():
+        cache = LookupCache(maxsize=10, ttl=60, timeout=1)
+        lookup = FakeLookup("2 times")
+        lookup.delay = 0.05
+        read = asyncio.create_task(cache.get("schedule_type", 1, lookup, default=None))
+        await asyncio.sleep(0)
+        # /setup saved a new schedule while Mongo still had the old one
+        cache.put("schedule_type", 1, "3 times")
+        await read
+        lookup.down = True
+        return await cache.get("schedule_type", 1, lookup, default=None)
+
+    assert asyncio.run(scenario()) == "3 times"
+
+
+def test_entries_are_per_namespace():
+    async def scenario():
+        cache = LookupCache(maxsize=10, ttl=60, timeout=1)
+        cache.put("household", 1, "main")
+        with use_namespace("other"):
+            cache.put("household", 1, "other")
+            cache.forget("household")
+            other = await cache.get("household", 1, FakeLookup("reloaded"), None)
+        return await cache.get("household", 1, FakeLookup("reloaded"), None), other
+
+    assert asyncio.run(scenario()) == ("main", "reloaded")
+
+
+def test_least_recently_used_entries_are_evicted():
+    async def scenario():
+        cache = LookupCache(maxsize=2, ttl=60, timeout=1)
+        for user_id in (1, 2, 3):
+            cache.put("household", user_id, "cached")
+        lookup = FakeLookup("reloaded")
+        return [await cache.get("household", user_id, lookup, None) for user_id in (3, 2, 1)]
+
+    assert asyncio.run(scenario()) == ["cached", "cached", "reloaded"]
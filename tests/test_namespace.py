@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from aiogram.types import Chat, Message, User
+
+from src import namespace
+from src.namespace import get_namespace, use_namespace
+from src.routers import feeding
+
+MAIN_BOT_ID = 100
+OTHER_BOT_ID = 200
+
+
+@pytest.fixture(autouse=True)
+def bots(monkeypatch):
+    monkeypatch.setattr(namespace, "hosted_bots", {})
+    monkeypatch.setattr(namespace, "bot_namespaces", {})
+    namespace.register_bot(None, SimpleNamespace(id=MAIN_BOT_ID))
+    namespace.register_bot("other", SimpleNamespace(id=OTHER_BOT_ID))
+
+
+def test_job_ids_and_databases_are_per_namespace():
+    assert namespace.get_job_id("feed_1_08:00") == "feed_1_08:00"
+    assert namespace.get_database_name("cats") == "cats"
+    with use_namespace("other"):
+        assert namespace.get_job_id("feed_1_08:00") == "other:feed_1_08:00"
+        assert namespace.get_database_name("cats") == "cats_other"
+    assert namespace.get_job_namespace("other:feed_1_08:00") == "other"
+    assert namespace.get_job_namespace("feed_1_08:00") is None
+
+
+def test_jobs_run_in_the_namespace_they_were_armed_in():
+    async def job():
+        return get_namespace()
+
+    with use_namespace("other"):
+        wrapped = namespace.in_namespace(job)
+    assert asyncio.run(wrapped()) == "other"
+
+
+def test_same_feeding_message_in_two_bots_is_logged_twice(monkeypatch):
+    logged = []
+
+    async def log_feeding(**kwargs):
+        logged.append((get_namespace(), kwargs["source"]))
+
+    async def get_cached_household(user_id):
+        return None
+
+    async def get_cached_schedule_type(user_id):
+        return "2 times"
+
+    async def noop(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(
+        feeding,
+        "db_manager",
+        SimpleNamespace(
+            log_feeding=log_feeding,
+            get_cached_household=get_cached_household,
+            get_cached_schedule_type=get_cached_schedule_type,
+        ),
+    )
+    monkeypatch.setattr(feeding, "ask_user_raw", noop)
+    monkeypatch.setattr(feeding, "reply_safe", noop)
+    monkeypatch.setattr(feeding, "recent_feedings", feeding.RecentKeys())
+    user = User(id=1, is_bot=False, first_name="Cat")
+    message = Message(
+        message_id=7,
+        date=datetime.now(),
+        chat=Chat(id=1, type="private"),
+        from_user=user,
+        text="/fed",
+    )
+
+    async def scenario():
+        for bot_namespace in (None, "other", "other"):
+            with use_namespace(bot_namespace):
+                await feeding.register_meal(message, state=None)
+
+    asyncio.run(scenario())
+    # the redelivered update of the second bot is dropped, the first bot's one is not
+    assert logged == [(None, (1, 7)), ("other", (1, 7))]
@@ -0,0 +1,324 @@
+"""
+Reminder simulation on a virtual clock
+
+Runs the real scheduling code - schedule_reminder, the daily cron jobs, send_reminder and
+its 1-hour follow-ups - against a scheduler that is never started. The driver jumps the
+virtual clock from one due time to the next and runs the due jobs, so days of reminders
+for hundreds of users take seconds. Telegram and Mongo are stubbed: ask_user_raw either
+"answers" or times out, which moves that job's clock forward by the ask timeout.
+
+The DST rebalancer needs Mongo and is not simulated - the window stays clear of DST changes.
+Scale it up as a benchmark (the report is printed, see it with -s):
+
+    SIMULATION_USERS=5000 SIMULATION_DAYS=7 pytest tests/test_reminder_simulation.py -s
+"""
+
+import asyncio
+import os
+import random
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import pytest
+from apscheduler.events import EVENT_JOB_ADDED, JobEvent
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.schedulers import base as scheduler_base
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from src.routers import feeding, schedule
+from src.routers.common import SCHEDULES
+from src.routers.schedule import schedule_reminder
+from src.utils import timezone_utils
+from src.utils.timezone_utils import get_offset_minutes, parse_time_of_day
+
+TIMEZONES = ["GMT+0", "GMT+3", "GMT-5", "GMT+5:30", "Europe/Berlin", "America/New_York"]
+# no DST change in Europe or America within a week from here
+START = datetime(2026, 6, 1, 0, 0)
+ASK_TIMEOUT = timedelta(seconds=300)
+FOLLOWUP_DELAY = timedelta(hours=1)
+MINUTES_PER_DAY = 24 * 60
+
+# how far a running job has moved past its fire time (e.g. waiting for the ask timeout)
+_job_elapsed: ContextVar[timedelta] = ContextVar("job_elapsed", default=timedelta(0))
+
+
+class VirtualClock:
+    def __init__(self, start: datetime) -> None:
+        self.current = start  # naive UTC, like the rest of the bot
+
+    def now(self) -> datetime:
+        return self.current + _job_elapsed.get()
+
+    def sleep(self, delay: timedelta) -> None:
+        """Let time pass for the running job only"""
+        _job_elapsed.set(_job_elapsed.get() + delay)
+
+
+class Fire(NamedTuple):
+    job_id: str
+    chat_id: int
+    at: datetime  # naive UTC
+
+
+class SimulatedUser(NamedTuple):
+    user_id: int
+    timezone: str
+    times: List[str]
+
+
+def make_virtual_datetime(clock: VirtualClock) -> type:
+    """datetime whose now() reads the virtual clock - patched into the simulated modules"""
+
+    class VirtualDatetime(datetime):
+        @classmethod
+        def now(cls, tz: Any = None) -> datetime:  # type: ignore[override]
+            now = clock.now()
+            return now.replace(tzinfo=timezone.utc).astimezone(tz) if tz else now
+
+    return VirtualDatetime
+
+
+class Simulation:
+    def __init__(self, start: datetime, answer_rate: float, seed: int = 0) -> None:
+        self.start = start
+        self.clock = VirtualClock(start)
+        self.answer_rate = answer_rate
+        self.random = random.Random(seed)
+        self.store = MemoryJobStore()
+        self.scheduler = AsyncIOScheduler(jobstores={"default": self.store}, timezone="UTC")
+        self.scheduler.add_listener(self._on_job_added, EVENT_JOB_ADDED)
+        self.users: Dict[int, SimulatedUser] = {}
+        self.fires: List[Fire] = []
+        self.created: Counter = Counter()  # simulated hour -> jobs added
+        self.fired: Counter = Counter()  # simulated hour -> jobs run
+        # (chat_id, when the reminder timed out) - each should get a follow-up an hour later
+        self.missed: List[Tuple[int, datetime]] = []
+        self.fed = 0
+        self.armed: List[str] = []  # job ids still scheduled when the run ended
+
+    def hour(self, at: datetime) -> int:
+        return int((at - self.start).total_seconds() // 3600)
+
+    def _on_job_added(self, event: JobEvent) -> None:
+        self.created[self.hour(self.clock.now())] += 1
+
+    # stubs for Telegram and Mongo
+
+    async def _get_cached_timezone(self, user_id: int) -> str:
+        return self.users[user_id].timezone
+
+    async def _get_cached_household(self, user_id: int) -> None:
+        return None
+
+    async def _ask_user_raw(self, chat_id: int, question: str, state: Any, timeout: float) -> Any:
+        assert question
+        if self.random.random() < self.answer_rate:
+            return SimpleNamespace(chat_id=chat_id)
+        self.clock.sleep(timedelta(seconds=timeout))
+        self.missed.append((chat_id, self.clock.now()))
+        return None
+
+    async def _register_meal(self, message: Any, state: Any = None, log_reminder: bool = True):
+        self.fed += 1
+
+    async def _noop(self, *args: Any, **kwargs: Any) -> None:
+        return None
+
+    def patch(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        virtual_datetime = make_virtual_datetime(self.clock)
+        database = SimpleNamespace(
+            get_cached_timezone=self._get_cached_timezone,
+            get_cached_household=self._get_cached_household,
+        )
+        for name, value in {
+            "datetime": virtual_datetime,
+            "db_manager": database,
+            "ask_user_raw": self._ask_user_raw,
+            "create_state": lambda chat_id: None,
+            "register_meal": self._register_meal,
+            "send_tracked": self._noop,
+            "record_delivery": self._noop,
+            "record_failure": self._noop,
+        }.items():
+            monkeypatch.setattr(feeding, name, value)
+        monkeypatch.setattr(schedule, "datetime", virtual_datetime)
+        monkeypatch.setattr(schedule, "get_scheduler", lambda: self.scheduler)
+        # IANA zone offsets follow the virtual date too
+        monkeypatch.setattr(timezone_utils, "datetime", virtual_datetime)
+        # first fire times of new jobs are computed from the scheduler's "now"
+        monkeypatch.setattr(scheduler_base, "datetime", virtual_datetime)
+
+    # driver
+
+    async def setup_users(self, count: int) -> None:
+        """Arm daily reminders the way /setup does, random schedule and timezone per user"""
+        presets = [times for times in SCHEDULES.values() if times]
+        for user_id in range(1, count + 1):
+            user = SimulatedUser(
+                user_id, self.random.choice(TIMEZONES), self.random.choice(presets)
+            )
+            self.users[user_id] = user
+            for time_of_day in user.times:
+                hour, minute = divmod(parse_time_of_day(time_of_day), 60)
+                await schedule_reminder(user_id, hour=hour, minute=minute, timezone=user.timezone)
+
+    async def _run_job(self, job: Any) -> None:
+        _job_elapsed.set(timedelta(0))
+        await job.func(*job.args, **job.kwargs)
+
+    async def run_until(self, end: datetime) -> None:
+        """Fire every job due before `end`, in virtual time order"""
+        aware_end = end.replace(tzinfo=timezone.utc)
+        while True:
+            next_run = self.store.get_next_run_time()
+            if next_run is None or next_run > aware_end:
+                break
+            self.clock.current = next_run.astimezone(timezone.utc).replace(tzinfo=None)
+            due = self.store.get_due_jobs(next_run)
+            for job in due:
+                # advance first, like the scheduler does - the job may re-arm itself
+                next_fire = job.trigger.get_next_fire_time(next_run, next_run)
+                if next_fire is None:
+                    self.scheduler.remove_job(job.id)
+                else:
+                    self.scheduler.modify_job(job.id, next_run_time=next_fire)
+                self.fires.append(Fire(job.id, job.args[0], self.clock.current))
+                self.fired[self.hour(self.clock.current)] += 1
+            # same-minute jobs run concurrently, each in its own context (own elapsed time)
+            await asyncio.gather(*(asyncio.create_task(self._run_job(job)) for job in due))
+        self.clock.current = end
+
+    def run(self, users: int, days: float) -> Dict[str, float]:
+        """Simulate `days` of reminders for `users` users - returns wall times in seconds"""
+
+        async def scenario() -> Dict[str, float]:
+            self.scheduler.start(paused=True)
+            try:
+                started = time.perf_counter()
+                await self.setup_users(users)
+                armed = time.perf_counter()
+                await self.run_until(self.start + timedelta(days=days))
+                finished = time.perf_counter()
+                # the memory job store is emptied on shutdown
+                self.armed = [job.id for job in self.store.get_all_jobs()]
+            finally:
+                self.scheduler.shutdown(wait=False)
+            return {"setup": armed - started, "run": finished - armed}
+
+        return asyncio.run(scenario())
+
+    def format_report(self, wall_times: Dict[str, float], days: float) -> str:
+        hours = max(int(days * 24), 1)
+        lines = [
+            f"Simulated {hours} h for {len(self.users)} users",
+            f"Jobs created: {sum(self.created.values())}, fired: {len(self.fires)}, "
+            f"fed: {self.fed}, missed: {len(self.missed)}",
+            f"Wall time: setup {wall_times['setup']:.2f} s, run {wall_times['run']:.2f} s "
+            f"({len(self.fires) / max(wall_times['run'], 1e-9):.0f} jobs/s)",
+            "Hour  created  fired",
+        ]
+        for hour in range(hours):
+            if self.created[hour] or self.fired[hour]:
+                lines.append(f"{hour:4d}  {self.created[hour]:7d}  {self.fired[hour]:5d}")
+        return "\n".join(lines)
+
+    # what the tests look at
+
+    def daily_fires(self) -> List[Fire]:
+        return [fire for fire in self.fires if fire.job_id.startswith("feed_")]
+
+    def followup_fires(self) -> List[Fire]:
+        return [fire for fire in self.fires if fire.job_id.startswith("followup_")]
+
+    def expected_daily_jobs(self) -> List[str]:
+        return [
+            f"feed_{user.user_id}_{time_of_day}"
+            for user in self.users.values()
+            for time_of_day in user.times
+        ]
+
+
+@pytest.fixture
+def simulate(monkeypatch):
+    # every reminder and time conversion is logged at debug level
+    from loguru import logger
+
+    logger.disable("src")
+
+    def simulate(users: int, days: float, answer_rate: float) -> Simulation:
+        simulation = Simulation(START, answer_rate)
+        simulation.patch(monkeypatch)
+        wall_times = simulation.run(users, days)
+        print(simulation.format_report(wall_times, days))
+        return simulation
+
+    yield simulate
+    logger.enable("src")
+
+
+USERS = int(os.getenv("SIMULATION_USERS", 100))
+DAYS = float(os.getenv("SIMULATION_DAYS", 2))
+
+
+def test_daily_reminders_fire_at_the_local_time(simulate):
+    simulation = simulate(USERS, DAYS, answer_rate=1)
+
+    wrong = []
+    for fire in simulation.daily_fires():
+        timezone_str = simulation.users[fire.chat_id].timezone
+        offset = get_offset_minutes(timezone_str, fire.at.replace(tzinfo=timezone.utc))
+        local_minute = (fire.at.hour * 60 + fire.at.minute + offset) % MINUTES_PER_DAY
+        if local_minute != parse_time_of_day(fire.job_id.rsplit("_", 1)[1]):
+            wrong.append(f"{fire.job_id} at {fire.at} UTC ({timezone_str})")
+    assert wrong == []
+    assert simulation.followup_fires() == []
+    assert simulation.fed == len(simulation.daily_fires())
+
+
+def test_every_slot_fires_once_a_day(simulate):
+    simulation = simulate(USERS, DAYS, answer_rate=1)
+
+    counts = Counter(fire.job_id for fire in simulation.daily_fires())
+    # the window starts at midnight UTC - a slot fires floor(days) or ceil(days) times
+    assert {job_id: counts[job_id] for job_id in simulation.expected_daily_jobs()} == {
+        job_id: pytest.approx(DAYS, abs=1) for job_id in simulation.expected_daily_jobs()
+    }
+    assert set(counts) == set(simulation.expected_daily_jobs())
+
+
+def test_missed_reminders_get_a_follow_up_an_hour_later(simulate):
+    simulation = simulate(USERS, 1, answer_rate=0.5)
+    end = START + timedelta(days=1)
+
+    assert simulation.missed
+    followups = Counter((fire.chat_id, fire.at) for fire in simulation.followup_fires())
+    expected = Counter(
+        (chat_id, missed_at + FOLLOWUP_DELAY)
+        for chat_id, missed_at in simulation.missed
+        if missed_at + FOLLOWUP_DELAY <= end
+    )
+    assert followups == expected
+    # a follow-up is asked after the ask timeout of the reminder it follows
+    fired = {(fire.chat_id, fire.at) for fire in simulation.fires}
+    assert all(
+        (chat_id, missed_at - ASK_TIMEOUT) in fired for chat_id, missed_at in simulation.missed
+    )
+
+
+def test_armed_jobs_match_the_schedules(simulate):
+    simulation = simulate(USERS, 1, answer_rate=0)
+
+    daily = sorted(job_id for job_id in simulation.armed if job_id.startswith("feed_"))
+    assert daily == sorted(simulation.expected_daily_jobs())
+    # follow-ups that are still pending when the window ends - one per unanswered chain
+    pending = [job_id for job_id in simulation.armed if job_id.startswith("followup_")]
+    end = START + timedelta(days=1)
+    assert len(pending) == sum(
+        1 for _, missed_at in simulation.missed if missed_at + FOLLOWUP_DELAY > end
+    )
+    total = sum(len(user.times) for user in simulation.users.values())
+    assert sum(simulation.created.values()) == total + len(simulation.missed)
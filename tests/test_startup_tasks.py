@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src import startup_tasks
+from src.startup_tasks import get_missed_utc_minutes
+
+
+class FakeDatabase:
+    def __init__(self, schedules) -> None:
+        self.schedules = schedules
+
+    async def iter_schedules_with_timezones(self):
+        for schedule in self.schedules:
+            yield schedule
+
+
+@pytest.fixture
+def armed(monkeypatch):
+    armed = []
+
+    async def schedule_reminder(chat_id, *, hour, minute, reschedule_if_missed, timezone):
+        armed.append((chat_id, f"{hour:02d}:{minute:02d}", timezone))
+
+    monkeypatch.setattr(startup_tasks, "schedule_reminder", schedule_reminder)
+    return armed
+
+
+def restore(monkeypatch, schedules):
+    monkeypatch.setattr(startup_tasks, "DatabaseManager", lambda: FakeDatabase(schedules))
+    asyncio.run(startup_tasks.reload_schedules())
+
+
+def test_users_without_a_timezone_are_restored_in_utc(monkeypatch, armed):
+    restore(
+        monkeypatch,
+        [
+            {"user_id": 1, "times": ["08:00"], "minutes": [480], "timezone": None},
+            {"user_id": 2, "times": ["09:30"], "minutes": [570], "timezone": "Europe/Berlin"},
+        ],
+    )
+
+    assert armed == [(1, "08:00", "GMT+00:00"), (2, "09:30", "Europe/Berlin")]
+
+
+def test_invalid_stored_times_are_skipped(monkeypatch, armed):
+    restore(monkeypatch, [{"user_id": 1, "times": ["8 am", "20:00"], "timezone": "GMT+3"}])
+
+    assert armed == [(1, "20:00", "GMT+3")]
+
+
+def test_missed_minutes_are_the_downtime_window():
+    now = datetime(2026, 6, 1, 0, 2, 30, tzinfo=timezone.utc)
+
+    # the minute the bot stopped in had fired already, the current one has fired by now
+    assert get_missed_utc_minutes(now - timedelta(minutes=5), now) == [0, 1, 2, 1438, 1439]
+    assert get_missed_utc_minutes(now - timedelta(seconds=10), now) == []
+
+
+def test_missed_minutes_are_capped_by_the_window(monkeypatch):
+    monkeypatch.setenv("MISSED_REMINDERS_WINDOW_MINUTES", "3")
+    now = datetime(2026, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+    assert get_missed_utc_minutes(now - timedelta(days=2), now) == [718, 719, 720]
+
+
+def test_users_due_during_the_downtime_are_reminded(monkeypatch):
+    queried = []
+    reminded = []
+
+    class DueDatabase:
+        async def get_users_due_at(self, minutes):
+            queried.append(minutes)
+            for user_id in (1, 2, 1):
+                yield {"user_id": user_id}
+
+    async def schedule_reminder(chat_id, timestamp):
+        reminded.append(chat_id)
+
+    monkeypatch.setattr(startup_tasks, "DatabaseManager", DueDatabase)
+    monkeypatch.setattr(startup_tasks, "schedule_reminder", schedule_reminder)
+    stopped_at = datetime.now(tz=timezone.utc) - timedelta(minutes=10)
+
+    assert asyncio.run(startup_tasks.send_missed_reminders(stopped_at)) == 2
+    assert len(queried) == 1 and len(queried[0]) in (10, 11)
+    assert sorted(reminded) == [1, 2]
@@ -0,0 +1,117 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from aiogram.types import Chat, Message, Update, User
+
+from src import throttling
+from src.namespace import use_namespace
+from src.throttling import CHATTER, SlidingWindowCounter, ThrottlingMiddleware
+
+USER = User(id=1, is_bot=False, first_name="Cat")
+
+
+def make_update(text: str, update_id: int = 1) -> Update:
+    message = Message(
+        message_id=update_id,
+        date=datetime.now(),
+        chat=Chat(id=USER.id, type="private"),
+        from_user=USER,
+        text=text,
+    )
+    return Update(update_id=update_id, message=message)
+
+
+@pytest.fixture
+def notices(monkeypatch):
+    sent = []
+
+    async def reply_safe(message, text):
+        sent.append(text)
+
+    monkeypatch.setattr(throttling, "reply_safe", reply_safe)
+    return sent
+
+
+def make_middleware(user_limit=(100, 60)) -> ThrottlingMiddleware:
+    return ThrottlingMiddleware(
+        limits={CHATTER: (2, 60), "command": (3, 60), "heavy": (1, 60)},
+        user_limit=user_limit,
+        max_keys=100,
+    )
+
+
+def send(middleware, texts, raw_state=None):
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event.message.text)
+
+    async def scenario():
+        for update_id, text in enumerate(texts):
+            data = {"event_from_user": USER, "raw_state": raw_state}
+            await middleware(handler, make_update(text, update_id), data)
+
+    asyncio.run(scenario())
+    return handled
+
+
+def test_sliding_window_expires_old_hits():
+    counter = SlidingWindowCounter(max_keys=10)
+    assert counter.hit("key", 2, 10, now=0)
+    assert counter.hit("key", 2, 10, now=1)
+    assert not counter.hit("key", 2, 10, now=5)
+    assert counter.hit("key", 2, 10, now=10.5)
+
+
+def test_sliding_window_evicts_least_recently_used_keys():
+    counter = SlidingWindowCounter(max_keys=2)
+    counter.hit("a", 1, 10, now=0)
+    counter.hit("b", 1, 10, now=0)
+    counter.hit("a", 1, 10, now=1)
+    counter.hit("c", 1, 10, now=1)
+    # "b" was evicted - it starts over
+    assert counter.hit("b", 1, 10, now=2)
+    assert not counter.hit("c", 1, 10, now=2)
+
+
+def test_each_bucket_has_its_own_limit(notices):
+    middleware = make_middleware()
+    texts = ["hi", "hi", "hi", "/stats", "/stats", "/fed", "/fed", "/fed", "/fed"]
+    assert send(middleware, texts) == ["hi", "hi", "/stats", "/fed", "/fed", "/fed"]
+    assert middleware.dropped == 3
+
+
+def test_one_cooldown_notice_per_window(notices):
+    send(make_middleware(), ["hi"] * 5)
+    assert notices == [throttling.COOLDOWN_NOTICE]
+
+
+def test_user_limit_covers_all_buckets(notices):
+    middleware = make_middleware(user_limit=(2, 60))
+    assert send(middleware, ["/fed", "/setup", "/help"]) == ["/fed", "/setup"]
+
+
+def test_answers_to_a_prompt_are_never_throttled(notices):
+    middleware = make_middleware()
+    assert send(middleware, ["yes"] * 5, raw_state="waiting") == ["yes"] * 5
+    assert notices == []
+
+
+def test_dropped_update_uses_no_command_budget(notices, monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(throttling, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    middleware = make_middleware(user_limit=(2, 10))
+
+    # the user limit drops the last two - they must not count against /fed
+    assert send(middleware, ["/fed"] * 4) == ["/fed"] * 2
+    clock.now = 11
+    assert send(middleware, ["/fed"]) == ["/fed"]
+
+
+def test_each_bot_has_its_own_budget(notices):
+    middleware = make_middleware(user_limit=(2, 60))
+    assert send(middleware, ["/fed", "/fed", "/fed"]) == ["/fed", "/fed"]
+    with use_namespace("other"):
+        assert send(middleware, ["/fed", "/fed"]) == ["/fed", "/fed"]
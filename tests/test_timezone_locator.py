@@ -0,0 +1,110 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.routers import settings
+from src.utils import timezone_locator
+from src.utils.timezone_locator import find_timezone, get_longitude_timezone
+
+
+@pytest.fixture
+def finder(monkeypatch):
+    """timezonefinder knows Madrid only"""
+    known = {(40.4, -3.7): "Europe/Madrid"}
+    finder = SimpleNamespace(timezone_at=lambda lng, lat: known.get((lat, lng)))
+    monkeypatch.setattr(timezone_locator, "get_timezone_finder", lambda: finder)
+
+
+def test_known_location_has_its_timezone(finder):
+    assert asyncio.run(find_timezone(40.4, -3.7)) == "Europe/Madrid"
+
+
+def test_unknown_location_has_no_timezone(finder):
+    assert asyncio.run(find_timezone(28.6, 77.2)) is None
+
+
+def test_longitude_timezone_is_a_rough_fixed_offset():
+    assert get_longitude_timezone(77.2) == "GMT+05:00"
+    assert get_longitude_timezone(-3.7) == "GMT+00:00"
+    assert get_longitude_timezone(-74.0) == "GMT-05:00"
+
+
+class FakeChat:
+    """Messages sent and answers given during the timezone prompt"""
+
+    def __init__(self, answers) -> None:
+        self.answers = list(answers)
+        self.questions = []
+        self.saved = []
+
+    async def answer(self, text, **kwargs):
+        self.questions.append(text)
+
+    async def ask_user_raw(self, chat_id, question, state, timeout):
+        self.questions.append(question)
+        return SimpleNamespace(text=self.answers.pop(0), location=None)
+
+    async def update_user_timezone(self, user_id, timezone):
+        self.saved.append(timezone)
+
+
+@pytest.fixture
+def chat(monkeypatch, finder):
+    def make_chat(*answers):
+        chat = FakeChat(answers)
+        monkeypatch.setattr(settings, "ask_user_raw", chat.ask_user_raw)
+        monkeypatch.setattr(settings, "create_state", lambda chat_id: None)
+        monkeypatch.setattr(
+            settings,
+            "db_manager",
+            SimpleNamespace(update_user_timezone=chat.update_user_timezone),
+        )
+
+        async def rearm_user(user_id):
+            return None
+
+        monkeypatch.setattr(settings, "rearm_user", rearm_user)
+        return chat
+
+    return make_chat
+
+
+def share_location(chat, lat, lon):
+    message = SimpleNamespace(
+        chat=SimpleNamespace(id=1),
+        from_user=SimpleNamespace(id=1),
+        location=SimpleNamespace(latitude=lat, longitude=lon),
+        answer=chat.answer,
+    )
+    asyncio.run(settings.location_handler(message))
+
+
+def test_longitude_estimate_is_only_saved_when_confirmed(chat):
+    delhi = chat("yes")
+    share_location(delhi, 28.6, 77.2)
+
+    assert "GMT+05:00" in delhi.questions[0]
+    assert delhi.saved == ["GMT+05:00"]
+
+
+def test_user_can_correct_the_longitude_estimate(chat):
+    lisbon = chat("Europe/Lisbon")
+    share_location(lisbon, 38.7, -9.1)
+
+    assert "GMT-01:00" in lisbon.questions[0]
+    assert lisbon.saved == ["Europe/Lisbon"]
+
+
+def test_known_location_is_saved_without_asking(chat):
+    madrid = chat()
+    share_location(madrid, 40.4, -3.7)
+
+    assert madrid.saved == ["Europe/Madrid"]
+
+
+def test_cancelled_estimate_is_not_saved(chat):
+    cancelled = chat("cancel")
+    share_location(cancelled, 28.6, 77.2)
+
+    assert cancelled.saved == []
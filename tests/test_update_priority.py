@@ -0,0 +1,83 @@
+import asyncio
+
+from src.update_priority import PRIORITY_CHATTER, PRIORITY_FEEDING, PRIORITY_READ, PriorityLimiter
+
+
+async def settle() -> None:
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_waiters_are_served_by_priority():
+    async def scenario():
+        limiter = PriorityLimiter(capacity=1)
+        await limiter.acquire(PRIORITY_READ)
+        served = []
+
+        async def wait(priority, name):
+            await limiter.acquire(priority)
+            served.append(name)
+
+        tasks = [
+            asyncio.create_task(wait(PRIORITY_READ, "read")),
+            asyncio.create_task(wait(PRIORITY_FEEDING, "feeding")),
+        ]
+        await settle()
+        limiter.release()
+        await settle()
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return served
+
+    assert asyncio.run(scenario()) == ["feeding", "read"]
+
+
+def test_reserved_slots_are_kept_for_feeding():
+    limiter = PriorityLimiter(capacity=2, reserved=1)
+    assert limiter.try_acquire(PRIORITY_READ)
+    assert not limiter.try_acquire(PRIORITY_CHATTER)
+    assert limiter.try_acquire(PRIORITY_FEEDING)
+
+
+def test_cancelled_waiter_does_not_block_the_queue():
+    async def scenario():
+        limiter = PriorityLimiter(capacity=1)
+        await limiter.acquire(PRIORITY_READ)
+        cancelled = asyncio.create_task(limiter.acquire(PRIORITY_READ))
+        await settle()
+        cancelled.cancel()
+        await settle()
+        assert not limiter._waiters
+
+        limiter.release()
+        await asyncio.wait_for(limiter.acquire(PRIORITY_READ), timeout=1)
+        return limiter.in_use
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_cancelled_head_is_skipped_when_slots_are_free():
+    async def scenario():
+        limiter = PriorityLimiter(capacity=1)
+        future = asyncio.get_running_loop().create_future()
+        limiter._waiters.append((PRIORITY_FEEDING, 0, future))
+        future.cancel()
+        return limiter.try_acquire(PRIORITY_READ)
+
+    assert asyncio.run(scenario())
+
+
+def test_cancelled_head_hands_the_slot_to_the_next_waiter():
+    async def scenario():
+        limiter = PriorityLimiter(capacity=1)
+        await limiter.acquire(PRIORITY_READ)
+        head = asyncio.create_task(limiter.acquire(PRIORITY_FEEDING))
+        behind = asyncio.create_task(limiter.acquire(PRIORITY_READ))
+        await settle()
+        head.cancel()
+        await settle()
+        limiter.release()
+        await asyncio.wait_for(behind, timeout=1)
+        return limiter.in_use
+
+    assert asyncio.run(scenario()) == 1